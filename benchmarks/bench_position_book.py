@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+"""
+PnL throughput: per-position loop over ProtoOAPosition vs PositionBook.
+
+    python benchmarks/bench_position_book.py [positions] [symbols]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from ctrader_open_api.messages.OpenApiModelMessages_pb2 import ProtoOAPosition
+
+from position_book import PositionBook, PositionRecord
+
+
+def make_positions(n, n_symbols, seed=7):
+    rnd = random.Random(seed)
+    positions = {}
+    for pid in range(1, n + 1):
+        p = ProtoOAPosition()
+        p.positionId = pid
+        p.tradeData.symbolId = rnd.randrange(n_symbols) + 1
+        p.tradeData.volume = rnd.choice([1000, 10000, 100000, 1000000])
+        p.tradeData.tradeSide = rnd.choice([1, 2])
+        p.price = 1.0 + rnd.random()
+        positions[pid] = p
+    return positions
+
+
+def loop_symbol_pnl(positions, ids_by_symbol, symbol_id, bid, ask, out, contract_size=100000):
+    # the pre-PositionBook _update_pnl_cache_for_symbol body
+    for pos_id in ids_by_symbol[symbol_id]:
+        pos = positions[pos_id]
+        side = "BUY" if pos.tradeData.tradeSide == 1 else "SELL"
+        entry = pos.price
+        lots = pos.tradeData.volume / 100.0
+        mkt = bid if side == "BUY" else ask
+        out[pos_id] = (mkt - entry if side == "BUY" else entry - mkt) * lots * contract_size
+
+
+def bench(label, fn, n_positions_touched, repeat):
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    dt = time.perf_counter() - t0
+    per_call = dt / repeat
+    print(f"{label:<38} {per_call * 1e6:10.1f} µs/call  {n_positions_touched / per_call / 1e6:8.2f} M pos/s")
+    return per_call
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    n_symbols = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    positions = make_positions(n, n_symbols)
+    ids_by_symbol = {}
+    for pid, p in positions.items():
+        ids_by_symbol.setdefault(p.tradeData.symbolId, set()).add(pid)
+
+    book = PositionBook()
+    book.rebuild(PositionRecord.from_proto(p) for p in positions.values())
+
+    prices = {sid: (1.5, 1.5002) for sid in ids_by_symbol}
+    busiest = max(ids_by_symbol, key=lambda s: len(ids_by_symbol[s]))
+    on_busiest = len(ids_by_symbol[busiest])
+    out = {}
+
+    # sanity: both paths agree
+    loop_symbol_pnl(positions, ids_by_symbol, busiest, *prices[busiest], out)
+    pids, pnl = book.symbol_pnl(busiest, *prices[busiest])
+    assert all(abs(out[p] - v) < 1e-6 for p, v in zip(pids.tolist(), pnl.tolist()))
+
+    print(f"{n} positions, {len(ids_by_symbol)} symbols, {on_busiest} on the busiest symbol\n")
+    print("one tick on one symbol")
+    a = bench("  loop over ProtoOAPosition", lambda: loop_symbol_pnl(positions, ids_by_symbol, busiest, 1.5, 1.5002, out), on_busiest, 2000)
+    b = bench("  PositionBook.symbol_pnl", lambda: book.symbol_pnl(busiest, 1.5, 1.5002), on_busiest, 2000)
+    print(f"  speedup x{a / b:.1f}\n")
+
+    print("one tick on every symbol (batch)")
+    def loop_all():
+        for sid, (bid, ask) in prices.items():
+            loop_symbol_pnl(positions, ids_by_symbol, sid, bid, ask, out)
+    a = bench("  loop over ProtoOAPosition", loop_all, n, 50)
+    b = bench("  PositionBook.batch_pnl", lambda: book.batch_pnl(prices), n, 50)
+    print(f"  speedup x{a / b:.1f}")
+
+
+if __name__ == "__main__":
+    main()
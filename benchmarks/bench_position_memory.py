@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+"""
+Memory held by the open-positions book: retained ProtoOAPosition messages vs
+PositionRecord (__slots__) vs the PositionBook arrays.
+
+    python benchmarks/bench_position_memory.py [sizes...]     (default: 1000 10000)
+
+Uses tracemalloc, so the protobuf numbers are only meaningful with the pure
+Python protobuf backend (PROTOCOL_BUFFERS_PYTHON_IMPLEMENTATION=python);
+upb/cpp allocate messages outside the Python allocator.
+"""
+import gc
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from ctrader_open_api.messages.OpenApiMessages_pb2 import ProtoOAReconcileRes
+
+from position_book import PositionBook, PositionRecord
+
+
+def reconcile_payload(n, seed=7):
+    """Serialized ProtoOAReconcileRes with n positions, as it arrives from the server."""
+    rnd = random.Random(seed)
+    res = ProtoOAReconcileRes()
+    res.ctidTraderAccountId = 1
+    for pid in range(1, n + 1):
+        p = res.position.add()
+        p.positionId = pid
+        p.positionStatus = 1
+        p.swap = rnd.randrange(-500, 500)
+        p.price = 1.0 + rnd.random()
+        p.usedMargin = rnd.randrange(100, 100000)
+        p.commission = -rnd.randrange(0, 300)
+        p.moneyDigits = 2
+        p.utcLastUpdateTimestamp = 1_700_000_000_000 + pid
+        td = p.tradeData
+        td.symbolId = rnd.randrange(200) + 1
+        td.volume = rnd.choice([1000, 10000, 100000])
+        td.tradeSide = rnd.choice([1, 2])
+        td.openTimestamp = 1_700_000_000_000 - pid * 1000
+        td.label = "cli"
+    return res.SerializeToString()
+
+
+def measure(build):
+    gc.collect()
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    obj = build()
+    dt = time.perf_counter() - t0
+    gc.collect()
+    size, _peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return obj, size, dt
+
+
+def main():
+    sizes = [int(a) for a in sys.argv[1:]] or [1000, 10000]
+    print(f"{'positions':>9}  {'representation':<28} {'retained':>10} {'per pos':>9} {'build':>9}")
+    for n in sizes:
+        payload = reconcile_payload(n)
+
+        def as_proto():
+            res = ProtoOAReconcileRes()
+            res.ParseFromString(payload)
+            return {p.positionId: p for p in res.position}
+
+        protos, proto_bytes, proto_dt = measure(as_proto)
+
+        def as_records():
+            return {pid: PositionRecord.from_proto(p) for pid, p in protos.items()}
+
+        records, rec_bytes, rec_dt = measure(as_records)
+
+        def as_book():
+            book = PositionBook(capacity=n)
+            book.rebuild(records.values())
+            return book
+
+        _book, book_bytes, book_dt = measure(as_book)
+
+        for label, b, dt in (
+            ("ProtoOAPosition (retained)", proto_bytes, proto_dt),
+            ("PositionRecord (__slots__)", rec_bytes, rec_dt),
+            ("PositionBook arrays", book_bytes, book_dt),
+        ):
+            print(f"{n:>9}  {label:<28} {b / 1024:>8.0f}KB {b / n:>7.0f} B {dt * 1e3:>7.1f}ms")
+        print(f"{'':>9}  records use x{proto_bytes / max(1, rec_bytes):.1f} less memory than retained messages\n")
+
+
+if __name__ == "__main__":
+    main()
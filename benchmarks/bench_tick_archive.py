@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+"""
+Tick archive range reads: TickArchive.range (sparse index + zero-copy slice)
+vs a boolean mask over the whole memory-mapped file.
+
+    python benchmarks/bench_tick_archive.py [ticks]
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import numpy as np
+
+from tick_archive import TICK_RECORD, TickArchive
+
+
+def bench(label, fn, repeat):
+    t0 = time.perf_counter()
+    for i in range(repeat):
+        fn(i)
+    per_call = (time.perf_counter() - t0) / repeat
+    print(f"{label:<34} {per_call * 1e6:10.1f} us/call")
+    return per_call
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000_000
+    root = tempfile.mkdtemp(prefix="tick-archive-")
+    try:
+        rng = np.random.default_rng(7)
+        rows = np.empty(n, dtype=TICK_RECORD)
+        rows["ts"] = 1_700_000_000_000 + np.cumsum(rng.integers(0, 400, n))
+        rows["bid"] = 110_000 + np.cumsum(rng.integers(-3, 4, n))
+        rows["ask"] = rows["bid"] + 2
+
+        writer = TickArchive(root=root)
+        t0 = time.perf_counter()
+        for chunk in np.array_split(rows, 100):
+            writer.file(1).append(chunk)
+        writer.close()
+        print(f"{n} ticks, {n * TICK_RECORD.itemsize / 1e6:.0f} MB, "
+              f"appended in {(time.perf_counter() - t0) * 1e3:.0f} ms\n")
+
+        reader = TickArchive(root=root, writable=False)
+        ts = rows["ts"]
+        starts = ts[np.random.default_rng(1).integers(0, n - 1, 200)]
+        span = 60_000   # one minute of ticks
+
+        # sanity: both paths agree
+        for t in starts[:20]:
+            mm = reader.file(1).records()
+            assert np.array_equal(reader.range(1, t, t + span), mm[(mm["ts"] >= t) & (mm["ts"] <= t + span)])
+
+        def scan(i):
+            mm = reader.file(1).records()
+            t = starts[i]
+            return mm[(mm["ts"] >= t) & (mm["ts"] <= t + span)]
+
+        a = bench("  full scan (boolean mask)", scan, 20)
+        b = bench("  range() (index + slice)", lambda i: reader.range(1, starts[i], starts[i] + span), 200)
+        print(f"  speedup x{a / b:.0f}")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+"""
+Tick decode throughput for a ProtoOAGetTickDataRes payload:
+parse + per-tick loop vs parse + decode_tick_data vs decode_tick_payload (bytes).
+
+    python benchmarks/bench_tick_decoder.py [ticks]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import numpy as np
+from ctrader_open_api.messages.OpenApiMessages_pb2 import ProtoOAGetTickDataRes
+
+from tick_decoder import decode_tick_data, decode_tick_payload
+
+
+def make_response(n, seed=7):
+    """Synthetic ProtoOAGetTickDataRes: newest first, first tick absolute, the rest deltas."""
+    rnd = random.Random(seed)
+    ts, px = 1_700_000_000_000, 110_000
+    abs_ticks = []
+    for _ in range(n):
+        abs_ticks.append((ts, px))
+        ts -= rnd.randint(1, 2000)
+        px += rnd.randint(-5, 5)
+    res = ProtoOAGetTickDataRes(ctidTraderAccountId=1, hasMore=False)
+    prev_ts, prev_px = 0, 0
+    for t, p in abs_ticks:
+        tick = res.tickData.add()
+        tick.timestamp = t - prev_ts
+        tick.tick = p - prev_px
+        prev_ts, prev_px = t, p
+    return res, abs_ticks
+
+
+def parse(payload):
+    res = ProtoOAGetTickDataRes()
+    res.ParseFromString(payload)
+    return res
+
+
+def loop_decode(res, digits=5):
+    ts, px = [], []
+    t = p = 0
+    for tick in res.tickData:
+        t += tick.timestamp
+        p += tick.tick
+        ts.append(t)
+        px.append(p / 10 ** digits)
+    ts.reverse()
+    px.reverse()
+    return ts, px
+
+
+def bench(label, fn, n, repeat):
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    per_call = (time.perf_counter() - t0) / repeat
+    print(f"{label:<34} {per_call * 1e3:9.2f} ms/call  {n / per_call / 1e6:8.2f} M ticks/s")
+    return per_call
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    res, abs_ticks = make_response(n)
+    payload = res.SerializeToString()
+
+    # sanity: all paths agree with the generated absolute series
+    expect = abs_ticks[::-1]
+    ts, px, _ = decode_tick_payload(payload)
+    assert np.array_equal(ts, np.array([t for t, _ in expect], dtype=np.int64))
+    assert np.allclose(px, np.array([p for _, p in expect]) / 1e5)
+    assert np.array_equal(decode_tick_data(res)[0], ts)
+    assert loop_decode(res)[0] == ts.tolist()
+
+    print(f"{n} ticks, {len(payload) / 1e6:.1f} MB payload\n")
+    a = bench("  parse + per-tick loop", lambda: loop_decode(parse(payload)), n, 3)
+    b = bench("  parse + decode_tick_data", lambda: decode_tick_data(parse(payload)), n, 3)
+    c = bench("  decode_tick_payload (bytes)", lambda: decode_tick_payload(payload), n, 3)
+    print(f"  speedup x{a / b:.1f} (columns), x{a / c:.1f} (payload)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+"""
+Trendbar decode throughput for a ProtoOAGetTrendbarsRes payload:
+parse + per-bar loop vs parse + decode_trendbars vs decode_trendbar_payload (bytes).
+
+    python benchmarks/bench_trendbar_decoder.py [bars]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import numpy as np
+from ctrader_open_api.messages.OpenApiMessages_pb2 import ProtoOAGetTrendbarsRes
+
+from trendbar_decoder import BAR_DTYPE, decode_trendbar_payload, decode_trendbars
+
+
+def make_response(n, seed=7):
+    """Synthetic M1 ProtoOAGetTrendbarsRes; ~10% of bars leave a zero delta unset, as optional fields may be."""
+    rnd = random.Random(seed)
+    res = ProtoOAGetTrendbarsRes(ctidTraderAccountId=1, period=1, timestamp=0, symbolId=1)
+    minute, low = 28_000_000, 110_000
+    for _ in range(n):
+        bar = res.trendbar.add()
+        bar.utcTimestampInMinutes = minute
+        bar.low = low
+        bar.deltaHigh = rnd.randint(0, 40)
+        if rnd.random() > 0.1:
+            bar.deltaOpen = rnd.randint(0, bar.deltaHigh)
+        bar.deltaClose = rnd.randint(0, bar.deltaHigh)
+        bar.volume = rnd.randint(1, 500)
+        minute += 1
+        low = max(1, low + rnd.randint(-20, 20))
+    return res
+
+
+def parse(payload):
+    res = ProtoOAGetTrendbarsRes()
+    res.ParseFromString(payload)
+    return res
+
+
+def loop_decode(res, digits=5):
+    scale = 10.0 ** digits
+    out = np.empty(len(res.trendbar), dtype=BAR_DTYPE)
+    for i, bar in enumerate(res.trendbar):
+        low = bar.low
+        out[i] = (bar.utcTimestampInMinutes * 60_000,
+                  (low + bar.deltaOpen) / scale, (low + bar.deltaHigh) / scale,
+                  low / scale, (low + bar.deltaClose) / scale, bar.volume)
+    return out
+
+
+def bench(label, fn, n, repeat):
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    per_call = (time.perf_counter() - t0) / repeat
+    print(f"{label:<36} {per_call * 1e3:9.2f} ms/call  {n / per_call / 1e6:8.2f} M bars/s")
+    return per_call
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    res = make_response(n)
+    payload = res.SerializeToString()
+
+    # sanity: all paths agree
+    expect = loop_decode(res)
+    assert np.array_equal(decode_trendbar_payload(payload), expect)
+    assert np.array_equal(decode_trendbars(res), expect)
+
+    print(f"{n} bars, {len(payload) / 1e6:.1f} MB payload\n")
+    a = bench("  parse + per-bar loop", lambda: loop_decode(parse(payload)), n, 3)
+    b = bench("  parse + decode_trendbars", lambda: decode_trendbars(parse(payload)), n, 3)
+    c = bench("  decode_trendbar_payload (bytes)", lambda: decode_trendbar_payload(payload), n, 3)
+    print(f"  speedup x{a / b:.1f} (columns), x{a / c:.1f} (payload)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+# feed_health.py
+import time
+from typing import Callable, Dict, Iterable, List, Tuple
+
+
+class FeedHealthMonitor:
+    """
+    Watches per-symbol spot feeds and repairs the ones that went quiet.
+
+    on_ticks() records the arrival time of each applied quote and keeps an
+    EWMA of the gap between quotes, i.e. the symbol's own expected rate.
+    check() (every `check_interval` seconds) flags a subscribed symbol as
+    stale once it has been silent for `stale_factor` x its usual gap,
+    clamped to [min_stale, max_stale]; symbols that never ticked get
+    `first_tick_grace` seconds. Stale symbols are repaired with a targeted
+    unsubscribe/resubscribe through the subscription manager. Repeated
+    repairs of the same symbol back off exponentially (closed markets stay
+    quiet no matter what we do).
+    """
+
+    def __init__(
+        self,
+        *,
+        reactor,
+        subscriptions,                      # SpotSubscriptions
+        name_for: Callable[[int], str] = str,
+        check_interval: float = 5.0,
+        stale_factor: float = 20.0,
+        min_stale: float = 30.0,
+        max_stale: float = 300.0,
+        first_tick_grace: float = 20.0,
+        repair_backoff: float = 60.0,
+        repair_backoff_max: float = 900.0,
+        ewma_alpha: float = 0.1,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.reactor = reactor
+        self.subscriptions = subscriptions
+        self.name_for = name_for
+        self.check_interval = check_interval
+        self.stale_factor = stale_factor
+        self.min_stale = min_stale
+        self.max_stale = max_stale
+        self.first_tick_grace = first_tick_grace
+        self.repair_backoff = repair_backoff
+        self.repair_backoff_max = repair_backoff_max
+        self.ewma_alpha = ewma_alpha
+        self.clock = clock
+
+        self._last_tick: Dict[int, float] = {}
+        self._gap: Dict[int, float] = {}            # EWMA seconds between quotes
+        self._watch_since: Dict[int, float] = {}    # subscribed, no tick yet
+        self._next_repair: Dict[int, float] = {}
+        self._repair_count: Dict[int, int] = {}
+        self._stale: Dict[int, float] = {}          # symbolId -> silent for (s), as of last check
+        self._call = None
+
+        # counters
+        self.repairs = 0
+        self.recoveries = 0
+
+    # ---------------- lifecycle ----------------
+
+    def start(self) -> None:
+        if self._call is None or not self._call.active():
+            self._call = self.reactor.callLater(self.check_interval, self._tick)
+
+    def stop(self) -> None:
+        if self._call is not None and self._call.active():
+            self._call.cancel()
+        self._call = None
+
+    def _tick(self) -> None:
+        self._call = None
+        try:
+            self.check()
+        finally:
+            self.start()
+
+    # ---------------- inputs ----------------
+
+    def on_ticks(self, symbol_ids: Iterable[int]) -> None:
+        now = self.clock()
+        last_tick, gap, a = self._last_tick, self._gap, self.ewma_alpha
+        for sid in symbol_ids:
+            prev = last_tick.get(sid)
+            last_tick[sid] = now
+            if prev is not None:
+                g = gap.get(sid)
+                gap[sid] = (now - prev) if g is None else (a * (now - prev) + (1.0 - a) * g)
+            if sid in self._stale:
+                del self._stale[sid]
+                self._repair_count.pop(sid, None)
+                self._next_repair.pop(sid, None)
+                self.recoveries += 1
+            self._watch_since.pop(sid, None)
+
+    # ---------------- detection / repair ----------------
+
+    def threshold(self, symbol_id: int) -> float:
+        g = self._gap.get(symbol_id)
+        if g is None:
+            return self.min_stale
+        return min(self.max_stale, max(self.min_stale, self.stale_factor * g))
+
+    def check(self) -> List[int]:
+        """Re-evaluate every subscribed symbol; repair the stale ones. Returns the repaired ids."""
+        now = self.clock()
+        live = self.subscriptions.subscribed_symbols()
+        live_set = set(live)
+        for table in (self._stale, self._watch_since):
+            for sid in [sid for sid in table if sid not in live_set]:
+                del table[sid]
+
+        to_repair = []
+        for sid in live:
+            if not self.subscriptions.is_confirmed(sid):
+                continue   # still waiting for ProtoOASubscribeSpotsRes
+            last = self._last_tick.get(sid)
+            if last is None:
+                since = self._watch_since.setdefault(sid, now)
+                silent, limit = now - since, self.first_tick_grace
+            else:
+                silent, limit = now - last, self.threshold(sid)
+            if silent <= limit:
+                self._stale.pop(sid, None)
+                continue
+            self._stale[sid] = silent
+            if now >= self._next_repair.get(sid, 0.0):
+                to_repair.append(sid)
+
+        if to_repair:
+            for sid in to_repair:
+                n = self._repair_count[sid] = self._repair_count.get(sid, 0) + 1
+                self._next_repair[sid] = now + min(self.repair_backoff_max, self.repair_backoff * 2 ** (n - 1))
+                self._watch_since[sid] = now
+            self.repairs += len(to_repair)
+            self.subscriptions.resubscribe(to_repair)
+        return to_repair
+
+    # ---------------- reporting ----------------
+
+    def stale_symbols(self) -> List[Tuple[int, float]]:
+        """(symbolId, silent seconds) for the currently stale symbols, longest first."""
+        return sorted(self._stale.items(), key=lambda kv: -kv[1])
+
+    def is_stale(self, symbol_id: int) -> bool:
+        return symbol_id in self._stale
+
+    def last_tick_age(self, symbol_id: int):
+        last = self._last_tick.get(symbol_id)
+        return None if last is None else self.clock() - last
+
+    def label(self, limit: int = 3) -> str:
+        stale = self.stale_symbols()
+        if not stale:
+            return f"feed ok · {self.repairs} repairs" if self.repairs else "feed ok"
+        names = ", ".join(f"{self.name_for(sid)} {age:.0f}s" for sid, age in stale[:limit])
+        more = f" +{len(stale) - limit}" if len(stale) > limit else ""
+        return f"feed: {len(stale)} stale ({names}{more}) · {self.repairs} repairs"
@@ -0,0 +1,172 @@
+# frame_recorder.py
+import atexit
+import datetime
+import os
+import struct
+import threading
+import time
+from collections import deque
+from typing import BinaryIO, Iterator, Optional, Tuple
+
+from ctrader_open_api.messages.OpenApiCommonMessages_pb2 import ProtoMessage
+
+FRAME_RECORD_DIR = os.getenv("FRAME_RECORD_DIR", "")    # empty: no recording
+
+INBOUND, OUTBOUND = 0, 1
+MAGIC = b"CTFRAME1"
+_HEADER = struct.Struct("<8sqq")      # magic, wall clock at start (ns), monotonic clock at start (ns)
+_RECORD = struct.Struct("<IBq")       # frame length, direction, monotonic timestamp (ns)
+
+Frame = Tuple[int, int, ProtoMessage]   # (direction, monotonic ns, message)
+
+
+class FrameRecorder:
+    """
+    Records every inbound and outbound ProtoMessage for later replay.
+
+    File layout: a header (_HEADER) and then one record per frame, each a
+    _RECORD prefix (frame length, direction, time.monotonic_ns()) followed by
+    the serialized ProtoMessage, i.e. the bytes that went over the wire
+    without the Int32 length prefix.
+
+    inbound()/outbound() only take the timestamp and append a reference to
+    an in-memory queue. Serialization (outbound requests are still bare
+    messages at that point) and file I/O both happen on a background writer
+    thread that drains the queue in batches into a buffered file. When the
+    writer falls more than `capacity` frames behind, new frames are dropped
+    and counted instead of growing memory without bound.
+    """
+
+    def __init__(self, path: str, capacity: int = 200_000, buffer_bytes: int = 1 << 20):
+        self.path = path
+        self.capacity = capacity
+        self._queue: deque = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._file: BinaryIO = open(path, "wb", buffering=buffer_bytes)
+        self._file.write(_HEADER.pack(MAGIC, time.time_ns(), time.monotonic_ns()))
+
+        # counters
+        self.recorded = 0       # queued by the reactor thread
+        self.written = 0
+        self.bytes_written = 0
+        self.dropped = 0
+
+        self._thread = threading.Thread(target=self._run, name="frame-recorder", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    @classmethod
+    def in_directory(cls, directory: str, **kwargs) -> "FrameRecorder":
+        os.makedirs(directory, exist_ok=True)
+        stamp = datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%d-%H%M%S")
+        return cls(os.path.join(directory, f"session-{stamp}.frames"), **kwargs)
+
+    # ---------------- capture (reactor thread) ----------------
+
+    def inbound(self, message: ProtoMessage) -> None:
+        self._put((INBOUND, time.monotonic_ns(), message, None))
+
+    def outbound(self, request, clientMsgId: Optional[str] = None) -> None:
+        self._put((OUTBOUND, time.monotonic_ns(), request, clientMsgId))
+
+    def _put(self, item) -> None:
+        if self._closed:
+            return
+        if len(self._queue) >= self.capacity:
+            self.dropped += 1
+            return
+        self._queue.append(item)    # deque.append is atomic; no lock on the hot path
+        self.recorded += 1
+        if len(self._queue) == 1:
+            with self._cond:
+                self._cond.notify()
+
+    # ---------------- writer thread ----------------
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._queue and not self._closed:
+                    self._cond.wait(0.5)
+                if not self._queue and self._closed:
+                    return
+            self._drain()
+            if not self._queue:
+                self._file.flush()
+
+    def _drain(self) -> None:
+        q, write, pack = self._queue, self._file.write, _RECORD.pack
+        while q:
+            direction, t_ns, message, client_msg_id = q.popleft()
+            if isinstance(message, ProtoMessage):
+                data = message.SerializeToString()
+            else:
+                data = ProtoMessage(payloadType=message.payloadType, payload=message.SerializeToString(),
+                                    clientMsgId=client_msg_id).SerializeToString()
+            write(pack(len(data), direction, t_ns))
+            write(data)
+            self.written += 1
+            self.bytes_written += _RECORD.size + len(data)
+
+    def close(self) -> None:
+        """Write everything still queued and close the file (idempotent)."""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify()
+        # no timeout: draining here while the writer is still in _drain() would
+        # have two threads popping the queue and writing the file at once
+        self._thread.join()
+        self._drain()    # writer is gone; picks up frames queued as it exited
+        self._file.close()
+
+    # ---------------- reporting ----------------
+
+    @property
+    def backlog(self) -> int:
+        return len(self._queue)
+
+    def stats(self) -> dict:
+        return {
+            "path": self.path,
+            "recorded": self.recorded,
+            "written": self.written,
+            "bytes": self.bytes_written,
+            "backlog": self.backlog,
+            "dropped": self.dropped,
+        }
+
+    def label(self) -> str:
+        dropped = f" · {self.dropped} dropped" if self.dropped else ""
+        return f"rec {self.written} frames {self.bytes_written / 1e6:.1f}MB{dropped}"
+
+
+def read_frames(path: str) -> Iterator[Frame]:
+    """Yield (direction, monotonic ns, ProtoMessage) from a recording; stops at a truncated tail."""
+    with open(path, "rb") as f:
+        head = f.read(_HEADER.size)
+        if len(head) < _HEADER.size or _HEADER.unpack(head)[0] != MAGIC:
+            raise ValueError(f"{path}: not a frame recording")
+        read, unpack, size = f.read, _RECORD.unpack, _RECORD.size
+        while True:
+            prefix = read(size)
+            if len(prefix) < size:
+                return
+            length, direction, t_ns = unpack(prefix)
+            data = read(length)
+            if len(data) < length:
+                return
+            message = ProtoMessage()
+            message.ParseFromString(data)
+            yield direction, t_ns, message
+
+
+def recording_start(path: str) -> Tuple[int, int]:
+    """(wall clock ns, monotonic ns) at the start of a recording."""
+    with open(path, "rb") as f:
+        magic, wall_ns, mono_ns = _HEADER.unpack(f.read(_HEADER.size))
+    if magic != MAGIC:
+        raise ValueError(f"{path}: not a frame recording")
+    return wall_ns, mono_ns
@@ -0,0 +1,91 @@
+# frame_scheduler.py
+import time
+from typing import Callable, Dict
+
+
+class FrameScheduler:
+    """
+    Single render scheduler for the live viewer.
+
+    Every render request (ticks, PnL responses, reconcile, key presses) goes
+    through request(); requests made between two frames only set a dirty flag
+    and collapse into one draw. Frames are capped at max_fps, except priority
+    (input) requests which jump the queue and draw on the next reactor turn.
+
+    Must be called from the reactor thread; use request_from_thread() from the
+    key listener.
+    """
+
+    def __init__(
+        self,
+        *,
+        reactor,
+        render: Callable[[], None],
+        max_fps: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.reactor = reactor
+        self.render = render
+        self.clock = clock
+        self.min_interval = 0.0
+        self.set_max_fps(max_fps)
+
+        self._dirty = False
+        self._call = None              # pending DelayedCall, if any
+        self._call_is_priority = False
+        self._last_draw = 0.0
+
+        # counters
+        self.requested = 0
+        self.priority_requested = 0
+        self.drawn = 0
+
+    def set_max_fps(self, max_fps: float) -> None:
+        self.min_interval = (1.0 / max_fps) if max_fps and max_fps > 0 else 0.0
+
+    def request(self, priority: bool = False) -> None:
+        self.requested += 1
+        if priority:
+            self.priority_requested += 1
+        self._dirty = True
+
+        if self._call is not None and self._call.active():
+            if not priority or self._call_is_priority:
+                return  # coalesced into the pending frame
+            self._call.cancel()  # input render jumps ahead of the FPS wait
+
+        if priority:
+            delay = 0.0
+        else:
+            delay = max(0.0, self._last_draw + self.min_interval - self.clock())
+        self._call_is_priority = priority
+        self._call = self.reactor.callLater(delay, self._draw)
+
+    def request_from_thread(self, priority: bool = False) -> None:
+        self.reactor.callFromThread(self.request, priority)
+
+    def cancel(self) -> None:
+        """Drop any pending frame (viewer closed)."""
+        if self._call is not None and self._call.active():
+            self._call.cancel()
+        self._call = None
+        self._dirty = False
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "requested": self.requested,
+            "priority": self.priority_requested,
+            "drawn": self.drawn,
+            "coalesced": max(0, self.requested - self.drawn),
+        }
+
+    # ---------------- internals ----------------
+
+    def _draw(self) -> None:
+        self._call = None
+        if not self._dirty:
+            return
+        self._dirty = False
+        self._last_draw = self.clock()
+        self.drawn += 1
+        self.render()
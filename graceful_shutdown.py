@@ -21,6 +21,8 @@ class ShutdownManager:
       - stop_live_ui(): -> None    (stop Rich Live, set flags, etc.)
 
     Optional:
+      - flush_output(): -> None    (drain background log/output writers;
+                                    hard_exit() skips atexit hooks)
       - restore_tty() is handled if you call set_tty_old_settings(...)
         from your key-listener when entering cbreak mode.
     """
@@ -34,6 +36,7 @@ class ShutdownManager:
         unsubscribe_symbol: Callable[[int], None],
         account_logout: Callable[[], None],
         stop_live_ui: Callable[[], None],
+        flush_output: Callable[[], None] = lambda: None,
     ):
         self.reactor = reactor
         self.client = client
@@ -41,6 +44,7 @@ class ShutdownManager:
         self.unsubscribe_symbol = unsubscribe_symbol
         self.account_logout = account_logout
         self.stop_live_ui = stop_live_ui
+        self.flush_output = flush_output
 
         self._shutting_down = False
         self._tty_old_settings: Optional[tuple] = None
@@ -116,6 +120,12 @@ class ShutdownManager:
             # 6) restore terminal mode if needed
             self._restore_tty()
 
+            # 7) drain background writers (logs, viewer output)
+            try:
+                self.flush_output()
+            except Exception:
+                pass
+
         except Exception:
             # swallow all exceptions on shutdown
             pass
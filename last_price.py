@@ -0,0 +1,135 @@
+# last_price.py
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from twisted.internet import defer
+from ctrader_open_api.messages.OpenApiMessages_pb2 import ProtoOAGetTickDataRes
+
+from tick_decoder import decode_tick_payload
+
+# trailing windows tried in order (seconds); weekends need the last one
+BOOTSTRAP_WINDOWS = (60, 15 * 60, 4 * 3600, 24 * 3600, 3 * 24 * 3600)
+
+Price = Tuple[float, float]
+
+
+class LastPriceBootstrap:
+    """
+    One-off "what is the price right now" for symbols without a live quote yet.
+
+    Replaces requesting a full day of ticks per symbol: request() asks for
+    BOOTSTRAP_WINDOWS[0] seconds of BID ticks and only widens to the next
+    window when that came back empty. ProtoOAGetTickDataRes has no symbolId,
+    so each response is matched to its symbol through the request's Deferred
+    (clientMsgId). Concurrent request()s for one symbol share a single
+    download; results are cached and handed to `apply` until the symbol's
+    first live tick arrives, after which live prices win and late bootstrap
+    answers are dropped.
+    """
+
+    def __init__(
+        self,
+        *,
+        request_ticks: Callable[[int, str, int, int], defer.Deferred],  # (symbolId, "BID", from_ms, to_ms)
+        apply: Callable[[int, float, float], None],
+        pips_for: Callable[[int], int] = lambda sid: 5,
+        windows: Iterable[int] = BOOTSTRAP_WINDOWS,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.request_ticks = request_ticks
+        self.apply = apply
+        self.pips_for = pips_for
+        self.windows = tuple(windows)
+        self.clock = clock
+
+        self._cache: Dict[int, Price] = {}
+        self._inflight: Dict[int, List[defer.Deferred]] = {}
+        self._live: Set[int] = set()
+
+        # counters
+        self.requests = 0
+        self.widened = 0
+        self.deduped = 0
+        self.cache_hits = 0
+        self.empty = 0
+
+    def request(self, symbol_id: int) -> defer.Deferred:
+        """Fires with (bid, ask), or None if no price could be found / a live tick got there first."""
+        symbol_id = int(symbol_id)
+        if symbol_id in self._live:
+            return defer.succeed(None)
+        cached = self._cache.get(symbol_id)
+        if cached is not None:
+            self.cache_hits += 1
+            return defer.succeed(cached)
+
+        d = defer.Deferred()
+        waiters = self._inflight.get(symbol_id)
+        if waiters is not None:
+            self.deduped += 1
+            waiters.append(d)
+            return d
+        self._inflight[symbol_id] = [d]
+        self._fetch(symbol_id, 0)
+        return d
+
+    def request_many(self, symbol_ids: Iterable[int]) -> None:
+        for sid in symbol_ids:
+            self.request(sid)
+
+    def on_live_ticks(self, symbol_ids: Iterable[int]) -> None:
+        for sid in symbol_ids:
+            if sid not in self._live:
+                self._live.add(sid)
+                self._cache.pop(sid, None)
+
+    def cached(self, symbol_id: int) -> Optional[Price]:
+        return self._cache.get(symbol_id)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "requests": self.requests,
+            "widened": self.widened,
+            "deduped": self.deduped,
+            "cache_hits": self.cache_hits,
+            "empty": self.empty,
+            "inflight": len(self._inflight),
+            "cached": len(self._cache),
+        }
+
+    # ---------------- internals ----------------
+
+    def _fetch(self, symbol_id: int, window_idx: int) -> None:
+        to_ms = int(self.clock() * 1000)
+        from_ms = to_ms - self.windows[window_idx] * 1000
+        self.requests += 1
+        d = self.request_ticks(symbol_id, "BID", from_ms, to_ms)
+        d.addCallbacks(self._on_response, self._on_failure,
+                       callbackArgs=(symbol_id, window_idx), errbackArgs=(symbol_id,))
+
+    def _on_response(self, message, symbol_id: int, window_idx: int) -> None:
+        if getattr(message, "payloadType", None) != ProtoOAGetTickDataRes().payloadType:
+            return self._finish(symbol_id, None)     # error response for our clientMsgId
+        _, prices, _ = decode_tick_payload(message.payload, self.pips_for(symbol_id))
+        if not len(prices):
+            if symbol_id not in self._live and window_idx + 1 < len(self.windows):
+                self.widened += 1
+                self._fetch(symbol_id, window_idx + 1)
+                return
+            self.empty += 1
+            return self._finish(symbol_id, None)
+
+        price = float(prices[-1])   # oldest first: the last one is the newest
+        quote = (price, price)   # BID ticks only; mirrored like one-sided spot events
+        if symbol_id in self._live:
+            return self._finish(symbol_id, None)
+        self._cache[symbol_id] = quote
+        self.apply(symbol_id, *quote)
+        self._finish(symbol_id, quote)
+
+    def _on_failure(self, _failure, symbol_id: int) -> None:
+        self._finish(symbol_id, None)
+
+    def _finish(self, symbol_id: int, result) -> None:
+        for d in self._inflight.pop(symbol_id, ()):
+            d.callback(result)
@@ -1,6 +1,7 @@
 
 #!/usr/bin/env python
 import traceback
+import argparse
 from ctrader_open_api import Client, Protobuf, TcpProtocol, Auth, EndPoints
 
 from types import SimpleNamespace  # (you already have this import)
@@ -15,7 +16,7 @@ from prompt_toolkit.shortcuts import radiolist_dialog
 from ctrader_open_api.messages.OpenApiCommonMessages_pb2 import *
 from ctrader_open_api.messages.OpenApiMessages_pb2 import *
 from ctrader_open_api.messages.OpenApiModelMessages_pb2 import *
-from twisted.internet import reactor
+from twisted.internet import reactor, defer
 from inputimeout import inputimeout, TimeoutOccurred
 from datetime import datetime, timezone, timedelta
 import datetime
@@ -33,8 +34,24 @@ import contextlib
 import threading
 from colorama import Fore, Style
 from graceful_shutdown import ShutdownManager
+from frame_scheduler import FrameScheduler
+from position_book import PositionBook
 import ui_helpers as H
-from message_handlers import dispatch_message
+from message_handlers import dispatch_message, dispatch_stats, apply_spot_batch, apply_bootstrap_price
+from tick_conflator import TickConflator
+from output_sink import sink as outputSink, emit
+from queued_logging import setup_logging, EXEC_EVENTS_LOGGER
+from refresh_scheduler import RefreshScheduler
+from outbound_scheduler import OutboundScheduler, LANE_POLL
+from request_tracker import RequestTracker
+from spot_subscriptions import SpotSubscriptions, OWNER_POSITIONS, OWNER_BOARD
+from feed_health import FeedHealthMonitor
+from last_price import LastPriceBootstrap
+from tick_history import TickHistoryDownloader, quote_types
+from trendbar_store import TrendbarStore
+from tick_archive import TickArchive, TICK_ARCHIVE_DIR
+from frame_recorder import FrameRecorder, FRAME_RECORD_DIR
+from replay import ReplayClient, ReplayEngine
 
 console = Console(emoji=False)
 live = None
@@ -43,11 +60,15 @@ pendingReconciliations = set()
 symbolIdToName = {}
 symbolIdToPrice = {}  # Symbol ID -> (bid, ask)
 symbolIdToPips = {}  # Symbol ID -> pipsPosition
-subscribedSymbols = set()
-expectedSpotSubscriptions = 0
-receivedSpotConfirmations = 0
 positionsById = {}
 positionPnLById = {}
+positionIdsBySymbol = {}  # symbolId -> set(positionId)
+
+def _contract_size(symbol_id: int):
+    # None until the symbol details arrive: no tick-derived PnL on a guessed contract size
+    return (symbolIdToDetails.get(symbol_id) or {}).get("contractSize") or None
+
+positionBook = PositionBook(contract_size_for=_contract_size)  # array copy of positionsById for PnL math
 showStartupOutput = False
 liveViewerActive = False
 symbolIdToDetails = {}
@@ -57,9 +78,7 @@ error_messages = []
 view_offset = 0
 #
 
-RENDER_MIN_INTERVAL = 0.02
-_last_render = 0.0
-_render_pending = False
+RENDER_MAX_FPS = 30.0  # override with LIVE_MAX_FPS in .env
 
 #
 
@@ -71,25 +90,28 @@ slInput = {                    # inline input state
     "positionId": None,
     "buffer": ""
 }
-H.init_ordering(positionsById, positionPnLById)
-
-# Configure logging
-logging.basicConfig(
-    filename="close_position_errors.log",
-    filemode="a",
-    format="%(asctime)s [%(levelname)s] %(message)s",
-    datefmt="%Y-%m-%d %H:%M:%S",
-    level=logging.INFO
-)
+H.init_ordering(positionsById, positionPnLById, symbolIdToName)
+
+# Configure logging: queued, written by a background thread (close_position_errors.log, exec_event_errors.log)
+queuedLogging = setup_logging()
+execEventLog = logging.getLogger(EXEC_EVENTS_LOGGER)
 
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="cTrader Open API CLI")
+    parser.add_argument("--replay", metavar="FRAMES", help="replay a FRAME_RECORD_DIR recording instead of connecting")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="replay pacing: 1 = real time, N = N times faster, 0 = as fast as possible")
+    parser.add_argument("--headless", action="store_true",
+                        help="replay without the live viewer, print throughput and exit")
+    cliArgs = parser.parse_args()
+
     load_dotenv()
     accountIdsEnv = os.getenv("ACCOUNT_IDS", "")
     envAccountIds = [int(acc.strip()) for acc in accountIdsEnv.split(",") if acc.strip().isdigit()]
 
-    while True:
+    while not cliArgs.replay:
         hostType = input("Host (Live/Demo): ").strip().lower()
         if hostType in ["live", "demo"]:
             break
@@ -99,12 +121,45 @@ if __name__ == "__main__":
     appClientSecret = os.getenv("CLIENT_SECRET")
     accessToken = os.getenv("ACCESS_TOKEN")
 
-    client = Client(EndPoints.PROTOBUF_LIVE_HOST if hostType.lower() == "live" else EndPoints.PROTOBUF_DEMO_HOST, EndPoints.PROTOBUF_PORT, TcpProtocol)
+    if cliArgs.replay:
+        # recorded frames drive dispatch_message; requests go nowhere
+        client = ReplayClient()
+        replayEngine = ReplayEngine(
+            cliArgs.replay,
+            reactor=reactor,
+            deliver=client.received,
+            speed=cliArgs.speed,
+            on_done=lambda: _on_replay_done(),
+        )
+    else:
+        client = Client(EndPoints.PROTOBUF_LIVE_HOST if hostType.lower() == "live" else EndPoints.PROTOBUF_DEMO_HOST, EndPoints.PROTOBUF_PORT, TcpProtocol)
+        replayEngine = None
+    # optional capture of every inbound/outbound frame for replay (FRAME_RECORD_DIR)
+    frameRecorder = FrameRecorder.in_directory(FRAME_RECORD_DIR) if FRAME_RECORD_DIR and not replayEngine else None
+
+    def _client_send(request, clientMsgId=None, **kwargs):
+        if frameRecorder is not None:
+            frameRecorder.outbound(request, clientMsgId)
+        return client.send(request, clientMsgId=clientMsgId, **kwargs)
+
+    # every request goes through here: rate budgets + priority lanes
+    # replayed responses carry the recorded session's cli-<n> ids; a separate prefix keeps them unmatched
+    requestTracker = RequestTracker(prefix="replay" if replayEngine else "cli")
+    outbound = OutboundScheduler(reactor=reactor, send=_client_send, tracker=requestTracker)
+
+    def _set_live_viewer_active(active: bool) -> None:
+        global liveViewerActive
+        liveViewerActive = active
+        ctx.liveViewerActive = active  # handlers read the flag through ctx
+        outputSink.set_viewer_active(active)
+        if not active:
+            renderScheduler.cancel()
+            refreshScheduler.stop()
 
     def _stop_live_ui():
-        global liveViewerActive, live
+        global live
         try:
-            liveViewerActive = False
+            _set_live_viewer_active(False)
         except Exception:
             pass
         try:
@@ -125,10 +180,12 @@ if __name__ == "__main__":
     shutdown = ShutdownManager(
         reactor=reactor,
         client=client,
-        get_subscribed_symbols=lambda: list(subscribedSymbols),
-        unsubscribe_symbol=lambda sid: sendProtoOAUnsubscribeSpotsReq(sid),
+        get_subscribed_symbols=lambda: spotSubscriptions.subscribed_symbols(),
+        unsubscribe_symbol=lambda sid: _send_spot_unsubscription(sid),
         account_logout=lambda: sendProtoOAAccountLogoutReq(),
         stop_live_ui=_stop_live_ui,
+        flush_output=lambda: (outputSink.close(), queuedLogging.stop(), tickArchive and tickArchive.close(),
+                              frameRecorder and frameRecorder.close()),
     )
     shutdown.install_signal_handlers()
     
@@ -147,13 +204,6 @@ if __name__ == "__main__":
         reactor.callLater(0, executeUserCommand)
 
 
-    def refreshSpotPrices():
-        if not isAccountInitialized(currentAccountId):
-            return
-        for symbolId in subscribedSymbols.copy():
-            sendProtoOASubscribeSpotsReq(symbolId)
-        reactor.callLater(15, refreshSpotPrices)
-
     def connected(client):
         print("\nConnected")
         request = ProtoOAApplicationAuthReq()
@@ -165,12 +215,14 @@ if __name__ == "__main__":
 #             print("📥 Fetching available accounts from access token...")
             sendProtoOAGetAccountListByAccessTokenReq()
 
-        deferred = client.send(request)
+        deferred = outbound.send(request)
         deferred.addCallback(onAppAuthSuccess)
         deferred.addErrback(onError)
 
     def disconnected(client, reason):
         print(f"🔌 Disconnected: {reason}")
+        spotSubscriptions.reset()     # first, so the cancelled batches below are recognised as stale
+        outbound.clear()
         if shutdown.shutting_down:
             return
         print("🔁 Attempting reconnect in 5s...")
@@ -178,7 +230,7 @@ if __name__ == "__main__":
 
 
     def promptUserToSelectAccount():
-        print("\n👉 Select the account you want to activate:")
+        emit("\n👉 Select the account you want to activate:")
         for idx, accId in enumerate(availableAccounts, 1):
             trader = accountTraderInfo.get(accId)
             meta = accountMetadata.get(accId, {})
@@ -186,9 +238,9 @@ if __name__ == "__main__":
             broker = meta.get("broker", "?")
             currency = meta.get("currency", "?")
             if trader:
-                print(f" {idx}. {accId} — [{is_live}] Equity: {trader.equity / 100:.2f}, Free Margin: {trader.freeMargin / 100:.2f}, Broker: {broker}, Currency: {currency}")
+                emit(f" {idx}. {accId} — [{is_live}] Equity: {trader.equity / 100:.2f}, Free Margin: {trader.freeMargin / 100:.2f}, Broker: {broker}, Currency: {currency}")
             else:
-                print(f" {idx}. {accId} — [{is_live}], Broker: {broker}, Currency: {currency}")
+                emit(f" {idx}. {accId} — [{is_live}], Broker: {broker}, Currency: {currency}")
 
         while True:
             try:
@@ -198,26 +250,21 @@ if __name__ == "__main__":
                     setAccount(selectedAccountId)
                     break
                 else:
-                    print("Invalid choice. Try again.")
+                    emit("Invalid choice. Try again.")
             except ValueError:
-                print("Enter a number.")
+                emit("Enter a number.")
 
     #
 
-    def _request_render():
-        global _render_pending
-        if _render_pending:
-            return
-        _render_pending = True
-        reactor.callLater(0, _do_render)
-    
-    def _do_render():
-        global _render_pending
-        _render_pending = False
-        printLivePnLTable()
+    def _request_render(priority: bool = False):
+        renderScheduler.request(priority)
+
+    def _request_input_render():
+        """Key thread -> reactor: input-driven renders skip the FPS wait."""
+        renderScheduler.request_from_thread(priority=True)
 
     def printLivePnLTable():
-        global live, selected_position_index, view_offset, _last_render 
+        global live, selected_position_index, view_offset
         if not live:
             return
 
@@ -241,34 +288,59 @@ if __name__ == "__main__":
             slByPositionId=slByPositionId,              
             account_currency=get_account_ccy(),            
             footer_prompt=prompt_line,   # <- fix
+            header_extra=_frame_stats_label(),
+            footer_stats=" · ".join(filter(None, (feedHealth.label(), requestTracker.footer(),
+                                                  frameRecorder and frameRecorder.label(),
+                                                  replayEngine and replayEngine.label()))),
         )
 #         live.update(view)
         live.update(view, refresh=True)   # instead of just live.update(view)
 
 
+    def _frame_stats_label() -> str:
+        st = renderScheduler.stats()
+        return (f"frames {st['drawn']}/{st['requested']}"
+                f" · ticks {spotConflator.applied_total}/{spotConflator.received_total}"
+                f" · {refreshScheduler.label()}"
+                f" · {outbound.label()}")
+
+    renderScheduler = FrameScheduler(
+        reactor=reactor,
+        render=printLivePnLTable,
+        max_fps=float(os.getenv("LIVE_MAX_FPS", RENDER_MAX_FPS)),
+    )
+
+    # latest raw quote per symbol, applied once per reactor turn (see apply_spot_batch)
+    spotConflator = TickConflator(reactor=reactor, apply=lambda batch: apply_spot_batch(batch, ctx))
+
+    # every raw spot event, before conflation; off unless TICK_ARCHIVE_DIR is set
+    tickArchive = TickArchive(root=TICK_ARCHIVE_DIR, reactor=reactor) if TICK_ARCHIVE_DIR else None
+
     def _update_pnl_cache_for_symbol(symbol_id: int):
         bid, ask = symbolIdToPrice.get(symbol_id, (None, None))
         if bid is None or ask is None:
             return
-        contract_size = (symbolIdToDetails.get(symbol_id, {}) or {}).get("contractSize", 100000) or 100000
-        for pos_id, pos in positionsById.items():
-            if pos.tradeData.symbolId != symbol_id:
-                continue
-            side = H.trade_side_name(pos.tradeData.tradeSide)
-            entry = pos.price
-            lots = pos.tradeData.volume / 100.0
-            mkt = bid if side == "BUY" else ask
-            positionPnLById[pos_id] = (mkt - entry if side == "BUY" else entry - mkt) * lots * contract_size
-        H.mark_positions_dirty()
+        if symbol_id not in positionIdsBySymbol:
+            return
+        # only positions anchored to a server value; the rest keep showing the server's number
+        pos_ids, pnls = positionBook.symbol_pnl(symbol_id, bid, ask, calibrated_only=True)
+        for pos_id, pnl in zip(pos_ids.tolist(), pnls.tolist()):
+            positionPnLById[pos_id] = pnl
+            H.update_position(pos_id)
 
 
     def add_position(pos):
         global selected_position_index, view_offset
         pos_id = pos.positionId
         slByPositionId.setdefault(pos_id, None) 
+        prev = positionsById.get(pos_id)
+        if prev is not None:
+            H.unindex_position(positionIdsBySymbol, pos_id, prev.symbolId)
         positionsById[pos_id] = pos
-        sendProtoOASubscribeSpotsReq(pos.tradeData.symbolId)
-        H.mark_positions_dirty()
+        H.index_position(positionIdsBySymbol, pos_id, pos.symbolId)
+        positionBook.upsert_position(pos)
+        spotSubscriptions.acquire(pos.symbolId, OWNER_POSITIONS)
+        H.update_position(pos_id)
         sendProtoOAGetPositionUnrealizedPnLReq()  # get real PnL 
     
         ops = H.ordered_positions()
@@ -279,26 +351,24 @@ if __name__ == "__main__":
         elif selected_position_index >= total:
             selected_position_index = total - 1
     
-        reactor.callFromThread(printLivePnLTable)
+        _request_render()
 
     
     def log_exec_event_error(res, exc: Exception):
-        """Log errors from ProtoOAExecutionEvent handling to a file for debugging."""
+        """Log errors from ProtoOAExecutionEvent handling to exec_event_errors.log (queued, non-blocking)."""
         try:
-            with open("exec_event_errors.log", "a") as f:
-                f.write("\n" + "="*60 + "\n")
-                f.write("⚠️ Error handling ProtoOAExecutionEvent\n")
-                try:
-                    etype = ProtoOAExecutionType.Name(res.executionType)
-                except Exception:
-                    etype = getattr(res, "executionType", "???")
-                f.write(f"ExecutionType: {etype}\n")
-                f.write(f"OrderId: {getattr(res, 'orderId', 'N/A')}\n")
-                f.write(f"PositionId: {getattr(res, 'positionId', 'N/A')}\n\n")
-                traceback.print_exc(file=f)
+            try:
+                etype = ProtoOAExecutionType.Name(res.executionType)
+            except Exception:
+                etype = getattr(res, "executionType", "???")
+            execEventLog.error(
+                "⚠️ Error handling ProtoOAExecutionEvent\nExecutionType: %s\nOrderId: %s\nPositionId: %s",
+                etype, getattr(res, "orderId", "N/A"), getattr(res, "positionId", "N/A"),
+                exc_info=exc,
+            )
         except Exception as logfail:
             # last resort: print to stderr so it’s not lost
-            print(f"❌ Failed to log exec_event error: {logfail}")
+            emit(f"❌ Failed to log exec_event error: {logfail}")
 
 
     accountTraderInfo = {}  # To store info like balance for each account
@@ -309,32 +379,34 @@ if __name__ == "__main__":
     authInProgress = set()
 
     def fetchTraderInfo(accountId):
-        print(f"🔍 Starting auth flow for account: {accountId}")
+        emit(f"🔍 Starting auth flow for account: {accountId}")
 
         # If fully authorized already
         if accountId in authorizedAccounts:
-            print(f"✅ Already authorized: {accountId}")
+            emit(f"✅ Already authorized: {accountId}")
             sendProtoOAReconcileReq(accountId)
             return
 
         # If auth is already in progress, don’t do it twice
         if accountId in authInProgress:
-            print(f"⏳ Auth already in progress for {accountId}")
+            emit(f"⏳ Auth already in progress for {accountId}")
             return
 
         authInProgress.add(accountId)
 
         def onAuthSuccess(_):
-            print(f"✅ Account {accountId} authorized successfully")
+            emit(f"✅ Account {accountId} authorized successfully")
             authorizedAccounts.add(accountId)
             pendingReconciliations.add(accountId)
+            spotSubscriptions.resync()  # after a reconnect: restore what we still own
+            feedHealth.start()
             reactor.callLater(0.5, sendProtoOAReconcileReq, accountId)
 
         request = ProtoOAAccountAuthReq()
         request.ctidTraderAccountId = accountId
         request.accessToken = accessToken
 
-        deferred = client.send(request)
+        deferred = outbound.send(request)
         deferred.addCallback(onAuthSuccess)
         deferred.addErrback(onError)
 
@@ -363,7 +435,9 @@ if __name__ == "__main__":
 
 
     def onError(failure): # Call back for errors
-        print("Message Error: ", failure)
+        if failure.check(defer.CancelledError):
+            return    # dropped from the outbound queue on disconnect; the reconnect brings the menu back
+        emit("Message Error: ", failure)
         reactor.callLater(3, callable=executeUserCommand)
 
     def showHelp():
@@ -376,10 +450,11 @@ if __name__ == "__main__":
         print("ProtoOASymbolCategoryListReq clientMsgId")
         print("ProtoOASymbolsListReq includeArchivedSymbols(True/False) clientMsgId")
         print("ProtoOATraderReq clientMsgId")
-        print("ProtoOASubscribeSpotsReq *symbolId *timeInSeconds(Unsubscribes after this time) subscribeToSpotTimestamp(True/False) clientMsgId")
+        print("ProtoOASubscribeSpotsReq *symbolId timeInSeconds(Unsubscribes after this time)")
+        print("ProtoOAUnsubscribeSpotsReq *symbolId")
         print("ProtoOAReconcileReq clientMsgId")
-        print("ProtoOAGetTrendbarsReq *weeks *period *symbolId clientMsgId")
-        print("ProtoOAGetTickDataReq *days *type *symbolId clientMsgId")
+        print("GetTrendbars *weeks *period *symbolId (stored in TRENDBAR_DIR; only missing ranges are downloaded)")
+        print("GetTickData *days *type(BID/ASK/BOTH) *symbolId (paged download into TICK_HISTORY_DIR, resumable)")
         print("NewMarketOrder *symbolId *tradeSide *volume clientMsgId")
         print("NewLimitOrder *symbolId *tradeSide *volume *price clientMsgId")
         print("NewStopOrder *symbolId *tradeSide *volume *price clientMsgId")
@@ -389,10 +464,41 @@ if __name__ == "__main__":
         print("GetPositionUnrealizedPnL clientMsgId")
         print("OrderDetails clientMsgId")
         print("OrderListByPositionId *positionId fromTimestamp toTimestamp clientMsgId")
+        print("RequestLatency (round-trip p50/p95/p99 and timeouts per request type)")
 
         reactor.callLater(3, callable=executeUserCommand)
 
 
+    def _start_replay():
+        print(f"⏯️ Replaying {cliArgs.replay} ...")
+        if not cliArgs.headless:
+            launchLivePnLViewer()
+        replayEngine.start()
+
+    def _on_replay_done():
+        if cliArgs.headless:
+            _end_replay()
+        # with the viewer up, the session ends when the user leaves it (q)
+
+    def _end_replay():
+        print("\n⏯️ Replay finished")
+        for line in replayEngine.report_lines():
+            print(line)
+        st = renderScheduler.stats()
+        print(f" frames drawn {st['drawn']}/{st['requested']} · "
+              f"ticks applied {spotConflator.applied_total}/{spotConflator.received_total} · "
+              f"{client.sent} requests suppressed")
+        for name, (count, decode_s) in sorted(dispatch_stats().items(), key=lambda kv: -kv[1][0]):
+            print(f"   {name:<40} {count:>9} msgs  decode {decode_s / count * 1e6 if count else 0:7.1f} us/msg")
+        reactor.callLater(0, reactor.stop)
+
+    def showRequestLatency():
+        print("\n⏱️ Request round-trip latency")
+        for line in requestTracker.report_lines():
+            print(line)
+        returnToMenu()
+
+
     def setAccount(accountId):
         global currentAccountId
         if currentAccountId is not None:
@@ -403,19 +509,19 @@ if __name__ == "__main__":
 
     def sendProtoOAVersionReq(clientMsgId = None):
         request = ProtoOAVersionReq()
-        deferred = client.send(request, clientMsgId = clientMsgId)
+        deferred = outbound.send(request, clientMsgId = clientMsgId)
         deferred.addErrback(onError)
 
     def sendProtoOAGetAccountListByAccessTokenReq(clientMsgId = None):
         request = ProtoOAGetAccountListByAccessTokenReq()
         request.accessToken = accessToken
-        deferred = client.send(request, clientMsgId = clientMsgId)
+        deferred = outbound.send(request, clientMsgId = clientMsgId)
         deferred.addErrback(onError)
 
     def sendProtoOAAccountLogoutReq(clientMsgId = None):
         request = ProtoOAAccountLogoutReq()
         request.ctidTraderAccountId = currentAccountId
-        deferred = client.send(request, clientMsgId = clientMsgId)
+        deferred = outbound.send(request, clientMsgId = clientMsgId)
         deferred.addErrback(onError)
 
 
@@ -430,7 +536,7 @@ if __name__ == "__main__":
 #             sendProtoOAReconcileReq()  # <-- This is essential!
             sendProtoOAReconcileReq(currentAccountId)
 
-        deferred = client.send(request, clientMsgId=clientMsgId)
+        deferred = outbound.send(request, clientMsgId=clientMsgId)
         deferred.addCallback(onAccountAuthSuccess)
         deferred.addErrback(onError)
 
@@ -440,7 +546,7 @@ if __name__ == "__main__":
         print("📤 Requesting asset list...")
         request = ProtoOAAssetListReq()
         request.ctidTraderAccountId = currentAccountId
-        deferred = client.send(request, clientMsgId = clientMsgId)
+        deferred = outbound.send(request, clientMsgId = clientMsgId)
         deferred.addErrback(onError)
 
 
@@ -448,14 +554,14 @@ if __name__ == "__main__":
         global client
         request = ProtoOAAssetClassListReq()
         request.ctidTraderAccountId = currentAccountId
-        deferred = client.send(request, clientMsgId = clientMsgId)
+        deferred = outbound.send(request, clientMsgId = clientMsgId)
         deferred.addErrback(onError)
 
     def sendProtoOASymbolCategoryListReq(clientMsgId = None):
         global client
         request = ProtoOASymbolCategoryListReq()
         request.ctidTraderAccountId = currentAccountId
-        deferred = client.send(request, clientMsgId = clientMsgId)
+        deferred = outbound.send(request, clientMsgId = clientMsgId)
         deferred.addErrback(onError)
 
     def isAccountInitialized(accountId):
@@ -474,89 +580,171 @@ if __name__ == "__main__":
         request = ProtoOASymbolsListReq()
         request.ctidTraderAccountId = currentAccountId
         request.includeArchivedSymbols = bool(includeArchivedSymbols)
-        deferred = client.send(request, clientMsgId=clientMsgId)
+        deferred = outbound.send(request, clientMsgId=clientMsgId)
         deferred.addErrback(onError)
 
 
     def sendProtoOATraderReq(accountId, clientMsgId = None):
 
         if accountId not in authorizedAccounts:
-            print(f"⛔ Cannot request trader info: account {accountId} not authorized.")
+            emit(f"⛔ Cannot request trader info: account {accountId} not authorized.")
             return
         if accountId in pendingReconciliations:
-            print(f"⏳ Cannot request trader info: reconciliation still pending for account {accountId}.")
+            emit(f"⏳ Cannot request trader info: reconciliation still pending for account {accountId}.")
             return
-        print(f"📤 Requesting trader info for account: {accountId}")
+        emit(f"📤 Requesting trader info for account: {accountId}")
         request = ProtoOATraderReq()
         request.ctidTraderAccountId = accountId
-        deferred = client.send(request, clientMsgId = clientMsgId)
+        deferred = outbound.send(request, clientMsgId = clientMsgId)
         deferred.addErrback(onError)
 
 
 
-    def sendProtoOAUnsubscribeSpotsReq(symbolId, clientMsgId = None):
-        global client
+    def _symbol_id_list(symbolIds):
+        if isinstance(symbolIds, (int, str)):
+            return [int(symbolIds)]
+        return [int(sid) for sid in symbolIds]
+
+    def _send_spot_unsubscription(symbolIds, clientMsgId = None):
+        """Raw (un-counted) unsubscribe for one or many symbols; driven by spotSubscriptions and shutdown."""
         request = ProtoOAUnsubscribeSpotsReq()
         request.ctidTraderAccountId = currentAccountId
-        request.symbolId.append(int(symbolId))
-        deferred = client.send(request, clientMsgId = clientMsgId)
-        deferred.addErrback(onError)
+        request.symbolId.extend(_symbol_id_list(symbolIds))
+        return outbound.send(request, clientMsgId = clientMsgId)
+
+    def _send_spot_subscription(symbolIds, clientMsgId = None):
+        request = ProtoOASubscribeSpotsReq()
+        request.ctidTraderAccountId = currentAccountId
+        request.symbolId.extend(_symbol_id_list(symbolIds))
+        request.subscribeToSpotTimestamp = True   # spot events carry the server time (tick archive)
+        return outbound.send(request, clientMsgId = clientMsgId)
 
+    def _on_spot_subscriptions_settled():
+        if liveViewerActive:
+            return
+        emit("✅ All spot subscriptions confirmed. Starting price board loop.")
+        reactor.callLater(0.5, printUpdatedPriceBoard)
 
-    def sendProtoOASubscribeSpotsReq(symbolId, timeInSeconds=None, subscribeToSpotTimestamp=False, clientMsgId=None):
-        global client
-    
+    # ref-counted per owner, batched once per reactor turn
+    spotSubscriptions = SpotSubscriptions(
+        reactor=reactor,
+        send_subscribe=_send_spot_subscription,
+        send_unsubscribe=_send_spot_unsubscription,
+        on_settled=_on_spot_subscriptions_settled,
+    )
+
+    # last-tick bookkeeping per symbol; silent feeds get a targeted unsubscribe/resubscribe
+    feedHealth = FeedHealthMonitor(
+        reactor=reactor,
+        subscriptions=spotSubscriptions,
+        name_for=lambda sid: symbolIdToName.get(sid, f"ID:{sid}"),
+    )
+
+    def sendProtoOASubscribeSpotsReq(symbolId, timeInSeconds=None):
+        """Menu/command subscription (price board owner); optionally released after timeInSeconds."""
         symbolId = int(symbolId)
+        spotSubscriptions.acquire(symbolId, OWNER_BOARD)
+        if timeInSeconds:
+            reactor.callLater(float(timeInSeconds), spotSubscriptions.release, symbolId, OWNER_BOARD)
 
-        if symbolId in subscribedSymbols:
-            return  # Already subscribed — skip
-        subscribedSymbols.add(symbolId)
-        request = ProtoOASubscribeSpotsReq()
-        request.ctidTraderAccountId = currentAccountId
-        request.symbolId.append(symbolId)
-        request.subscribeToSpotTimestamp = subscribeToSpotTimestamp
-    
-        deferred = client.send(request, clientMsgId=clientMsgId)
-        deferred.addErrback(onError)
+    def sendProtoOAUnsubscribeSpotsReq(symbolId):
+        """Menu/command unsubscribe: drops the price board's interest; positions keep theirs."""
+        symbolId = int(symbolId)
+        spotSubscriptions.release(symbolId, OWNER_BOARD)
+        if spotSubscriptions.owners(symbolId):
+            emit(f"ℹ️ Symbol {symbolId} stays subscribed for open positions")
+        returnToMenu()
 
 
-    def sendProtoOAReconcileReq(accountId, clientMsgId = None):
-        print(f"🔄 Sending reconcile for {accountId}")
+    def sendProtoOAReconcileReq(accountId, clientMsgId = None, lane = None):
+        emit(f"🔄 Sending reconcile for {accountId}")
         global client
         request = ProtoOAReconcileReq()
         request.ctidTraderAccountId = accountId
-        deferred = client.send(request, clientMsgId = clientMsgId)
+        deferred = outbound.send(request, clientMsgId = clientMsgId, lane = lane)
         deferred.addErrback(onError)
 
 
-    def startPositionPolling(interval=5.0):
+    def _refresh_positions():
         if not liveViewerActive:
             return  # Don't poll if viewer is off
         if currentAccountId in authorizedAccounts:
-            sendProtoOAReconcileReq(currentAccountId)
-        reactor.callLater(interval, startPositionPolling, interval)
+            sendProtoOAReconcileReq(currentAccountId, lane=LANE_POLL)
 
-    def sendProtoOAGetTrendbarsReq(weeks, period, symbolId, clientMsgId = None):
-        global client
+    def _request_trendbars(symbolId, period, fromTimestamp, toTimestamp):
         request = ProtoOAGetTrendbarsReq()
         request.ctidTraderAccountId = currentAccountId
         request.period = ProtoOATrendbarPeriod.Value(period)
-        request.fromTimestamp = int(calendar.timegm((datetime.datetime.utcnow() - datetime.timedelta(weeks=int(weeks))).utctimetuple())) * 1000
-        request.toTimestamp = int(calendar.timegm(datetime.datetime.utcnow().utctimetuple())) * 1000
+        request.fromTimestamp = int(fromTimestamp)
+        request.toTimestamp = int(toTimestamp)
         request.symbolId = int(symbolId)
-        deferred = client.send(request, clientMsgId = clientMsgId)
-        deferred.addErrback(onError)
+        return outbound.send(request)
 
-    def sendProtoOAGetTickDataReq(days, quoteType, symbolId, clientMsgId = None):
-        global client
+    # local OHLCV bars per (symbol, period); only missing ranges go to the server (menu 11)
+    trendbarStore = TrendbarStore(
+        request_bars=_request_trendbars,
+        pips_for=lambda sid: symbolIdToPips.get(sid, 5),
+    )
+
+    def getTrendbars(weeks, period, symbolId):
+        """Menu 11: last `weeks` of bars, served from TRENDBAR_DIR and topped up from the server."""
+        toTimestamp = int(time.time() * 1000)
+        fromTimestamp = toTimestamp - int(float(weeks) * 7 * 86400 * 1000)
+
+        def report(result):
+            bars, info = result
+            name = symbolIdToName.get(int(symbolId), symbolId)
+            source = (f"{info['fetched']} fetched in {info['requests']} requests" if info["requests"]
+                      else "all from disk")
+            failed = f", {info['failed']} requests failed" if info["failed"] else ""
+            print(f"📉 {name} {period.upper()}: {len(bars)} bars ({source}{failed}, {info['seconds'] * 1000:.0f} ms)")
+            if len(bars):
+                last = bars[-1]
+                print(f"   last bar {datetime.datetime.fromtimestamp(last['ts'] / 1000, tz=datetime.timezone.utc):%Y-%m-%d %H:%M} UTC: "
+                      f"O {last['open']} H {last['high']} L {last['low']} C {last['close']} V {last['volume']}")
+
+        d = trendbarStore.get(symbolId, period, fromTimestamp, toTimestamp)
+        d.addCallbacks(report, lambda f: print(f"❌ Trendbars failed: {f.getErrorMessage()}"))
+        d.addBoth(lambda _: returnToMenu())
+
+    def downloadTickHistory(days, quoteType, symbolId):
+        """Menu 12: page `days` of ticks into TICK_HISTORY_DIR (resumes from what is already on disk)."""
+        toTimestamp = int(time.time() * 1000)
+        fromTimestamp = toTimestamp - int(float(days) * 86400 * 1000)
+
+        def report(summary):
+            print(f"✅ {symbolIdToName.get(summary['symbolId'], summary['symbolId'])} {summary['quoteType']}: "
+                  f"{summary['ticks']} ticks in {summary['windows']} windows "
+                  f"({summary['skipped']} already stored, {summary['failed']} failed) "
+                  f"in {summary['seconds']:.1f}s → {summary['directory']}")
+
+        downloads = [tickHistory.download(symbolId, qt, fromTimestamp, toTimestamp) for qt in quote_types(quoteType)]
+        for d in downloads:
+            d.addCallbacks(report, lambda f: emit(f"❌ Tick download failed: {f.getErrorMessage()}"))
+        defer.DeferredList(downloads).addBoth(lambda _: returnToMenu())
+
+    def _request_tick_window(symbolId, quoteType, fromTimestamp, toTimestamp):
         request = ProtoOAGetTickDataReq()
         request.ctidTraderAccountId = currentAccountId
         request.type = ProtoOAQuoteType.Value(quoteType.upper())
-        request.fromTimestamp = int(calendar.timegm((datetime.datetime.utcnow() - datetime.timedelta(days=int(days))).utctimetuple())) * 1000
-        request.toTimestamp = int(calendar.timegm(datetime.datetime.utcnow().utctimetuple())) * 1000
+        request.fromTimestamp = int(fromTimestamp)
+        request.toTimestamp = int(toTimestamp)
         request.symbolId = int(symbolId)
-        deferred = client.send(request, clientMsgId = clientMsgId)
-        deferred.addErrback(onError)
+        return outbound.send(request)
+
+    # paginated tick history into columnar files (menu 12)
+    tickHistory = TickHistoryDownloader(
+        request_ticks=_request_tick_window,
+        pips_for=lambda sid: symbolIdToPips.get(sid, 5),
+        on_progress=emit,
+    )
+
+    # last known price for symbols without a live quote yet (small trailing tick windows)
+    lastPrice = LastPriceBootstrap(
+        request_ticks=_request_tick_window,
+        apply=lambda sid, bid, ask: apply_bootstrap_price(sid, bid, ask, ctx),
+        pips_for=lambda sid: symbolIdToPips.get(sid, 5),
+    )
 
     def sendProtoOANewOrderReq(symbolId, orderType, tradeSide, volume, price = None, clientMsgId = None):
         global client
@@ -570,7 +758,7 @@ if __name__ == "__main__":
             request.limitPrice = float(price)
         elif request.orderType == ProtoOAOrderType.STOP:
             request.stopPrice = float(price)
-        deferred = client.send(request, clientMsgId = clientMsgId)
+        deferred = outbound.send(request, clientMsgId = clientMsgId)
         deferred.addErrback(onError)
 
     def sendNewMarketOrder(symbolId, tradeSide, volume, clientMsgId = None):
@@ -592,7 +780,7 @@ if __name__ == "__main__":
         request.positionId = int(positionId)
         # convert lots -> centi-lots with rounding, not truncation
         request.volume = int(round(float(volume) * 100))
-        deferred = client.send(request, clientMsgId = clientMsgId)
+        deferred = outbound.send(request, clientMsgId = clientMsgId)
         deferred.addErrback(onError)
 
     def sendProtoOACancelOrderReq(orderId, clientMsgId = None):
@@ -600,7 +788,7 @@ if __name__ == "__main__":
         request = ProtoOACancelOrderReq()
         request.ctidTraderAccountId = currentAccountId
         request.orderId = int(orderId)
-        deferred = client.send(request, clientMsgId = clientMsgId)
+        deferred = outbound.send(request, clientMsgId = clientMsgId)
         deferred.addErrback(onError)
 
     def sendProtoOADealOffsetListReq(dealId, clientMsgId=None):
@@ -608,11 +796,11 @@ if __name__ == "__main__":
         request = ProtoOADealOffsetListReq()
         request.ctidTraderAccountId = currentAccountId
         request.dealId = int(dealId)
-        deferred = client.send(request, clientMsgId=clientMsgId)
+        deferred = outbound.send(request, clientMsgId=clientMsgId)
         deferred.addErrback(onError)
 
     def waitUntilAllPositionPrices(callback, max_wait=1.0, check_interval=0.1):
-        symbolIds = {pos.tradeData.symbolId for pos in positionsById.values()}
+        symbolIds = set(positionIdsBySymbol)
         attempts = int(max_wait / check_interval)
 
         def check(remaining):
@@ -633,22 +821,18 @@ if __name__ == "__main__":
     
         if pos_id in positionsById:
             # get symbol for potential unsubscribe
-            symbol_id = positionsById[pos_id].tradeData.symbolId
+            symbol_id = positionsById[pos_id].symbolId
     
             positionsById.pop(pos_id, None)
             positionPnLById.pop(pos_id, None)
+            positionBook.remove(pos_id)
 
     
-            # NEW: if no positions left for this symbol, unsubscribe
-            still_used = any(p.tradeData.symbolId == symbol_id for p in positionsById.values())
-            if not still_used:
-                try:
-                    sendProtoOAUnsubscribeSpotsReq(symbol_id)
-                    subscribedSymbols.discard(symbol_id)
-                except Exception:
-                    pass  # best-effort
+            # if no positions left for this symbol, drop the positions' interest in it
+            if H.unindex_position(positionIdsBySymbol, pos_id, symbol_id):
+                spotSubscriptions.release(symbol_id, OWNER_POSITIONS)
     
-            H.mark_positions_dirty()
+            H.discard_position(pos_id)
     
             # selection / viewport housekeeping (unchanged)
             total = len(H.ordered_positions())
@@ -659,13 +843,13 @@ if __name__ == "__main__":
                 selected_position_index = total - 1
     
             term_height = console.size.height
-            max_rows = term_height - 8
+            max_rows = max(1, term_height - H.RESERVED_LINES)
             if selected_position_index < view_offset:
                 view_offset = selected_position_index
             elif selected_position_index >= view_offset + max_rows:
                 view_offset = max(0, selected_position_index - max_rows + 1)
     
-            printLivePnLTable()
+            _request_render()
     #
     
     def listen_for_keys() -> None:
@@ -686,18 +870,17 @@ if __name__ == "__main__":
     
             def move_selection(delta: int) -> None:
                 global selected_position_index, view_offset
-                ops = H.ordered_positions()
-                n = len(ops)
+                n = len(H.positions_snapshot())
                 if n == 0:
                     return
                 selected_position_index = (selected_position_index + delta) % n
                 term_height = console.size.height
-                max_rows = term_height - 8
+                max_rows = max(1, term_height - H.RESERVED_LINES)
                 if selected_position_index < view_offset:
                     view_offset = selected_position_index
                 elif selected_position_index >= view_offset + max_rows:
                     view_offset = selected_position_index - max_rows + 1
-                reactor.callFromThread(printLivePnLTable)
+                _request_input_render()
     
             while liveViewerActive:
                 try:
@@ -717,14 +900,14 @@ if __name__ == "__main__":
                             move_selection(-1); continue
                         if key == "\x1b":  # Esc
                             slInput.update({"mode": "idle", "positionId": None, "buffer": ""})
-                            reactor.callFromThread(printLivePnLTable); continue
+                            _request_input_render(); continue
                         if key in "0123456789.-":
                             sel = H.safe_current_selection(selected_position_index)
                             if not sel: 
                                 continue
                             pid, _ = sel
                             slInput.update({"mode": "typing", "positionId": pid, "buffer": key})
-                            reactor.callFromThread(printLivePnLTable); continue
+                            _request_input_render(); continue
                         # ignore others; fall through to normal keys
     
                     elif slInput["mode"] == "typing":
@@ -735,16 +918,16 @@ if __name__ == "__main__":
                             except Exception:
                                 pass
                             slInput.update({"mode": "idle", "positionId": None, "buffer": ""})
-                            reactor.callFromThread(printLivePnLTable); continue
+                            _request_input_render(); continue
                         if key == "\x1b":  # Esc -> cancel
                             slInput.update({"mode": "idle", "positionId": None, "buffer": ""})
-                            reactor.callFromThread(printLivePnLTable); continue
+                            _request_input_render(); continue
                         if key == "\x7f":  # Backspace
                             slInput["buffer"] = slInput["buffer"][:-1]
-                            reactor.callFromThread(printLivePnLTable); continue
+                            _request_input_render(); continue
                         if key in "0123456789.-":
                             slInput["buffer"] += key
-                            reactor.callFromThread(printLivePnLTable); continue
+                            _request_input_render(); continue
                         # while typing we ignore j/k etc, to avoid moving target
     
                     # start SL input
@@ -753,13 +936,14 @@ if __name__ == "__main__":
                         if sel:
                             pid, _ = sel
                             slInput.update({"mode": "armed", "positionId": pid, "buffer": ""})
-                            reactor.callFromThread(printLivePnLTable)
+                            _request_input_render()
                         continue
                     # -----------------------------------------------------------
     
                     # -------- normal hotkeys --------
                     if key == "q":
                         liveViewerActive = False
+                        reactor.callFromThread(_set_live_viewer_active, False)
                         reactor.callFromThread(getattr(live, "stop", lambda: None))
                         print("👋 Exiting Live PnL Viewer...")
                         reactor.callLater(0.5, executeUserCommand)
@@ -768,12 +952,14 @@ if __name__ == "__main__":
                         move_selection(+1)
                     elif key == "k":
                         move_selection(-1)
+                    elif key == "s":
+                        reactor.callFromThread(cycleSortKey)
                     elif key == "x":
                         sel = H.safe_current_selection(selected_position_index)
                         if not sel:
                             continue
                         pos_id, pos = sel
-                        volume_units = pos.tradeData.volume
+                        volume_units = pos.volume
                         reactor.callFromThread(sendProtoOAClosePositionReq, pos_id, volume_units / 100)
                         reactor.callFromThread(remove_position, pos_id)
                         reactor.callLater(2.0, lambda: runWhenReady(sendProtoOAReconcileReq, currentAccountId))
@@ -801,7 +987,7 @@ if __name__ == "__main__":
     def choosePositionFromLiveList():
         choices = []
         for posId, pos in positionsById.items():
-            symbol_id = pos.tradeData.symbolId
+            symbol_id = pos.symbolId
             symbol_name = symbolIdToName.get(symbol_id, f"ID:{symbol_id}")
             choices.append((posId, f"{posId} — {symbol_name}"))
     
@@ -813,20 +999,37 @@ if __name__ == "__main__":
     
         if result:
             print(f"\n✅ You selected position: {result}")
-            volume_units = positionsById[result].tradeData.volume
+            volume_units = positionsById[result].volume
             runWhenReady(sendProtoOAClosePositionReq, result, volume_units / 100)
         else:
             print("\n❌ No selection made.")
 
 
-    def startPnLUpdateLoop(interval=0.5):
+    def _refresh_pnl():
         if not currentAccountId or currentAccountId not in authorizedAccounts:
-            print("⚠️ Cannot start PnL loop – account not ready.")
             return
         if not liveViewerActive:
             return
         sendProtoOAGetPositionUnrealizedPnLReq()
-        reactor.callLater(interval, startPnLUpdateLoop, interval)
+
+    # server PnL/reconcile on an adaptive cadence; ticks drive local PnL in between
+    refreshScheduler = RefreshScheduler(
+        reactor=reactor,
+        request_pnl=_refresh_pnl,
+        request_reconcile=_refresh_positions,
+    )
+
+    def _calibrate_local_pnl(pos_id: int, server_pnl: float) -> None:
+        """Anchor tick-derived PnL to the server value (commission, swap, FX conversion)."""
+        pos = positionsById.get(pos_id)
+        if pos is None:
+            return
+        bid, ask = symbolIdToPrice.get(pos.symbolId, (None, None))
+        if bid is None or ask is None:
+            return
+        raw = positionBook.raw_pnl(pos_id, bid, ask)
+        if raw is not None:
+            positionBook.set_offset(pos_id, server_pnl - raw)
 
 
 
@@ -838,7 +1041,7 @@ if __name__ == "__main__":
 
 #         print("📤 Sending Unrealized PnL request (no position IDs needed)...")
 
-        deferred = client.send(request, clientMsgId=clientMsgId)
+        deferred = outbound.send(request, clientMsgId=clientMsgId)
         deferred.addErrback(onError)
 
     def sendProtoOAOrderDetailsReq(orderId, clientMsgId=None):
@@ -846,7 +1049,7 @@ if __name__ == "__main__":
         request = ProtoOAOrderDetailsReq()
         request.ctidTraderAccountId = currentAccountId
         request.orderId = int(orderId)
-        deferred = client.send(request, clientMsgId=clientMsgId)
+        deferred = outbound.send(request, clientMsgId=clientMsgId)
         deferred.addErrback(onError)
 
 
@@ -865,32 +1068,29 @@ if __name__ == "__main__":
         request.fromTimestamp = int(fromTimestamp)
         request.toTimestamp = int(toTimestamp)
 
-        deferred = client.send(request, clientMsgId=clientMsgId)
+        deferred = outbound.send(request, clientMsgId=clientMsgId)
         deferred.addErrback(onError)
 
 
     tickFetchQueue = set()
 
     def subscribeToSymbolsFromOpenPositions(duration=None):
-        seen = set()
-        for pos in positionsById.values():
-            sid = pos.tradeData.symbolId
-            if sid not in seen:
-                seen.add(sid)
-                sendProtoOASubscribeSpotsReq(sid, timeInSeconds=duration)
+        seen = set(positionIdsBySymbol)
+        spotSubscriptions.set_owned(OWNER_POSITIONS, seen)
     
-        # Optionally kick off a one-shot tick fallback for any missing prices
-        def fetch_missing_ticks():
-            for sid in seen:
-                if sid not in symbolIdToPrice:
-                    sendProtoOAGetTickDataReq(1, "BID", sid)
-        reactor.callLater(0.5, fetch_missing_ticks)
+        # one-shot last-price bootstrap for anything without a price yet
+        def fetch_missing_prices():
+            lastPrice.request_many(sid for sid in seen if sid not in symbolIdToPrice)
+        reactor.callLater(0.5, fetch_missing_prices)
+
+    def cycleSortKey():
+        H.cycle_sort_key()
+        _request_render(priority=True)
 
     def launchLivePnLViewer():
-        global liveViewerActive, live, selected_position_index, view_offset
-        liveViewerActive = True
-        startPositionPolling(5.0)
-#         reactor.callLater(10.0)
+        global live, selected_position_index, view_offset
+        _set_live_viewer_active(True)
+        _refresh_positions()
     
         print("🔃 Subscribing to spot prices for open positions...")
         subscribeToSymbolsFromOpenPositions()
@@ -911,8 +1111,11 @@ if __name__ == "__main__":
         live = Live(view, refresh_per_second=20, screen=True, console=console, auto_refresh=False)
         live.start()
     
-        sendProtoOAGetPositionUnrealizedPnLReq()
-        startPnLUpdateLoop(0.3)
+        if not currentAccountId or currentAccountId not in authorizedAccounts:
+            print("⚠️ Cannot start PnL refresh – account not ready.")
+        else:
+            sendProtoOAGetPositionUnrealizedPnLReq()
+            refreshScheduler.start()
         threading.Thread(target=listen_for_keys, daemon=True).start()
 
     def printUpdatedPriceBoard():
@@ -920,7 +1123,7 @@ if __name__ == "__main__":
         missing = []
     
         # show only the symbols we're actually subscribed to
-        for symbolId in sorted(subscribedSymbols):
+        for symbolId in sorted(spotSubscriptions.subscribed_symbols()):
             name = symbolIdToName.get(symbolId, f"ID:{symbolId}")
             bid_ask = symbolIdToPrice.get(symbolId)
             if bid_ask:
@@ -929,15 +1132,17 @@ if __name__ == "__main__":
                     print(f" - {name} (ID: {symbolId}) — ⚠️ Price: 0.0 — retrying...")
                     missing.append(symbolId)
                 else:
-                    print(f" - {name} (ID: {symbolId}) — Bid: {bid}, Ask: {ask}")
+                    age = feedHealth.last_tick_age(symbolId)
+                    stale = f" — ⏸ no ticks for {age:.0f}s" if feedHealth.is_stale(symbolId) and age is not None else ""
+                    print(f" - {name} (ID: {symbolId}) — Bid: {bid}, Ask: {ask}{stale}")
             else:
                 print(f" - {name} (ID: {symbolId}) — Price: [pending]")
                 missing.append(symbolId)
     
         if missing:
-            print(f"\n⏳ Retrying {len(missing)} missing prices...")
-            for i, sid in enumerate(missing):
-                reactor.callLater(i * 0.05, sendProtoOAGetTickDataReq, 1, "BID", sid)
+            # silent feeds are repaired by feedHealth (targeted resubscribe), not by polling tick data
+            print(f"\n⏳ Waiting for {len(missing)} missing prices...")
+            feedHealth.check()
             reactor.callLater(3, printUpdatedPriceBoard)
         else:
             return None
@@ -953,8 +1158,8 @@ if __name__ == "__main__":
         "8": ("Trader Info", sendProtoOATraderReq),
         "9": ("Subscribe to Spot", sendProtoOASubscribeSpotsReq),
         "10": ("Reconcile (Show Positions)", lambda: sendProtoOAReconcileReq(currentAccountId)),
-        "11": ("Get Trendbars", sendProtoOAGetTrendbarsReq),
-        "12": ("Get Tick Data", sendProtoOAGetTickDataReq),
+        "11": ("Get Trendbars", getTrendbars),
+        "12": ("Get Tick Data", downloadTickHistory),
         "13": ("New Market Order", sendNewMarketOrder),
         "14": ("New Limit Order", sendNewLimitOrder),
         "15": ("New Stop Order", sendNewStopOrder),
@@ -968,6 +1173,8 @@ if __name__ == "__main__":
         "20": ("Order Details", sendProtoOAOrderDetailsReq),
         "21": ("Orders by Position ID", sendProtoOAOrderListByPositionIdReq),
         "22": ("Help", showHelp),
+        "23": ("Request Latency", showRequestLatency),
+        "24": ("Unsubscribe from Spot", sendProtoOAUnsubscribeSpotsReq),
     }
     commands = {v[0].replace(" ", ""): v[1] for v in menu.values()}
 
@@ -993,10 +1200,10 @@ def isAccountReady(accountId):
 
 def waitUntilAccountReady(accountId, callback, interval=0.5):
     if isAccountReady(accountId):
-        print(f"✅ Account {accountId} is now ready.")
+        emit(f"✅ Account {accountId} is now ready.")
         callback()
     else:
-        print(f"⏳ Waiting for account {accountId} to be ready...")
+        emit(f"⏳ Waiting for account {accountId} to be ready...")
         reactor.callLater(interval, waitUntilAccountReady, accountId, callback, interval)
 
 
@@ -1023,11 +1230,21 @@ ctx = SimpleNamespace(
     symbolIdToName=symbolIdToName,
     symbolIdToPrice=symbolIdToPrice,
     symbolIdToPips=symbolIdToPips,
-    subscribedSymbols=subscribedSymbols,
-    expectedSpotSubscriptions=expectedSpotSubscriptions,
-    receivedSpotConfirmations=receivedSpotConfirmations,
+    spotSubscriptions=spotSubscriptions,
+    feedHealth=feedHealth,
+    lastPrice=lastPrice,
+    tickHistory=tickHistory,
+    trendbarStore=trendbarStore,
     positionsById=positionsById,
     positionPnLById=positionPnLById,
+    positionIdsBySymbol=positionIdsBySymbol,
+    positionBook=positionBook,
+    spotConflator=spotConflator,
+    tickArchive=tickArchive,
+    frameRecorder=frameRecorder,
+    refreshScheduler=refreshScheduler,
+    requestTracker=requestTracker,
+    calibrate_local_pnl=_calibrate_local_pnl,
     showStartupOutput=showStartupOutput,
     liveViewerActive=liveViewerActive,
     symbolIdToDetails=symbolIdToDetails,
@@ -1053,9 +1270,6 @@ ctx = SimpleNamespace(
     log_exec_event_error=log_exec_event_error,
     get_account_ccy=get_account_ccy,
 
-    sendProtoOASubscribeSpotsReq=sendProtoOASubscribeSpotsReq,
-    sendProtoOAUnsubscribeSpotsReq=sendProtoOAUnsubscribeSpotsReq,
-    sendProtoOAGetTickDataReq=sendProtoOAGetTickDataReq,
     sendProtoOAGetPositionUnrealizedPnLReq=sendProtoOAGetPositionUnrealizedPnLReq,
     sendProtoOAReconcileReq=sendProtoOAReconcileReq,
     sendProtoOATraderReq=sendProtoOATraderReq,
@@ -1069,20 +1283,24 @@ ctx = SimpleNamespace(
     reactor=reactor,
 
     # minimal stub used by on_execution handler
-    print_order_filled_event=lambda res: print(f"🟢 Order filled: {getattr(res, 'orderId', '?')}")
+    print_order_filled_event=lambda res: emit(f"🟢 Order filled: {getattr(res, 'orderId', '?')}")
 )
 
 
 def onMessageReceived(client, message):
-    if liveViewerActive:
-        with H.suppress_stdout(liveViewerActive):
-            dispatch_message(client, message, ctx)
-    else:
-        dispatch_message(client, message, ctx)
+    if frameRecorder is not None:
+        frameRecorder.inbound(message)
+    dispatch_message(client, message, ctx)
 
 
 def executeUserCommand():
     global menuScheduled
+    if replayEngine is not None:
+        # no menu while replaying; leaving the viewer ends the session
+        if not liveViewerActive and not cliArgs.headless:
+            replayEngine.stop()
+            _end_replay()
+        return
     if liveViewerActive:
         # Safety: never prompt while viewer is active
         menuScheduled = False
@@ -1145,6 +1363,9 @@ def executeUserCommand():
                 func(symbolId, seconds)
                 runWhenReady(func, symbolId, seconds)
 
+            elif desc == "Unsubscribe from Spot":
+                symbolId = input("Symbol ID: ")
+                runWhenReady(func, symbolId)
 
             elif desc == "Show Price Board":
                 def fetchSymbolsAndThenShowBoard():
@@ -1237,6 +1458,12 @@ def executeUserCommand():
     if not liveViewerActive:
         reactor.callLater(3, executeUserCommand)
 
+if replayEngine is not None:
+    # recorded handlers must not open prompts
+    ctx.returnToMenu = lambda: None
+    ctx.promptUserToSelectAccount = lambda: None
+    reactor.callWhenRunning(_start_replay)
+
 # Setting optional client callbacks
 client.setConnectedCallback(connected)
 client.setDisconnectedCallback(disconnected)
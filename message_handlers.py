@@ -1,70 +1,112 @@
 # message_handlers.py
-from typing import Callable, Dict, Any
+from typing import Callable, Dict, Any, List, Optional, Tuple
+from time import perf_counter
 from ctrader_open_api import Protobuf
 from ctrader_open_api.messages.OpenApiCommonMessages_pb2 import *
 from ctrader_open_api.messages.OpenApiMessages_pb2 import *
 from ctrader_open_api.messages.OpenApiModelMessages_pb2 import *
-import logging
 import ui_helpers as H
+from position_book import PositionRecord
+from reconcile_diff import ReconcileDiff, diff_positions, symbol_changes
+from spot_subscriptions import OWNER_POSITIONS
+from output_sink import emit  # emit() replacement; goes to the log file while the viewer runs
 MessageContext = Any
 
 Handler = Callable[[Any, Any], None]  # ctx is just Any now
 
-_registry: Dict[int, Handler] = {}
+# dispatch flags
+F_IGNORE = 1             # known keepalive/noise: no decode, no handler
+F_GENERIC_DECODE = 2     # no message class known: fall back to Protobuf.extract
+F_REPORT_PARSE_ERROR = 4 # print parse failures and drop the message (ProtoOAErrorRes)
+
+# payloadType -> (message class, handler, flags); filled by @register at import
+_dispatch_table: Dict[int, Tuple[Optional[type], Optional[Handler], int]] = {}
+
+# payloadType -> [messages, decode seconds]
+_dispatch_stats: Dict[int, List] = {}
+
+def _message_class(pt: int) -> Optional[type]:
+    msg = Protobuf.get(pt, fail=False)
+    return type(msg) if msg is not None else None
 
 def register(payload_cls_or_id):
     """Decorator to register a handler by proto class or numeric id."""
     if isinstance(payload_cls_or_id, int):
         pt = int(payload_cls_or_id)
+        cls = _message_class(pt)
     else:
-        pt = payload_cls_or_id().payloadType
+        cls = payload_cls_or_id
+        pt = cls().payloadType
+    flags = 0 if cls is not None else F_GENERIC_DECODE
+    if cls is ProtoOAErrorRes:
+        flags |= F_REPORT_PARSE_ERROR
     def _wrap(fn: Handler):
-        _registry[pt] = fn
+        _dispatch_table[pt] = (cls, fn, flags)
         return fn
     return _wrap
 
+# frequent keepalives are dropped without decoding; tick data and trendbars are
+# consumed through the request's Deferred (ctx.lastPrice, ctx.tickHistory, ctx.trendbarStore)
+for _cls in (ProtoOAAccountLogoutRes, ProtoHeartbeatEvent, ProtoOAGetTickDataRes, ProtoOAGetTrendbarsRes):
+    _dispatch_table[_cls().payloadType] = (_cls, None, F_IGNORE)
+
+_ERROR_PAYLOAD_TYPES = frozenset(
+    cls().payloadType for cls in (ProtoErrorRes, ProtoOAErrorRes, ProtoOAOrderErrorEvent)
+)
+
 def dispatch_message(client, raw_message, ctx: Any):
     pt = raw_message.payloadType
-    handler = _registry.get(pt)
-    # some payloads we register by number (2101, 2103, 2142)
-    if not handler and isinstance(pt, int):
-        handler = _registry.get(int(pt))
-
-    if not handler:
-        # ignore frequent keepalives silently
-        if pt in {ProtoOAAccountLogoutRes().payloadType, ProtoHeartbeatEvent().payloadType}:
-            return
-        print(f"⚠️ Unhandled message — payloadType: {pt}")
+    msg_id = raw_message.clientMsgId
+    if msg_id:
+        ctx.requestTracker.complete(msg_id, error=pt in _ERROR_PAYLOAD_TYPES)
+    stats = _dispatch_stats.get(pt)
+    if stats is None:
+        stats = _dispatch_stats[pt] = [0, 0.0]
+    stats[0] += 1
+
+    entry = _dispatch_table.get(pt)
+    if entry is None:
+        emit(f"⚠️ Unhandled message — payloadType: {pt}")
+        return
+    cls, handler, flags = entry
+    if flags & F_IGNORE:
         return
 
-    # For 2142 we parse manually below; others use Protobuf.extract
-    if pt == 2142:
-        res = ProtoOAErrorRes()
+    t0 = perf_counter()
+    if flags & F_GENERIC_DECODE:
+        decoded = Protobuf.extract(raw_message)
+    else:
+        decoded = cls()
         try:
-            res.ParseFromString(raw_message.payload)
+            decoded.ParseFromString(raw_message.payload)
         except Exception as e:
-            print(f"❌ Failed to parse ProtoOAErrorRes: {e}")
-            print(f"Payload: {raw_message.payload}")
+            if not flags & F_REPORT_PARSE_ERROR:
+                raise
+            emit(f"❌ Failed to parse {cls.__name__}: {e}")
+            emit(f"Payload: {raw_message.payload}")
             return
-        return handler(res, ctx)
+    stats[1] += perf_counter() - t0
 
-    # normal path
-    decoded = Protobuf.extract(raw_message)
     return handler(decoded, ctx)
 
+def dispatch_stats() -> Dict[str, Tuple[int, float]]:
+    """Message name -> (messages seen, total decode seconds)."""
+    out = {}
+    for pt, (count, decode_s) in _dispatch_stats.items():
+        cls = (_dispatch_table.get(pt) or (None,))[0]
+        out[cls.__name__ if cls else str(pt)] = (count, decode_s)
+    return out
+
 # -------------------- Handlers (one per old elif) --------------------
 
 @register(ProtoOASubscribeSpotsRes)
 def on_subscribe_spots(res: ProtoOASubscribeSpotsRes, ctx: MessageContext):
-    print(f"✅ Spot subscription confirmed: {res}")
-    ctx.receivedSpotConfirmations += 1
-    if ctx.receivedSpotConfirmations >= ctx.expectedSpotSubscriptions:
-        print("✅ All spot subscriptions confirmed. Starting price board loop.")
-        ctx.reactor.callLater(0.5, ctx.printUpdatedPriceBoard)
+    # per-batch confirmation is tracked by ctx.spotSubscriptions via the request's clientMsgId
+    emit(f"✅ Spot subscription confirmed: {res}")
 
 @register(ProtoOASymbolsListRes)
 def on_symbols_list(res: ProtoOASymbolsListRes, ctx: MessageContext):
-    print(f"📈 Received {len(res.symbol)} symbols:")
+    emit(f"📈 Received {len(res.symbol)} symbols:")
 
     for s in res.symbol:
         ctx.symbolIdToPips[s.symbolId] = getattr(s, "pipsPosition", 5)
@@ -75,21 +117,17 @@ def on_symbols_list(res: ProtoOASymbolsListRes, ctx: MessageContext):
             "assetClass": getattr(s, "assetClassName", "Unknown"),
         }
         ctx.symbolIdToName[s.symbolId] = s.symbolName
+    H.mark_positions_dirty()  # symbol names feed the "symbol" sort key
+    ctx.positionBook.refresh_contract_sizes()
 
-    open_position_symbols = {p.tradeData.symbolId for p in ctx.positionsById.values()}
-    new_to_sub = {sid for sid in open_position_symbols if sid not in ctx.subscribedSymbols}
-    ctx.receivedSpotConfirmations = 0
-    ctx.expectedSpotSubscriptions = len(new_to_sub)
+    ctx.spotSubscriptions.set_owned(OWNER_POSITIONS, ctx.positionIdsBySymbol)
 
-    for sid in new_to_sub:
-        ctx.sendProtoOASubscribeSpotsReq(sid)
+    def fetch_missing_prices():
+        ctx.lastPrice.request_many(
+            sid for sid in ctx.spotSubscriptions.subscribed_symbols() if sid not in ctx.symbolIdToPrice
+        )
 
-    def fetch_missing_ticks():
-        for sid in list(ctx.subscribedSymbols):
-            if sid not in ctx.symbolIdToPrice:
-                ctx.sendProtoOAGetTickDataReq(1, "BID", sid)
-
-    ctx.reactor.callLater(0.5, fetch_missing_ticks)
+    ctx.reactor.callLater(0.5, fetch_missing_prices)
     ctx.reactor.callLater(1.0, ctx.printUpdatedPriceBoard)
     ctx.returnToMenu()
 
@@ -130,41 +168,67 @@ def on_symbols_list(res: ProtoOASymbolsListRes, ctx: MessageContext):
 
 @register(ProtoOASpotEvent)
 def on_spot(res: ProtoOASpotEvent, ctx):
-    try:
-        sid  = res.symbolId
-        pips = ctx.symbolIdToPips.get(sid, 5)
+    # raw ints only; scaling/storing happens once per symbol per reactor turn in apply_spot_batch
+    if ctx.tickArchive is not None:
+        ctx.tickArchive.append(res.symbolId, res.bid, res.ask, res.timestamp or None)
+    ctx.spotConflator.push(res.symbolId, res.bid, res.ask)
+
+def apply_spot_batch(batch, ctx):
+    """Drain callback of ctx.spotConflator: {symbolId: (raw_bid, raw_ask)}."""
+    ctx.feedHealth.on_ticks(batch)
+    ctx.lastPrice.on_live_ticks(batch)
+    for sid, (raw_bid, raw_ask) in batch.items():
+        try:
+            pips = ctx.symbolIdToPips.get(sid, 5)
 
-        prev_bid, prev_ask = ctx.symbolIdToPrice.get(sid, (None, None))
+            prev_bid, prev_ask = ctx.symbolIdToPrice.get(sid, (None, None))
 
-        bid = (res.bid / (10 ** pips)) if res.bid else None
-        ask = (res.ask / (10 ** pips)) if res.ask else None
+            bid = (raw_bid / (10 ** pips)) if raw_bid else None
+            ask = (raw_ask / (10 ** pips)) if raw_ask else None
 
-        # keep last non-zero values
-        bid = bid if (bid and bid != 0.0) else prev_bid
-        ask = ask if (ask and ask != 0.0) else prev_ask
+            # keep last non-zero values
+            bid = bid if (bid and bid != 0.0) else prev_bid
+            ask = ask if (ask and ask != 0.0) else prev_ask
 
-        # only store if we have at least one side
-        if bid is not None or ask is not None:
-            if bid is None: bid = ask
-            if ask is None: ask = bid
-            ctx.symbolIdToPrice[sid] = (bid, ask)
+            # only store if we have at least one side
+            if bid is not None or ask is not None:
+                if bid is None: bid = ask
+                if ask is None: ask = bid
+                ctx.symbolIdToPrice[sid] = (bid, ask)
+        except Exception as e:
+            emit(f"❌ Failed to apply SpotEvent for {sid}: {e}")
 
-        if ctx.liveViewerActive:
-            ctx.request_render()
-    except Exception as e:
-        print(f"❌ Failed to parse SpotEvent: {e}")
+    if ctx.liveViewerActive:
+        # local PnL from ticks; the server is only asked on ctx.refreshScheduler's cadence
+        touched = [sid for sid in batch if sid in ctx.positionIdsBySymbol]
+        for sid in touched:
+            ctx.update_pnl_cache_for_symbol(sid)
+        if touched:
+            ctx.refreshScheduler.note_activity()
+        ctx.request_render()
+
+
+def apply_bootstrap_price(sid: int, bid: float, ask: float, ctx) -> None:
+    """ctx.lastPrice result: only used until the symbol's first live tick."""
+    if sid in ctx.symbolIdToPrice:
+        return
+    ctx.symbolIdToPrice[sid] = (bid, ask)
+    emit(f"📊 {ctx.symbolIdToName.get(sid, f'ID:{sid}')} — last price (bootstrap) — Bid: {bid}, Ask: {ask}")
+    if ctx.liveViewerActive and sid in ctx.positionIdsBySymbol:
+        ctx.update_pnl_cache_for_symbol(sid)
+        ctx.request_render()
 
 
 @register(ProtoOAAssetListRes)
 def on_asset_list(res: ProtoOAAssetListRes, ctx: MessageContext):
-    print(f"📊 Received {len(res.asset)} assets:")
+    emit(f"📊 Received {len(res.asset)} assets:")
     for asset in res.asset[:5]:
-        print(f" - {asset.name} ({asset.assetId})")
+        emit(f" - {asset.name} ({asset.assetId})")
     ctx.returnToMenu()
 
 @register(ProtoOAVersionRes)
 def on_version(res: ProtoOAVersionRes, ctx: MessageContext):
-    print(f"🔧 Version Info: {res.version}")
+    emit(f"🔧 Version Info: {res.version}")
     ctx.returnToMenu()
 
 @register(2101)
@@ -172,31 +236,31 @@ def on_2101(decoded_any, ctx: MessageContext):
     """Debug dump for payloadType 2101 (kept as-is)."""
     try:
         res = decoded_any
-        print("📦 Full decoded 2101 message:\n", res)
+        emit("📦 Full decoded 2101 message:\n", res)
 
-        print("\n🔍 Fields in 2101 message (set fields):")
+        emit("\n🔍 Fields in 2101 message (set fields):")
         for field in res.ListFields():
-            print(f" - {field[0].name}: {field[1]}")
+            emit(f" - {field[0].name}: {field[1]}")
 
-        print("\n🧬 All possible fields (even if unset):")
+        emit("\n🧬 All possible fields (even if unset):")
         for descriptor in res.DESCRIPTOR.fields:
             field_name = descriptor.name
             if res.HasField(field_name):
                 value = getattr(res, field_name)
-                print(f" - {field_name}: {value}")
+                emit(f" - {field_name}: {value}")
             else:
-                print(f" - {field_name}: [not set]")
+                emit(f" - {field_name}: [not set]")
     except Exception as e:
-        print(f"⚠️ Could not decode payloadType 2101: {e}")
+        emit(f"⚠️ Could not decode payloadType 2101: {e}")
 
 @register(ProtoOAAssetClassListRes)
 def on_asset_class_list(res: ProtoOAAssetClassListRes, ctx: MessageContext):
-    print(f"🏷️ Asset Classes: {len(res.assetClass)} found.")
+    emit(f"🏷️ Asset Classes: {len(res.assetClass)} found.")
     ctx.returnToMenu()
 
 @register(ProtoOASymbolCategoryListRes)
 def on_symbol_category_list(res: ProtoOASymbolCategoryListRes, ctx: MessageContext):
-    print(f"🗂️ Symbol Categories: {len(res.category)}")
+    emit(f"🗂️ Symbol Categories: {len(res.category)}")
     ctx.returnToMenu()
 
 @register(ProtoOAGetAccountListByAccessTokenRes)
@@ -207,15 +271,15 @@ def on_account_list(res: ProtoOAGetAccountListByAccessTokenRes, ctx: MessageCont
         apiAccountIds = [acc.ctidTraderAccountId for acc in res.ctidTraderAccount]
         valid = list(set(ctx.envAccountIds) & set(apiAccountIds))
         if valid:
-            print("✅ Valid accounts from .env matched the API response:")
+            emit("✅ Valid accounts from .env matched the API response:")
             for accId in valid:
-                print(f" - {accId}")
+                emit(f" - {accId}")
                 if accId not in ctx.authorizedAccounts:
                     ctx.fetchTraderInfo(accId)
                     ctx.reactor.callLater(0, ctx.returnToMenu)
         else:
-            print("⚠️ None of the ACCOUNT_IDS from .env matched available accounts.")
-            print("Use menu option 2 to manually authorize one.")
+            emit("⚠️ None of the ACCOUNT_IDS from .env matched available accounts.")
+            emit("Use menu option 2 to manually authorize one.")
             ctx.returnToMenu()
 
     # Also mirror your onAccountListReceived logic (metadata + printing)
@@ -226,47 +290,65 @@ def on_account_list(res: ProtoOAGetAccountListByAccessTokenRes, ctx: MessageCont
         broker = getattr(acc, "brokerName", "?")
         is_live = "Live" if getattr(acc, "isLive", False) else "Demo"
         ctx.accountMetadata[acc_id] = {"currency": currency, "broker": broker, "isLive": is_live}
-        print(f" - ID: {acc_id}, Type: {is_live}, Broker: {broker}, Currency: {currency}")
+        emit(f" - ID: {acc_id}, Type: {is_live}, Broker: {broker}, Currency: {currency}")
 
     _on_received()
 
+def _apply_reconcile_diff(diff: ReconcileDiff, ctx: MessageContext) -> None:
+    """Apply added/removed/modified positions to the book, index, sort order and spot interest."""
+    gained, lost = symbol_changes(ctx.positionsById, ctx.positionIdsBySymbol, diff)
+
+    for pid in diff.removed:
+        pos = ctx.positionsById.pop(pid, None)
+        if pos is None:
+            continue
+        ctx.positionPnLById.pop(pid, None)
+        ctx.positionBook.remove(pid)
+        H.unindex_position(ctx.positionIdsBySymbol, pid, pos.symbolId)
+        H.discard_position(pid)
+
+    for old, new, fields in diff.modified:
+        pid = new.positionId
+        ctx.positionsById[pid] = new
+        if "symbolId" in fields:
+            H.unindex_position(ctx.positionIdsBySymbol, pid, old.symbolId)
+            H.index_position(ctx.positionIdsBySymbol, pid, new.symbolId)
+        if not {"price", "volume", "symbolId", "tradeSide"}.isdisjoint(fields):
+            ctx.positionBook.upsert_position(new)
+        H.forget_row(pid)
+        H.update_position(pid)
+
+    for pos in diff.added:
+        pid = pos.positionId
+        ctx.positionsById[pid] = pos
+        H.index_position(ctx.positionIdsBySymbol, pid, pos.symbolId)
+        ctx.positionBook.upsert_position(pos)
+        H.update_position(pid)
+
+    subs = ctx.spotSubscriptions
+    for sid in gained:
+        subs.acquire(sid, OWNER_POSITIONS)
+    for sid in lost:
+        subs.release(sid, OWNER_POSITIONS)
+
 @register(ProtoOAReconcileRes)
 def on_reconcile(res: ProtoOAReconcileRes, ctx: MessageContext):
     accountId = res.ctidTraderAccountId
 
     if ctx.showStartupOutput:
-        print("🧾 Full Reconciliation Response:")
-        print(res)
+        emit("🧾 Full Reconciliation Response:")
+        emit(res)
 
     if accountId in ctx.pendingReconciliations:
         ctx.pendingReconciliations.discard(accountId)
 
-    new_positions = {p.positionId: p for p in getattr(res, "position", [])}
-    old_pos_ids = set(ctx.positionsById.keys())
-    new_pos_ids = set(new_positions.keys())
-    added_ids   = new_pos_ids - old_pos_ids
-
-    if ctx.liveViewerActive:
-        added_symbols = {new_positions[pid].tradeData.symbolId for pid in added_ids}
-        for sid in added_symbols:
-            if sid not in ctx.subscribedSymbols:
-                ctx.sendProtoOASubscribeSpotsReq(sid)
-
-        remaining_symbols = {p.tradeData.symbolId for p in new_positions.values()}
-        for sid in list(ctx.subscribedSymbols):
-            if sid not in remaining_symbols:
-                try:
-                    ctx.sendProtoOAUnsubscribeSpotsReq(sid)
-                finally:
-                    ctx.subscribedSymbols.discard(sid)
-
-    ctx.positionsById.clear()
-    ctx.positionsById.update(new_positions)
-    H.mark_positions_dirty()
-
-    if ctx.liveViewerActive:
-        ctx.sendProtoOAGetPositionUnrealizedPnLReq()
-        ctx.printLivePnLTable()
+    diff = diff_positions(ctx.positionsById, getattr(res, "position", []))
+    if diff:
+        _apply_reconcile_diff(diff, ctx)
+        if ctx.liveViewerActive:
+            if diff.added or diff.modified:
+                ctx.sendProtoOAGetPositionUnrealizedPnLReq()
+            ctx.request_render()
 
     if res.order:
         for order in res.order:
@@ -275,70 +357,27 @@ def on_reconcile(res: ProtoOAReconcileRes, ctx: MessageContext):
                 symbol_id = getattr(order, "symbolId", None)
                 symbol_name = ctx.symbolIdToName.get(symbol_id, f"ID:{symbol_id}" if symbol_id else "UNKNOWN")
                 status = ProtoOAOrderStatus.Name(order.orderStatus) if hasattr(order, "orderStatus") else "UNKNOWN"
-                print(f" - Order ID: {order_id}, Symbol: {symbol_name}, Status: {status}")
+                emit(f" - Order ID: {order_id}, Symbol: {symbol_name}, Status: {status}")
             except Exception as e:
-                print(f"❌ Error displaying order: {e}\n{order}")
+                emit(f"❌ Error displaying order: {e}\n{order}")
     else:
-        print("📦 No active orders.")
+        emit("📦 No active orders.")
 
     ctx.reactor.callLater(0.5, ctx.sendProtoOATraderReq, accountId)
 
-@register(ProtoOAGetTrendbarsRes)
-def on_trendbars(res: ProtoOAGetTrendbarsRes, ctx: MessageContext):
-    print(f"📉 {len(res.trendbar)} trendbars received.")
-    ctx.returnToMenu()
-
-@register(ProtoOAGetTickDataRes)
-def on_tickdata(res: ProtoOAGetTickDataRes, ctx: MessageContext):
-    try:
-        symbolId = getattr(res, "symbolId", None)
-        if symbolId is None:
-            print("⚠️ TickDataRes missing symbolId; ignoring this response")
-            return
-
-        symbolName = ctx.symbolIdToName.get(symbolId, f"ID:{symbolId}")
-        pips = ctx.symbolIdToPips.get(symbolId, 5)
-
-        ticks = list(getattr(res, "tickData", []))
-        if not ticks:
-            print(f"⚠️ No tick data for {symbolName}")
-            return
-
-        latest = max(ticks, key=lambda x: getattr(x, "timestamp", 0))
-        raw_bid = getattr(latest, "bid", 0)
-        raw_ask = getattr(latest, "ask", 0)
-
-        bid = (raw_bid / (10 ** pips)) if raw_bid else None
-        ask = (raw_ask / (10 ** pips)) if raw_ask else None
-
-        if bid is None and ask is None:
-            print(f"⚠️ Latest tick has no bid/ask for {symbolName}")
-            return
-        if bid is None: bid = ask
-        if ask is None: ask = bid
-
-        ctx.symbolIdToPrice[symbolId] = (bid, ask)
-        print(f"📊 {symbolName} — Tick Price Fallback — Bid: {bid}, Ask: {ask}")
-
-        if ctx.liveViewerActive:
-            ctx.update_pnl_cache_for_symbol(symbolId)
-            ctx.request_render()
-    except Exception as e:
-        logging.error("TickData handler error: %s", e)
-
 @register(ProtoOAExecutionEvent)
 def on_execution(res: ProtoOAExecutionEvent, ctx: MessageContext):
     try:
         exec_type = res.executionType
-        print(f"📥 Execution Event: {ProtoOAExecutionType.Name(exec_type)} for Order ID {getattr(res,'orderId','N/A')}")
+        emit(f"📥 Execution Event: {ProtoOAExecutionType.Name(exec_type)} for Order ID {getattr(res,'orderId','N/A')}")
 
         if exec_type == ProtoOAExecutionType.ORDER_FILLED:
             ctx.print_order_filled_event(res)
 
             if hasattr(res, "position") and res.HasField("position"):
-                ctx.add_position(res.position)
+                ctx.add_position(PositionRecord.from_proto(res.position))
                 ctx.sendProtoOAGetPositionUnrealizedPnLReq()
-                ctx.printLivePnLTable()
+                ctx.request_render()
             else:
                 ctx.runWhenReady(ctx.sendProtoOAReconcileReq, ctx.currentAccountId)
                 if hasattr(res, "orderId"):
@@ -354,7 +393,7 @@ def on_execution(res: ProtoOAExecutionEvent, ctx: MessageContext):
         }
 
         if exec_type in close_like and pos_id:
-            print(f"🗑 Removing position {pos_id} due to {ProtoOAExecutionType.Name(exec_type)}")
+            emit(f"🗑 Removing position {pos_id} due to {ProtoOAExecutionType.Name(exec_type)}")
             ctx.remove_position(pos_id)
         else:
             ctx.runWhenReady(ctx.sendProtoOAReconcileReq, ctx.currentAccountId)
@@ -365,9 +404,9 @@ def on_execution(res: ProtoOAExecutionEvent, ctx: MessageContext):
 @register(2103)
 def on_2103(decoded_any, ctx: MessageContext):
     try:
-        print("📩 Possibly Auth/Execution Response:", decoded_any)
+        emit("📩 Possibly Auth/Execution Response:", decoded_any)
     except Exception:
-        print("⚠️ Could not decode payloadType 2103")
+        emit("⚠️ Could not decode payloadType 2103")
 
 
 # message_handlers.py
@@ -382,9 +421,9 @@ def on_trader(res: ProtoOATraderRes, ctx: MessageContext):
         and accountId in ctx.authorizedAccounts
         and accountId not in ctx.pendingReconciliations):
         ctx.set_current_account_id(accountId)   # <— instead of assigning ctx.currentAccountId
-        print(f"✅ currentAccountId is now set to: {accountId}")
+        emit(f"✅ currentAccountId is now set to: {accountId}")
 
-    print(f"\n💰 Account {accountId}:\n - Balance: {trader.balance / 100:.2f}")
+    emit(f"\n💰 Account {accountId}:\n - Balance: {trader.balance / 100:.2f}")
 
     if len(ctx.accountTraderInfo) == len(ctx.availableAccounts):
         ctx.promptUserToSelectAccount()
@@ -393,7 +432,7 @@ def on_trader(res: ProtoOATraderRes, ctx: MessageContext):
 
 @register(ProtoOADealOffsetListRes)
 def on_deal_offset_list(res: ProtoOADealOffsetListRes, ctx: MessageContext):
-    print(f"🧾 Deal Offsets: {len(res.offset)} entries.")
+    emit(f"🧾 Deal Offsets: {len(res.offset)} entries.")
     ctx.returnToMenu()
 
 @register(ProtoOAGetPositionUnrealizedPnLRes)
@@ -402,14 +441,14 @@ def on_unrealized(res: ProtoOAGetPositionUnrealizedPnLRes, ctx: MessageContext):
     unrealized_list = getattr(res, "positionUnrealizedPnL", None)
 
     if not unrealized_list:
-        print("📦 Full ProtoOAGetPositionUnrealizedPnLRes message (formatted):")
-        print(f"moneyDigits: {money_digits}")
+        emit("📦 Full ProtoOAGetPositionUnrealizedPnLRes message (formatted):")
+        emit(f"moneyDigits: {money_digits}")
         fallback_list = getattr(res, "unrealizedPnL", None) or getattr(res, "unrealisedPnL", None)
         if fallback_list:
             for pnl in fallback_list:
                 net_usd = pnl.netUnrealizedPnL / (10 ** money_digits)
                 gross_usd = pnl.grossUnrealizedPnL / (10 ** money_digits)
-                print(f" - Position ID: {pnl.positionId:<12} | Gross: ${gross_usd:.2f} | Net: ${net_usd:.2f}")
+                emit(f" - Position ID: {pnl.positionId:<12} | Gross: ${gross_usd:.2f} | Net: ${net_usd:.2f}")
         return
 
     total_net_pnl = 0.0
@@ -421,20 +460,24 @@ def on_unrealized(res: ProtoOAGetPositionUnrealizedPnLRes, ctx: MessageContext):
 
             pid = pnl.positionId
             prev = ctx.positionPnLById.get(pid)
+            # before calibration `prev` is the last server value, not a local estimate
+            local = prev if ctx.positionBook.is_calibrated(pid) else None
+            ctx.refreshScheduler.on_server_pnl(local, net_usd)
             ctx.positionPnLById[pid] = net_usd
+            ctx.calibrate_local_pnl(pid, net_usd)
             if prev != net_usd:
-                H.mark_positions_dirty()
+                H.update_position(pid)
 
             pos = ctx.positionsById.get(pid)
             if pos:
-                symbol_id = pos.tradeData.symbolId
+                symbol_id = pos.symbolId
                 _ = ctx.symbolIdToName.get(symbol_id, f"ID:{symbol_id}")
 
             # SL check (account currency max loss)
             sl_val = ctx.slByPositionId.get(pid)
             if sl_val is not None and net_usd <= -abs(sl_val):
                 if pos:
-                    volume_units = pos.tradeData.volume
+                    volume_units = pos.volume
                     ctx.slByPositionId.pop(pid, None)
                     ctx.reactor.callLater(0, ctx.sendProtoOAClosePositionReq, pid, volume_units / 100)
                     msg = f"SL hit on {pid}: closing at net {net_usd:.2f}"
@@ -443,24 +486,25 @@ def on_unrealized(res: ProtoOAGetPositionUnrealizedPnLRes, ctx: MessageContext):
                         ctx.error_messages.pop(0)
 
         except Exception as e:
-            print(f"❌ Error storing/displaying PnL for position {getattr(pnl, 'positionId', '?')}: {e}")
+            emit(f"❌ Error storing/displaying PnL for position {getattr(pnl, 'positionId', '?')}: {e}")
 
+    ctx.refreshScheduler.on_pnl_response()
     ctx.request_render()
 
 @register(ProtoOAOrderDetailsRes)
 def on_order_details(res: ProtoOAOrderDetailsRes, ctx: MessageContext):
-    print(f"📄 Order Details - ID: {res.order.orderId}, Status: {res.order.orderStatus}")
+    emit(f"📄 Order Details - ID: {res.order.orderId}, Status: {res.order.orderStatus}")
     ctx.returnToMenu()
 
 @register(ProtoOAOrderListByPositionIdRes)
 def on_order_list_by_pos(res: ProtoOAOrderListByPositionIdRes, ctx: MessageContext):
-    print(f"📋 Orders in Position: {len(res.order)}")
+    emit(f"📋 Orders in Position: {len(res.order)}")
     ctx.returnToMenu()
 
 @register(2142)  # ProtoOAErrorRes
 def on_error_res(res: ProtoOAErrorRes, ctx: MessageContext):
-    print(f"❌ ERROR: {res.errorCode} — {res.description}")
+    emit(f"❌ ERROR: {res.errorCode} — {res.description}")
     if res.errorCode in ["ACCOUNT_NOT_AUTHORIZED", "CH_CTID_TRADER_ACCOUNT_NOT_FOUND"]:
-        print("🚫 Account authorization failed — please check ACCOUNT_ID in .env or use option 1 to authorize.")
+        emit("🚫 Account authorization failed — please check ACCOUNT_ID in .env or use option 1 to authorize.")
         # If you want to stop the reactor, do it in main where you own reactor lifecycle.
     ctx.returnToMenu()
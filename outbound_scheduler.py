@@ -0,0 +1,261 @@
+# outbound_scheduler.py
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional
+
+from twisted.internet import defer
+from ctrader_open_api.messages.OpenApiMessages_pb2 import (
+    ProtoOAAmendOrderReq, ProtoOAAmendPositionSLTPReq, ProtoOACancelOrderReq,
+    ProtoOAClosePositionReq, ProtoOADealListReq, ProtoOAGetPositionUnrealizedPnLReq,
+    ProtoOAGetTickDataReq, ProtoOAGetTrendbarsReq, ProtoOANewOrderReq,
+    ProtoOAOrderListByPositionIdReq, ProtoOAOrderListReq,
+)
+
+# priority lanes, drained lowest first
+LANE_ORDERS, LANE_CONTROL, LANE_DATA, LANE_POLL = range(4)
+LANE_NAMES = ("orders", "control", "data", "poll")
+
+# budgets; cTrader allows 50 req/s per connection, 5 req/s for historical data
+NORMAL, HISTORICAL = "normal", "historical"
+NORMAL_RATE, NORMAL_BURST = 45.0, 45
+HISTORICAL_RATE, HISTORICAL_BURST = 4.5, 5
+
+HISTORICAL_TYPES = (
+    ProtoOAGetTrendbarsReq, ProtoOAGetTickDataReq,
+    ProtoOADealListReq, ProtoOAOrderListReq, ProtoOAOrderListByPositionIdReq,
+)
+DEFAULT_LANES = {
+    ProtoOANewOrderReq: LANE_ORDERS,
+    ProtoOAClosePositionReq: LANE_ORDERS,
+    ProtoOACancelOrderReq: LANE_ORDERS,
+    ProtoOAAmendOrderReq: LANE_ORDERS,
+    ProtoOAAmendPositionSLTPReq: LANE_ORDERS,
+    ProtoOAGetTrendbarsReq: LANE_DATA,
+    ProtoOAGetTickDataReq: LANE_DATA,
+    ProtoOADealListReq: LANE_DATA,
+    ProtoOAOrderListReq: LANE_DATA,
+    ProtoOAOrderListByPositionIdReq: LANE_DATA,
+    ProtoOAGetPositionUnrealizedPnLReq: LANE_POLL,
+}
+
+
+class TokenBucket:
+    """`rate` tokens per second, holding at most `burst`."""
+
+    __slots__ = ("rate", "burst", "tokens", "_stamp", "_clock")
+
+    def __init__(self, rate: float, burst: float, clock: Callable[[], float]):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self._clock = clock
+        self._stamp = clock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self.tokens = min(self.burst, self.tokens + (now - self._stamp) * self.rate)
+        self._stamp = now
+
+    def take(self) -> bool:
+        self._refill()
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return True
+        return False
+
+    def wait_time(self) -> float:
+        """Seconds until the next token is available."""
+        self._refill()
+        return max(0.0, (1.0 - self.tokens) / self.rate)
+
+
+class _Pending:
+    __slots__ = ("request", "clientMsgId", "kwargs", "lane", "enqueued_at", "waiters")
+
+    def __init__(self, request, clientMsgId, kwargs, lane, enqueued_at):
+        self.request = request
+        self.clientMsgId = clientMsgId
+        self.kwargs = kwargs
+        self.lane = lane
+        self.enqueued_at = enqueued_at
+        self.waiters: List[defer.Deferred] = []
+
+
+class LaneStats:
+    __slots__ = ("submitted", "sent", "coalesced", "max_depth", "wait_total", "wait_max")
+
+    def __init__(self):
+        self.submitted = self.sent = self.coalesced = self.max_depth = 0
+        self.wait_total = self.wait_max = 0.0
+
+
+class OutboundScheduler:
+    """
+    Single exit point for outgoing requests (wraps Client.send).
+
+    Requests are charged against a token bucket (historical data requests
+    have their own, smaller budget) and, when the bucket is empty, queued in
+    priority lanes: orders/closes first, then control (auth, subscriptions,
+    reconcile), then historical data, then polling. Within a lane order is
+    FIFO. A polling request whose payload type is already queued is
+    coalesced with it instead of queued again.
+
+    send() returns a Deferred that fires with the response like
+    Client.send(); the response timeout only starts once the request has
+    actually left the queue.
+    """
+
+    def __init__(
+        self,
+        *,
+        reactor,
+        send: Callable[..., defer.Deferred],
+        tracker=None,
+        normal_rate: float = NORMAL_RATE,
+        normal_burst: float = NORMAL_BURST,
+        historical_rate: float = HISTORICAL_RATE,
+        historical_burst: float = HISTORICAL_BURST,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.reactor = reactor
+        self._send = send
+        self.tracker = tracker     # RequestTracker: assigns clientMsgIds, times round trips
+        self.clock = clock
+        self.buckets = {
+            NORMAL: TokenBucket(normal_rate, normal_burst, clock),
+            HISTORICAL: TokenBucket(historical_rate, historical_burst, clock),
+        }
+        self._queues: Dict[str, List[Deque[_Pending]]] = {
+            b: [deque() for _ in LANE_NAMES] for b in self.buckets
+        }
+        self._wakeups: Dict[str, Optional[object]] = {b: None for b in self.buckets}
+        self.lane_stats = [LaneStats() for _ in LANE_NAMES]
+        self.dropped = 0
+
+    # ---------------- API ----------------
+
+    def send(self, request, clientMsgId=None, lane: Optional[int] = None, **kwargs) -> defer.Deferred:
+        """Drop-in for Client.send(); `lane` overrides the default lane for the message type."""
+        if lane is None:
+            lane = DEFAULT_LANES.get(type(request), LANE_CONTROL)
+        budget = HISTORICAL if isinstance(request, HISTORICAL_TYPES) else NORMAL
+        st = self.lane_stats[lane]
+        st.submitted += 1
+        d = defer.Deferred()
+
+        queue = self._queues[budget][lane]
+        if lane == LANE_POLL and clientMsgId is None:
+            for item in queue:
+                if type(item.request) is type(request):
+                    st.coalesced += 1
+                    item.waiters.append(d)
+                    return d
+
+        item = _Pending(request, clientMsgId, kwargs, lane, self.clock())
+        item.waiters.append(d)
+        if not self._backlog(budget) and self.buckets[budget].take():
+            self._dispatch(item)
+            return d
+        queue.append(item)
+        st.max_depth = max(st.max_depth, len(queue))
+        self._schedule(budget)
+        return d
+
+    def clear(self) -> None:
+        """Drop everything still queued (e.g. on disconnect); their Deferreds fail with CancelledError."""
+        dropped: List[_Pending] = []
+        for budget, lanes in self._queues.items():
+            for q in lanes:
+                dropped.extend(q)
+                q.clear()
+            call = self._wakeups[budget]
+            if call is not None and call.active():
+                call.cancel()
+            self._wakeups[budget] = None
+        self.dropped += len(dropped)
+        # errback only once the queues are empty: a waiter may send again from its errback
+        for item in dropped:
+            for w in item.waiters:
+                w.errback(defer.CancelledError("outbound queue cleared"))
+
+    def depth(self) -> int:
+        return sum(len(q) for lanes in self._queues.values() for q in lanes)
+
+    def stats(self) -> Dict[str, dict]:
+        """Per lane: submitted, sent, coalesced, queued, max_depth, avg/max wait (ms)."""
+        out = {}
+        for lane, name in enumerate(LANE_NAMES):
+            st = self.lane_stats[lane]
+            out[name] = {
+                "submitted": st.submitted,
+                "sent": st.sent,
+                "coalesced": st.coalesced,
+                "queued": sum(len(lanes[lane]) for lanes in self._queues.values()),
+                "max_depth": st.max_depth,
+                "avg_wait_ms": (st.wait_total / st.sent * 1000.0) if st.sent else 0.0,
+                "max_wait_ms": st.wait_max * 1000.0,
+            }
+        return out
+
+    def label(self) -> str:
+        sent = sum(st.sent for st in self.lane_stats)
+        wait_max = max(st.wait_max for st in self.lane_stats)
+        return f"tx q{self.depth()} · max wait {wait_max * 1000.0:.0f}ms · {sent} sent"
+
+    # ---------------- internals ----------------
+
+    def _backlog(self, budget: str) -> bool:
+        return any(self._queues[budget])
+
+    def _schedule(self, budget: str) -> None:
+        call = self._wakeups[budget]
+        if call is not None and call.active():
+            return
+        self._wakeups[budget] = self.reactor.callLater(self.buckets[budget].wait_time(), self._pump, budget)
+
+    def _pump(self, budget: str) -> None:
+        self._wakeups[budget] = None
+        bucket = self.buckets[budget]
+        for q in self._queues[budget]:
+            while q:
+                if not bucket.take():
+                    self._schedule(budget)
+                    return
+                self._dispatch(q.popleft())
+
+    def _dispatch(self, item: _Pending) -> None:
+        waited = self.clock() - item.enqueued_at
+        st = self.lane_stats[item.lane]
+        st.sent += 1
+        st.wait_total += waited
+        if waited > st.wait_max:
+            st.wait_max = waited
+
+        msg_id = item.clientMsgId
+        tracker = self.tracker
+        if tracker is not None:
+            msg_id = tracker.start(item.request, msg_id)
+        try:
+            result = self._send(item.request, clientMsgId=msg_id, **item.kwargs)
+        except Exception:
+            result = defer.fail()
+        waiters = item.waiters
+
+        if tracker is not None:
+            def track_failure(failure):
+                if failure.check(defer.TimeoutError):
+                    tracker.timed_out(msg_id)
+                else:
+                    tracker.forget(msg_id)
+                return failure
+            result.addErrback(track_failure)
+
+        def fire(value, ok):
+            for w in waiters:
+                if ok:
+                    w.callback(value)
+                else:
+                    w.errback(value)
+            return None
+
+        result.addCallbacks(fire, fire, callbackArgs=(True,), errbackArgs=(False,))
@@ -0,0 +1,143 @@
+# output_sink.py
+import atexit
+import io
+import sys
+import threading
+from collections import deque
+from typing import Optional, TextIO
+
+
+class OutputSink:
+    """
+    Destination for handler output (replaces per-message stdout swapping).
+
+    Console mode (default): emit() behaves like print().
+    Viewer mode: emit() only appends the formatted line to a bounded ring
+    buffer; a background writer thread drains it into the log file, which is
+    opened once and kept open. The reactor thread never touches the file.
+    sys.stderr (tracebacks, warnings, Twisted's log) is pointed at the same
+    buffer once for the whole viewer session rather than per message, and
+    restored when the viewer stops or the sink is closed.
+    """
+
+    def __init__(self, logfile_path: str = "live_pnl_stdout.log", capacity: int = 10000):
+        self.logfile_path = logfile_path
+        self._buf: deque = deque(maxlen=capacity)
+        self._cond = threading.Condition()
+        self._viewer_active = False
+        self._thread: Optional[threading.Thread] = None
+        self._file: Optional[TextIO] = None
+        self._closed = False
+        self._stderr = _SinkStream(self)
+        self._saved_stderr: Optional[TextIO] = None
+
+        # counters
+        self.buffered = 0
+        self.dropped = 0   # overwritten before the writer got to them
+
+        atexit.register(self.close)
+
+    @property
+    def viewer_active(self) -> bool:
+        return self._viewer_active
+
+    def set_viewer_active(self, active: bool) -> None:
+        """Route output to the log file (True) or the console (False)."""
+        if active and self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="output-sink", daemon=True)
+            self._thread.start()
+        with self._cond:
+            self._viewer_active = active
+            self._cond.notify()
+        if active and self._saved_stderr is None:
+            self._saved_stderr, sys.stderr = sys.stderr, self._stderr
+        elif not active:
+            self._restore_stderr()
+
+    def emit(self, *args, sep: str = " ", end: str = "\n") -> None:
+        """print()-compatible entry point used by handlers."""
+        if not self._viewer_active:
+            print(*args, sep=sep, end=end)
+            return
+        self._append(sep.join(str(a) for a in args) + end)
+
+    def close(self) -> None:
+        """Flush whatever is buffered and close the log file (idempotent)."""
+        self._restore_stderr()
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify()
+        # let the writer finish its current batch before touching the file here
+        if self._thread is not None:
+            self._thread.join()
+        with self._cond:
+            lines = list(self._buf)
+            self._buf.clear()
+        self._write(lines)
+        if self._file is not None:
+            try:
+                self._file.close()
+            except Exception:
+                pass
+            self._file = None
+
+    # ---------------- internals ----------------
+
+    def _append(self, text: str) -> None:
+        with self._cond:
+            if len(self._buf) == self._buf.maxlen:
+                self.dropped += 1
+            self._buf.append(text)
+            self.buffered += 1
+            self._cond.notify()
+
+    def _restore_stderr(self) -> None:
+        if self._saved_stderr is None:
+            return
+        if sys.stderr is self._stderr:    # leave it alone if someone else replaced it meanwhile
+            sys.stderr = self._saved_stderr
+        self._saved_stderr = None
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._buf and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                lines = list(self._buf)
+                self._buf.clear()
+            self._write(lines)
+
+    def _write(self, lines) -> None:
+        if not lines:
+            return
+        try:
+            if self._file is None:
+                self._file = open(self.logfile_path, "a", encoding="utf-8")
+            self._file.write("".join(lines))
+            self._file.flush()
+        except Exception:
+            pass  # output is best-effort; never take down the writer
+
+
+class _SinkStream(io.TextIOBase):
+    """Write-only text stream feeding an OutputSink's buffer (stands in for sys.stderr)."""
+
+    def __init__(self, sink: OutputSink):
+        super().__init__()
+        self._sink = sink
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        if text:
+            self._sink._append(text)
+        return len(text)
+
+
+sink = OutputSink()
+emit = sink.emit
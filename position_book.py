@@ -0,0 +1,283 @@
+# position_book.py
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+BUY, SELL = 1, 2  # ProtoOATradeSide values
+
+
+def side_sign(trade_side) -> int:
+    return 1 if int(trade_side) == BUY else -1
+
+
+class PositionRecord:
+    """
+    Slim copy of a ProtoOAPosition, extracted once at ingestion.
+
+    Holds only what the viewer, the SL logic, the close path and reconcile
+    diffing read, as flat attributes (no nested tradeData message).
+    """
+
+    __slots__ = (
+        "positionId", "symbolId", "tradeSide", "volume", "openTimestamp",
+        "price", "stopLoss", "takeProfit", "swap", "usedMargin",
+    )
+
+    def __init__(self, positionId, symbolId, tradeSide, volume, openTimestamp=0,
+                 price=0.0, stopLoss=None, takeProfit=None, swap=0, usedMargin=0):
+        self.positionId = positionId
+        self.symbolId = symbolId
+        self.tradeSide = tradeSide
+        self.volume = volume
+        self.openTimestamp = openTimestamp
+        self.price = price
+        self.stopLoss = stopLoss
+        self.takeProfit = takeProfit
+        self.swap = swap
+        self.usedMargin = usedMargin
+
+    @classmethod
+    def from_proto(cls, pos) -> "PositionRecord":
+        td = pos.tradeData
+        return cls(
+            pos.positionId,
+            td.symbolId,
+            td.tradeSide,
+            td.volume,
+            td.openTimestamp,
+            pos.price,
+            pos.stopLoss if pos.HasField("stopLoss") else None,
+            pos.takeProfit if pos.HasField("takeProfit") else None,
+            pos.swap,
+            pos.usedMargin,
+        )
+
+    def __repr__(self) -> str:
+        return (f"PositionRecord(id={self.positionId}, symbol={self.symbolId}, side={self.tradeSide}, "
+                f"volume={self.volume}, price={self.price})")
+
+
+class PositionBook:
+    """
+    Array-backed copy of the open positions, used for PnL math.
+
+    Each position lives in a slot of parallel NumPy arrays (entry price,
+    volume in lots, side sign, symbol index, contract size). Removed slots go
+    on a free-list and are reused, so the arrays only grow when the book does.
+    PnL for every position on a symbol, or for a batch of ticks across many
+    symbols, is one vectorized expression instead of a per-position loop.
+
+    PnL matches the previous per-position formula:
+        BUY:  (bid - entry) * lots * contract_size
+        SELL: (entry - ask) * lots * contract_size
+    plus a per-position offset calibrated against the server's net PnL
+    (commission, swap, account-currency conversion), see set_offset().
+    A new position, or one whose volume, entry price, symbol or contract size
+    changed, is uncalibrated until the next server value; callers that display
+    PnL pass calibrated_only=True so tick-derived values never stand in for
+    a server answer. contract_size_for may return None for an unknown symbol.
+    """
+
+    def __init__(self, *, contract_size_for: Callable[[int], float] = lambda sid: 100000, capacity: int = 1024):
+        self.contract_size_for = contract_size_for
+        self._alloc(max(16, capacity))
+        self._slot_by_pid: Dict[int, int] = {}
+        self._free: List[int] = []
+        self._high = 0                                  # slots [0, _high) have been used
+
+        self._sym_index: Dict[int, int] = {}            # symbolId -> dense index
+        self._sym_ids: List[int] = []                   # dense index -> symbolId
+        self._sym_slots: Dict[int, set] = {}            # symbolId -> live slots
+        self._sym_slots_arr: Dict[int, np.ndarray] = {} # cached np view of the above
+
+    # ---------------- storage ----------------
+
+    def _alloc(self, cap: int) -> None:
+        self._pid = np.zeros(cap, dtype=np.int64)
+        self._entry = np.zeros(cap, dtype=np.float64)
+        self._lots = np.zeros(cap, dtype=np.float64)
+        self._side = np.zeros(cap, dtype=np.int8)
+        self._sym = np.full(cap, -1, dtype=np.int32)
+        self._contract = np.zeros(cap, dtype=np.float64)
+        self._offset = np.zeros(cap, dtype=np.float64)
+        self._calibrated = np.zeros(cap, dtype=bool)
+
+    def _columns(self) -> tuple:
+        return (self._pid, self._entry, self._lots, self._side, self._sym, self._contract, self._offset,
+                self._calibrated)
+
+    def _grow(self) -> None:
+        old = self._columns()
+        n = len(self._pid)
+        self._alloc(n * 2)
+        for new, prev in zip(self._columns(), old):
+            new[:n] = prev
+
+    def _symbol_idx(self, symbol_id: int) -> int:
+        idx = self._sym_index.get(symbol_id)
+        if idx is None:
+            idx = self._sym_index[symbol_id] = len(self._sym_ids)
+            self._sym_ids.append(symbol_id)
+        return idx
+
+    def _slots_for(self, symbol_id: int) -> np.ndarray:
+        arr = self._sym_slots_arr.get(symbol_id)
+        if arr is None:
+            arr = np.fromiter(self._sym_slots.get(symbol_id, ()), dtype=np.int64)
+            self._sym_slots_arr[symbol_id] = arr
+        return arr
+
+    # ---------------- mutation ----------------
+
+    def __len__(self) -> int:
+        return len(self._slot_by_pid)
+
+    def __contains__(self, pos_id: int) -> bool:
+        return pos_id in self._slot_by_pid
+
+    def upsert(self, pos_id: int, symbol_id: int, trade_side, volume_units: int, entry_price: float) -> None:
+        slot = self._slot_by_pid.get(pos_id)
+        if slot is None:
+            if self._free:
+                slot = self._free.pop()
+            else:
+                if self._high == len(self._pid):
+                    self._grow()
+                slot = self._high
+                self._high += 1
+            self._slot_by_pid[pos_id] = slot
+            self._uncalibrate(slot)
+        else:
+            prev_sid = self._sym_ids[self._sym[slot]]
+            if prev_sid != symbol_id:
+                self._unlink(prev_sid, slot)
+                self._uncalibrate(slot)
+            elif self._entry[slot] != entry_price or self._lots[slot] != volume_units / 100.0:
+                # partial close / price amendment: the old offset no longer applies
+                self._uncalibrate(slot)
+
+        self._pid[slot] = pos_id
+        self._entry[slot] = entry_price
+        self._lots[slot] = volume_units / 100.0
+        self._side[slot] = side_sign(trade_side)
+        self._sym[slot] = self._symbol_idx(symbol_id)
+        self._contract[slot] = self._contract_size(symbol_id)
+
+        slots = self._sym_slots.setdefault(symbol_id, set())
+        if slot not in slots:
+            slots.add(slot)
+            self._sym_slots_arr.pop(symbol_id, None)
+
+    def upsert_position(self, pos) -> None:
+        self.upsert(pos.positionId, pos.symbolId, pos.tradeSide, pos.volume, pos.price)
+
+    def remove(self, pos_id: int) -> None:
+        slot = self._slot_by_pid.pop(pos_id, None)
+        if slot is None:
+            return
+        self._unlink(self._sym_ids[self._sym[slot]], slot)
+        self._sym[slot] = -1
+        self._lots[slot] = 0.0
+        self._free.append(slot)
+
+    def _uncalibrate(self, slot) -> None:
+        self._offset[slot] = 0.0
+        self._calibrated[slot] = False
+
+    def _contract_size(self, symbol_id: int) -> float:
+        size = self.contract_size_for(symbol_id)
+        return np.nan if size is None else size
+
+    def _unlink(self, symbol_id: int, slot: int) -> None:
+        slots = self._sym_slots.get(symbol_id)
+        if slots is not None:
+            slots.discard(slot)
+            if not slots:
+                del self._sym_slots[symbol_id]
+        self._sym_slots_arr.pop(symbol_id, None)
+
+    def clear(self) -> None:
+        self._slot_by_pid.clear()
+        self._free.clear()
+        self._high = 0
+        self._sym[:] = -1
+        self._sym_slots.clear()
+        self._sym_slots_arr.clear()
+
+    def rebuild(self, positions: Iterable) -> None:
+        """Make the book hold exactly `positions`; unchanged positions keep their calibration."""
+        seen = set()
+        for pos in positions:
+            self.upsert_position(pos)
+            seen.add(pos.positionId)
+        for pos_id in [pid for pid in self._slot_by_pid if pid not in seen]:
+            self.remove(pos_id)
+
+    def refresh_contract_sizes(self) -> None:
+        """Re-read contract sizes (e.g. after the symbols list arrived)."""
+        for symbol_id in self._sym_slots:
+            slots = self._slots_for(symbol_id)
+            size = self._contract_size(symbol_id)
+            changed = slots[~np.isclose(self._contract[slots], size, equal_nan=True)]
+            self._uncalibrate(changed)
+            self._contract[slots] = size
+
+    def is_calibrated(self, pos_id: int) -> bool:
+        slot = self._slot_by_pid.get(pos_id)
+        return slot is not None and bool(self._calibrated[slot])
+
+    # ---------------- PnL ----------------
+
+    def raw_pnl(self, pos_id: int, bid: float, ask: float) -> Optional[float]:
+        """Price-only PnL of one position (no offset), or None if unknown."""
+        slot = self._slot_by_pid.get(pos_id)
+        if slot is None or np.isnan(self._contract[slot]):
+            return None
+        side = int(self._side[slot])
+        mkt = bid if side > 0 else ask
+        return float((mkt - self._entry[slot]) * side * self._lots[slot] * self._contract[slot])
+
+    def set_offset(self, pos_id: int, offset: float) -> None:
+        """Calibrate: server_pnl - raw_pnl at the time the server value arrived."""
+        slot = self._slot_by_pid.get(pos_id)
+        if slot is not None and np.isfinite(offset) and not np.isnan(self._contract[slot]):
+            self._offset[slot] = offset
+            self._calibrated[slot] = True
+
+    def symbol_pnl(self, symbol_id: int, bid: float, ask: float,
+                   calibrated_only: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+        """(positionIds, pnl) for every position on one symbol, in one vectorized step."""
+        slots = self._slots_for(symbol_id)
+        if calibrated_only:
+            slots = slots[self._calibrated[slots]]
+        if not len(slots):
+            return slots, np.empty(0, dtype=np.float64)
+        side = self._side[slots]
+        mkt = np.where(side > 0, bid, ask)
+        pnl = (mkt - self._entry[slots]) * side * self._lots[slots] * self._contract[slots] + self._offset[slots]
+        return self._pid[slots], pnl
+
+    def batch_pnl(self, prices: Dict[int, Tuple[Optional[float], Optional[float]]],
+                  calibrated_only: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (positionIds, pnl) for all positions on the symbols in `prices`
+        ({symbolId: (bid, ask)}), computed in a single pass over the book.
+        """
+        n_sym = len(self._sym_ids)
+        bid = np.full(n_sym + 1, np.nan)   # last cell catches free slots (sym == -1)
+        ask = np.full(n_sym + 1, np.nan)
+        for symbol_id, (b, a) in prices.items():
+            idx = self._sym_index.get(symbol_id)
+            if idx is not None and b is not None and a is not None:
+                bid[idx] = b
+                ask[idx] = a
+
+        sym = self._sym[:self._high]
+        side = self._side[:self._high]
+        mkt = np.where(side > 0, bid[sym], ask[sym])
+        mask = ~np.isnan(mkt) & ~np.isnan(self._contract[:self._high])
+        if calibrated_only:
+            mask &= self._calibrated[:self._high]
+        pnl = (mkt[mask] - self._entry[:self._high][mask]) * side[mask] * self._lots[:self._high][mask] * self._contract[:self._high][mask]
+        pnl += self._offset[:self._high][mask]
+        return self._pid[:self._high][mask], pnl
@@ -0,0 +1,131 @@
+# queued_logging.py
+import atexit
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import List
+
+LOG_FORMAT = "%(asctime)s [%(levelname)s] %(message)s"
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+EXEC_EVENTS_LOGGER = "exec_events"
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler over a bounded queue: never blocks the caller, counts what it had to drop."""
+
+    def __init__(self, q: queue.Queue):
+        super().__init__(q)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class BatchingRotatingFileHandler(RotatingFileHandler):
+    """Size-rotated file handler that flushes every `batch_size` records (or when the listener runs dry)."""
+
+    def __init__(self, filename: str, *, max_bytes: int, backup_count: int, batch_size: int = 64):
+        super().__init__(filename, mode="a", maxBytes=max_bytes, backupCount=backup_count,
+                         encoding="utf-8", delay=True)
+        self.batch_size = batch_size
+        self._unflushed = 0
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            if self.shouldRollover(record):
+                self.doRollover()
+            if self.stream is None:
+                self.stream = self._open()
+            self.stream.write(self.format(record) + self.terminator)
+            self._unflushed += 1
+            if self._unflushed >= self.batch_size:
+                self.flush()
+        except Exception:
+            self.handleError(record)
+
+    def flush(self) -> None:
+        self._unflushed = 0
+        super().flush()
+
+
+class BatchingQueueListener(QueueListener):
+    """QueueListener that flushes its handlers each time the queue runs empty, i.e. once per burst."""
+
+    def dequeue(self, block: bool):
+        try:
+            return self.queue.get_nowait()
+        except queue.Empty:
+            if not block:
+                raise
+        for handler in self.handlers:
+            handler.flush()
+        return self.queue.get(block=True)
+
+
+class QueuedLogging:
+    """Handle returned by setup_logging(): stop() drains the queue and flushes files."""
+
+    def __init__(self, queue_handler: DroppingQueueHandler, listener: BatchingQueueListener,
+                 file_handlers: List[logging.Handler]):
+        self.queue_handler = queue_handler
+        self.listener = listener
+        self.file_handlers = file_handlers
+        self._stopped = False
+
+    @property
+    def dropped(self) -> int:
+        return self.queue_handler.dropped
+
+    def stop(self) -> None:
+        if self._stopped:
+            return
+        self._stopped = True
+        try:
+            self.listener.stop()
+        finally:
+            for h in self.file_handlers:
+                h.close()
+
+
+def setup_logging(
+    *,
+    errors_path: str = "close_position_errors.log",
+    exec_events_path: str = "exec_event_errors.log",
+    level: int = logging.INFO,
+    max_bytes: int = 5 * 1024 * 1024,
+    backup_count: int = 3,
+    queue_size: int = 10000,
+) -> QueuedLogging:
+    """
+    Route all logging through a bounded queue to a background writer thread.
+
+    - root logger          -> errors_path
+    - "exec_events" logger -> exec_events_path (ProtoOAExecutionEvent handler failures)
+
+    Callers (reactor, key thread) only format and enqueue; disk I/O, batching
+    and size-based rotation happen on the listener thread.
+    """
+    q: queue.Queue = queue.Queue(maxsize=queue_size)
+
+    errors_file = BatchingRotatingFileHandler(errors_path, max_bytes=max_bytes, backup_count=backup_count)
+    errors_file.setFormatter(logging.Formatter(LOG_FORMAT, DATE_FORMAT))
+    errors_file.addFilter(lambda r: not r.name.startswith(EXEC_EVENTS_LOGGER))
+
+    exec_file = BatchingRotatingFileHandler(exec_events_path, max_bytes=max_bytes, backup_count=backup_count)
+    exec_file.setFormatter(logging.Formatter("=" * 60 + "\n" + LOG_FORMAT, DATE_FORMAT))
+    exec_file.addFilter(logging.Filter(EXEC_EVENTS_LOGGER))
+
+    queue_handler = DroppingQueueHandler(q)
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(queue_handler)
+
+    listener = BatchingQueueListener(q, errors_file, exec_file, respect_handler_level=True)
+    listener.start()
+
+    handle = QueuedLogging(queue_handler, listener, [errors_file, exec_file])
+    atexit.register(handle.stop)
+    return handle
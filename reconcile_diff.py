@@ -0,0 +1,94 @@
+# reconcile_diff.py
+from typing import Dict, List, Set, Tuple
+
+from position_book import PositionRecord
+
+# fields a reconcile can legitimately change on an open position
+TRACKED_FIELDS = ("price", "volume", "stopLoss", "takeProfit", "swap")
+# fields that should never change for a given positionId; compared anyway so a
+# surprise is applied rather than silently kept
+IDENTITY_FIELDS = ("symbolId", "tradeSide", "openTimestamp")
+_COMPARED = TRACKED_FIELDS + IDENTITY_FIELDS
+
+
+class ReconcileDiff:
+    """
+    Result of comparing a ProtoOAReconcileRes snapshot with the current book.
+
+    added:    new PositionRecords
+    removed:  positionIds no longer open
+    modified: (old, new, changed_field_names) for positions whose tracked or
+              identity fields differ
+    """
+
+    __slots__ = ("added", "removed", "modified")
+
+    def __init__(self):
+        self.added: List[PositionRecord] = []
+        self.removed: List[int] = []
+        self.modified: List[Tuple[PositionRecord, PositionRecord, Tuple[str, ...]]] = []
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.removed or self.modified)
+
+    def __repr__(self) -> str:
+        return f"ReconcileDiff(added={len(self.added)}, removed={len(self.removed)}, modified={len(self.modified)})"
+
+
+def changed_fields(old: PositionRecord, new: PositionRecord) -> Tuple[str, ...]:
+    return tuple(f for f in _COMPARED if getattr(old, f) != getattr(new, f))
+
+
+def diff_positions(current: Dict[int, PositionRecord], snapshot) -> ReconcileDiff:
+    """
+    Diff `current` (positionId -> PositionRecord) against the ProtoOAPosition
+    messages of a reconcile response. The scan is over the snapshot, but the
+    result only lists what changed, so applying it is O(changes).
+    """
+    diff = ReconcileDiff()
+    seen = set()
+    for p in snapshot:
+        pid = p.positionId
+        seen.add(pid)
+        old = current.get(pid)
+        new = PositionRecord.from_proto(p)
+        if old is None:
+            diff.added.append(new)
+            continue
+        fields = changed_fields(old, new)
+        if fields:
+            diff.modified.append((old, new, fields))
+    if len(seen) != len(current) or diff.added:
+        diff.removed = [pid for pid in current if pid not in seen]
+    return diff
+
+
+def symbol_changes(current: Dict[int, PositionRecord], index: Dict[int, Set[int]],
+                   diff: ReconcileDiff) -> Tuple[Set[int], Set[int]]:
+    """
+    Symbols that gain their first position and symbols that lose their last
+    one when `diff` is applied; `index` (symbolId -> positionIds) is the
+    state before. Only symbols the diff touches are looked at.
+    """
+    after: Dict[int, Set[int]] = {}
+
+    def ids(symbol_id: int) -> Set[int]:
+        got = after.get(symbol_id)
+        if got is None:
+            got = after[symbol_id] = set(index.get(symbol_id, ()))
+        return got
+
+    for pid in diff.removed:
+        old = current.get(pid)
+        if old is not None:
+            ids(old.symbolId).discard(pid)
+    for old, new, _ in diff.modified:
+        if old.symbolId != new.symbolId:
+            ids(old.symbolId).discard(old.positionId)
+            ids(new.symbolId).add(new.positionId)
+    for new in diff.added:
+        ids(new.symbolId).add(new.positionId)
+
+    gained = {sid for sid, pids in after.items() if pids and not index.get(sid)}
+    lost = {sid for sid, pids in after.items() if not pids and index.get(sid)}
+    return gained, lost
@@ -0,0 +1,175 @@
+# refresh_scheduler.py
+import time
+from typing import Callable, Dict, Optional
+
+
+class RefreshScheduler:
+    """
+    Adaptive server refresh for the live viewer (replaces the fixed 0.3 s
+    PnL loop and 5 s reconcile poll).
+
+    PnL is derived locally from ticks between server answers, so the server
+    is only asked for authoritative unrealized PnL:
+      - every `pnl_base` seconds while ticks keep arriving,
+      - every `pnl_fast` seconds after a response where local and server
+        values diverged beyond tolerance,
+      - backing off (x2 per quiet response) up to `pnl_idle_max` while the
+        book is idle.
+    Reconcile follows the same active/idle backoff between `reconcile_base`
+    and `reconcile_idle_max`; execution events already trigger their own
+    reconcile.
+
+    stats() reports requests sent against what the old fixed loops would have
+    sent over the same time.
+    """
+
+    def __init__(
+        self,
+        *,
+        reactor,
+        request_pnl: Callable[[], None],
+        request_reconcile: Callable[[], None],
+        pnl_fast: float = 1.0,
+        pnl_base: float = 5.0,
+        pnl_idle_max: float = 30.0,
+        reconcile_base: float = 10.0,
+        reconcile_idle_max: float = 60.0,
+        abs_tolerance: float = 0.5,      # account currency
+        rel_tolerance: float = 0.02,     # of |server PnL|
+        legacy_pnl_interval: float = 0.3,
+        legacy_reconcile_interval: float = 5.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.reactor = reactor
+        self.request_pnl = request_pnl
+        self.request_reconcile = request_reconcile
+        self.pnl_fast = pnl_fast
+        self.pnl_base = pnl_base
+        self.pnl_idle_max = pnl_idle_max
+        self.reconcile_base = reconcile_base
+        self.reconcile_idle_max = reconcile_idle_max
+        self.abs_tolerance = abs_tolerance
+        self.rel_tolerance = rel_tolerance
+        self.legacy_pnl_interval = legacy_pnl_interval
+        self.legacy_reconcile_interval = legacy_reconcile_interval
+        self.clock = clock
+
+        self.pnl_interval = pnl_base
+        self.reconcile_interval = reconcile_base
+        self._pnl_call = None
+        self._reconcile_call = None
+        self._started_at: Optional[float] = None
+        self._active_since_pnl = False
+        self._active_since_reconcile = False
+        self._diverged = 0
+
+        # counters
+        self.pnl_sent = 0
+        self.reconcile_sent = 0
+        self.divergences = 0
+
+    # ---------------- lifecycle ----------------
+
+    @property
+    def running(self) -> bool:
+        return self._started_at is not None
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._started_at = self.clock()
+        self.pnl_sent = self.reconcile_sent = self.divergences = 0
+        self.pnl_interval = self.pnl_base
+        self.reconcile_interval = self.reconcile_base
+        self._pnl_call = self.reactor.callLater(self.pnl_interval, self._fire_pnl)
+        self._reconcile_call = self.reactor.callLater(self.reconcile_interval, self._fire_reconcile)
+
+    def stop(self) -> None:
+        for call in (self._pnl_call, self._reconcile_call):
+            if call is not None and call.active():
+                call.cancel()
+        self._pnl_call = self._reconcile_call = None
+        self._started_at = None
+
+    # ---------------- inputs ----------------
+
+    def note_activity(self) -> None:
+        """Ticks arrived for symbols with open positions."""
+        self._active_since_pnl = True
+        self._active_since_reconcile = True
+
+    def on_server_pnl(self, local_pnl: Optional[float], server_pnl: float) -> None:
+        """One position's server value vs what we were showing locally."""
+        if local_pnl is None:
+            return
+        if abs(server_pnl - local_pnl) > max(self.abs_tolerance, self.rel_tolerance * abs(server_pnl)):
+            self._diverged += 1
+
+    def on_pnl_response(self) -> None:
+        """A full ProtoOAGetPositionUnrealizedPnLRes has been processed: pick the next interval."""
+        if self._diverged:
+            self.divergences += 1
+            new = self.pnl_fast
+        elif self._active_since_pnl:
+            new = self.pnl_base
+        else:
+            new = min(self.pnl_interval * 2, self.pnl_idle_max)
+        self._diverged = 0
+        self._active_since_pnl = False
+        self._set_pnl_interval(new)
+
+    # ---------------- reporting ----------------
+
+    def stats(self) -> Dict[str, float]:
+        elapsed = (self.clock() - self._started_at) if self.running else 0.0
+        legacy = (elapsed / self.legacy_pnl_interval) + (elapsed / self.legacy_reconcile_interval)
+        sent = self.pnl_sent + self.reconcile_sent
+        minutes = elapsed / 60.0
+        return {
+            "pnl_interval": self.pnl_interval,
+            "reconcile_interval": self.reconcile_interval,
+            "sent": sent,
+            "legacy": legacy,
+            "saved_per_min": ((legacy - sent) / minutes) if minutes > 0 else 0.0,
+            "divergences": self.divergences,
+        }
+
+    def label(self) -> str:
+        st = self.stats()
+        return (f"refresh pnl {st['pnl_interval']:.0f}s/recon {st['reconcile_interval']:.0f}s"
+                f" · saved {max(0.0, st['saved_per_min']):.0f} req/min")
+
+    # ---------------- internals ----------------
+
+    def _set_pnl_interval(self, new: float) -> None:
+        old, self.pnl_interval = self.pnl_interval, new
+        call = self._pnl_call
+        if new < old and call is not None and call.active():
+            # pull the pending request forward rather than waiting out the old interval
+            remaining = call.getTime() - self.reactor.seconds()
+            if remaining > new:
+                call.reset(new)
+
+    def _fire_pnl(self) -> None:
+        if not self.running:
+            return
+        self.pnl_sent += 1
+        try:
+            self.request_pnl()
+        finally:
+            # safety net: if the response never comes we still poll at the current cadence
+            self._pnl_call = self.reactor.callLater(self.pnl_interval, self._fire_pnl)
+
+    def _fire_reconcile(self) -> None:
+        if not self.running:
+            return
+        if self._active_since_reconcile:
+            self.reconcile_interval = self.reconcile_base
+        else:
+            self.reconcile_interval = min(self.reconcile_interval * 2, self.reconcile_idle_max)
+        self._active_since_reconcile = False
+        self.reconcile_sent += 1
+        try:
+            self.request_reconcile()
+        finally:
+            self._reconcile_call = self.reactor.callLater(self.reconcile_interval, self._fire_reconcile)
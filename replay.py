@@ -0,0 +1,203 @@
+# replay.py
+import logging
+import time
+from typing import Callable, Dict, List, Optional
+
+from twisted.internet import defer
+
+from frame_recorder import INBOUND, read_frames
+
+log = logging.getLogger(__name__)
+
+
+class ReplayClient:
+    """
+    Stands in for ctrader_open_api.Client when replaying a recording.
+
+    send() goes nowhere: it counts the request and returns a Deferred that
+    never fires. The recorded answers carry the original session's
+    clientMsgIds, which would collide with the replay's own numbering, so
+    main.py gives the replay's RequestTracker a different prefix. received()
+    hands a frame to the message callback exactly like Client._received does.
+    """
+
+    def __init__(self):
+        self._connected = None
+        self._disconnected = None
+        self._message_received = None
+
+        # counters
+        self.sent = 0
+
+    def send(self, message, clientMsgId=None, responseTimeoutInSeconds=5, **params) -> defer.Deferred:
+        self.sent += 1
+        return defer.Deferred()
+
+    def received(self, message) -> None:
+        if self._message_received is not None:
+            self._message_received(self, message)
+
+    def setConnectedCallback(self, callback) -> None:
+        self._connected = callback
+
+    def setDisconnectedCallback(self, callback) -> None:
+        self._disconnected = callback
+
+    def setMessageReceivedCallback(self, callback) -> None:
+        self._message_received = callback
+
+    def startService(self) -> None:
+        pass    # frames come from ReplayEngine
+
+    def stopService(self) -> None:
+        pass
+
+
+class ReplayEngine:
+    """
+    Feeds the inbound frames of a FrameRecorder file to `deliver` on the reactor.
+
+    speed=1 keeps the recorded gaps (real time), speed=N divides them by N
+    and speed=0 delivers as fast as possible. Frames that are due are
+    delivered back to back, at most `chunk` per reactor turn, so the tick
+    conflator, render scheduler and timers still get their turns the way
+    they would during a burst of live traffic. Outbound frames are what the
+    recorded session sent; they are counted, not replayed (the app sends
+    its own requests to the ReplayClient).
+    """
+
+    def __init__(
+        self,
+        path: str,
+        *,
+        reactor,
+        deliver: Callable[[object], None],
+        speed: float = 1.0,
+        chunk: int = 500,
+        on_done: Callable[[], None] = lambda: None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.path = path
+        self.reactor = reactor
+        self.deliver = deliver
+        self.speed = max(0.0, float(speed))
+        self.chunk = max(1, int(chunk))
+        self.on_done = on_done
+        self.clock = clock
+
+        self._frames = None
+        self._next = None
+        self._rec_first: Optional[int] = None   # recorded monotonic ns of the first inbound frame
+        self._rec_last: Optional[int] = None
+        self._started: Optional[float] = None
+        self._finished: Optional[float] = None
+        self._call = None
+
+        # counters
+        self.delivered = 0
+        self.outbound = 0
+        self.errors = 0
+        self.dispatch_s = 0.0
+        self.max_lag = 0.0       # how late a paced frame was delivered (s)
+        self.turns = 0
+
+    # ---------------- lifecycle ----------------
+
+    def start(self) -> None:
+        self._frames = read_frames(self.path)
+        self._advance()
+        self._started = self.clock()
+        self._call = self.reactor.callLater(0, self._pump)
+
+    def stop(self) -> None:
+        if self._call is not None and self._call.active():
+            self._call.cancel()
+        self._call = None
+        self._finish()
+
+    @property
+    def done(self) -> bool:
+        return self._finished is not None
+
+    def _advance(self) -> None:
+        self._next = next(self._frames, None)
+        while self._next is not None and self._next[0] != INBOUND:
+            self.outbound += 1
+            self._next = next(self._frames, None)
+        if self._next is not None and self._rec_first is None:
+            self._rec_first = self._next[1]
+
+    def _due(self, t_ns: int) -> float:
+        return self._started + (t_ns - self._rec_first) / 1e9 / self.speed
+
+    def _pump(self) -> None:
+        self._call = None
+        self.turns += 1
+        now = self.clock()
+        deliver, perf = self.deliver, time.perf_counter
+        n = 0
+        while self._next is not None and n < self.chunk:
+            _, t_ns, message = self._next
+            if self.speed:
+                due = self._due(t_ns)
+                if due > now:
+                    break
+                if now - due > self.max_lag:
+                    self.max_lag = now - due
+            t0 = perf()
+            try:
+                deliver(message)
+            except Exception:
+                self.errors += 1
+                log.exception("replay: handler failed for payloadType %s", getattr(message, "payloadType", "?"))
+            self.dispatch_s += perf() - t0
+            self.delivered += 1
+            self._rec_last = t_ns
+            n += 1
+            self._advance()
+
+        if self._next is None:
+            return self._finish()
+        delay = 0.0 if not self.speed else max(0.0, self._due(self._next[1]) - self.clock())
+        self._call = self.reactor.callLater(delay, self._pump)
+
+    def _finish(self) -> None:
+        if self._finished is not None:
+            return
+        self._finished = self.clock()
+        self.on_done()
+
+    # ---------------- reporting ----------------
+
+    def stats(self) -> Dict[str, float]:
+        end = self._finished if self._finished is not None else self.clock()
+        elapsed = (end - self._started) if self._started is not None else 0.0
+        span = ((self._rec_last - self._rec_first) / 1e9) if self._rec_last is not None else 0.0
+        return {
+            "delivered": self.delivered,
+            "outbound_skipped": self.outbound,
+            "errors": self.errors,
+            "elapsed_s": elapsed,
+            "recorded_s": span,
+            "speedup": (span / elapsed) if elapsed > 0 else 0.0,
+            "frames_per_s": (self.delivered / elapsed) if elapsed > 0 else 0.0,
+            "dispatch_us": (self.dispatch_s / self.delivered * 1e6) if self.delivered else 0.0,
+            "max_lag_ms": self.max_lag * 1000.0,
+            "turns": self.turns,
+        }
+
+    def report_lines(self) -> List[str]:
+        st = self.stats()
+        pacing = "as fast as possible" if not self.speed else f"x{self.speed:g}"
+        return [
+            f" replay {self.path} ({pacing})",
+            f" {st['delivered']} frames in {st['elapsed_s']:.2f}s "
+            f"({st['recorded_s']:.1f}s recorded, x{st['speedup']:.1f}) · {st['frames_per_s']:.0f} frames/s",
+            f" dispatch {st['dispatch_us']:.1f} us/frame · max lag {st['max_lag_ms']:.0f} ms · "
+            f"{st['turns']} reactor turns · {st['outbound_skipped']} outbound frames skipped · {st['errors']} errors",
+        ]
+
+    def label(self) -> str:
+        st = self.stats()
+        state = "done" if self.done else "replaying"
+        return f"{state} {st['delivered']} frames x{st['speedup']:.1f}"
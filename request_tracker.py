@@ -0,0 +1,171 @@
+# request_tracker.py
+import itertools
+import math
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+def short_name(type_name: str) -> str:
+    """ProtoOAReconcileReq -> Reconcile"""
+    name = type_name
+    for prefix in ("ProtoOA", "Proto"):
+        if name.startswith(prefix):
+            name = name[len(prefix):]
+            break
+    return name[:-3] if name.endswith("Req") else name
+
+
+class LatencyHistogram:
+    """Log-bucketed latency histogram: ~5% resolution from 0.1 ms to ~100 s, O(1) per sample."""
+
+    MIN_S = 1e-4
+    GROWTH = 1.05
+    _LOG_G = math.log(GROWTH)
+    N_BUCKETS = int(math.log(1e6) / _LOG_G) + 2
+
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self):
+        self.counts = [0] * self.N_BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds: float) -> None:
+        if seconds <= self.MIN_S:
+            idx = 0
+        else:
+            idx = min(self.N_BUCKETS - 1, int(math.log(seconds / self.MIN_S) / self._LOG_G) + 1)
+        self.counts[idx] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, p: float) -> float:
+        """Upper bound (seconds) of the bucket holding the p-th percentile; 0.0 when empty."""
+        if not self.count:
+            return 0.0
+        target = max(1, math.ceil(self.count * p / 100.0))
+        seen = 0
+        for idx, n in enumerate(self.counts):
+            seen += n
+            if seen >= target:
+                return min(self.MIN_S * self.GROWTH ** idx, self.max)
+        return self.max
+
+
+class _TypeStats:
+    __slots__ = ("hist", "sent", "timeouts", "errors")
+
+    def __init__(self):
+        self.hist = LatencyHistogram()
+        self.sent = 0
+        self.timeouts = 0
+        self.errors = 0
+
+
+class RequestTracker:
+    """
+    Correlates requests and responses by clientMsgId.
+
+    start() is called when a request actually leaves (OutboundScheduler),
+    generating a clientMsgId if the caller did not supply one; complete() is
+    called from dispatch_message for every inbound message carrying a
+    clientMsgId. Round-trip times go into a per-request-type histogram;
+    timed_out() is fed from the Client.send deferred's timeout.
+    """
+
+    def __init__(self, *, prefix: str = "cli", clock: Callable[[], float] = time.monotonic):
+        self.prefix = prefix
+        self.clock = clock
+        self._ids = itertools.count(1)
+        self._pending: Dict[str, Tuple[str, float]] = {}   # clientMsgId -> (request type, t0)
+        self._by_type: Dict[str, _TypeStats] = {}
+        self.unmatched = 0     # responses whose clientMsgId we never sent (or already timed out)
+
+    def _stats(self, type_name: str) -> _TypeStats:
+        st = self._by_type.get(type_name)
+        if st is None:
+            st = self._by_type[type_name] = _TypeStats()
+        return st
+
+    # ---------------- lifecycle of one request ----------------
+
+    def start(self, request, clientMsgId: Optional[str] = None) -> str:
+        if clientMsgId is None:
+            clientMsgId = f"{self.prefix}-{next(self._ids)}"
+        type_name = type(request).__name__
+        self._pending[clientMsgId] = (type_name, self.clock())
+        self._stats(type_name).sent += 1
+        return clientMsgId
+
+    def complete(self, clientMsgId: str, error: bool = False) -> Optional[float]:
+        """Response (or error response) arrived. Returns the round-trip time in seconds."""
+        entry = self._pending.pop(clientMsgId, None)
+        if entry is None:
+            self.unmatched += 1
+            return None
+        type_name, t0 = entry
+        rtt = self.clock() - t0
+        st = self._stats(type_name)
+        st.hist.record(rtt)
+        if error:
+            st.errors += 1
+        return rtt
+
+    def timed_out(self, clientMsgId: str) -> None:
+        entry = self._pending.pop(clientMsgId, None)
+        if entry is not None:
+            self._stats(entry[0]).timeouts += 1
+
+    def forget(self, clientMsgId: str) -> None:
+        """The request failed without a response (e.g. connection lost)."""
+        self._pending.pop(clientMsgId, None)
+
+    # ---------------- reporting ----------------
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def stats(self) -> Dict[str, dict]:
+        """Request type -> sent, answered, timeouts, errors, p50/p95/p99/max (ms)."""
+        out = {}
+        for type_name, st in self._by_type.items():
+            h = st.hist
+            out[type_name] = {
+                "sent": st.sent,
+                "answered": h.count,
+                "timeouts": st.timeouts,
+                "errors": st.errors,
+                "p50_ms": h.percentile(50) * 1000.0,
+                "p95_ms": h.percentile(95) * 1000.0,
+                "p99_ms": h.percentile(99) * 1000.0,
+                "max_ms": h.max * 1000.0,
+            }
+        return out
+
+    def report_lines(self) -> List[str]:
+        lines = [f"{'Request':<28}{'sent':>7}{'ok':>7}{'t/o':>6}{'err':>6}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}"]
+        for type_name, st in sorted(self.stats().items(), key=lambda kv: -kv[1]["sent"]):
+            lines.append(
+                f"{short_name(type_name):<28}{st['sent']:>7}{st['answered']:>7}{st['timeouts']:>6}{st['errors']:>6}"
+                f"{st['p50_ms']:>7.0f}ms{st['p95_ms']:>7.0f}ms{st['p99_ms']:>7.0f}ms{st['max_ms']:>7.0f}ms"
+            )
+        lines.append(f"pending: {self.pending}   unmatched responses: {self.unmatched}")
+        return lines
+
+    def footer(self, limit: int = 3) -> str:
+        """Compact one-liner for the live viewer: busiest request types + timeouts."""
+        busiest = sorted(self._by_type.items(), key=lambda kv: -kv[1].hist.count)[:limit]
+        parts = []
+        for type_name, st in busiest:
+            h = st.hist
+            if h.count:
+                parts.append(f"{short_name(type_name)} {h.percentile(50) * 1000:.0f}/"
+                             f"{h.percentile(95) * 1000:.0f}/{h.percentile(99) * 1000:.0f}ms")
+        timeouts = sum(st.timeouts for st in self._by_type.values())
+        if not parts:
+            return ""
+        return "rtt p50/95/99 " + " · ".join(parts) + f" · timeouts {timeouts}"
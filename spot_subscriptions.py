@@ -0,0 +1,229 @@
+# spot_subscriptions.py
+from typing import Callable, Dict, Iterable, List, Set
+
+from ctrader_open_api.messages.OpenApiMessages_pb2 import ProtoOASubscribeSpotsRes
+
+# who wants prices for a symbol
+OWNER_POSITIONS = "positions"
+OWNER_BOARD = "board"
+OWNER_ALERTS = "alerts"
+
+# per-symbol server state
+PENDING_SUB = "pending"
+CONFIRMED = "confirmed"
+PENDING_UNSUB = "unsubscribing"
+
+
+class SpotSubscriptions:
+    """
+    Ref-counted, batched spot subscriptions (replaces the plain subscribedSymbols set).
+
+    Each symbol carries the set of owners interested in it. The first
+    acquire() queues a subscribe, the last release() queues an unsubscribe;
+    everything queued within one reactor turn goes out as a single
+    ProtoOASubscribeSpotsReq / ProtoOAUnsubscribeSpotsReq with a repeated
+    symbolId. ProtoOASubscribeSpotsRes carries no symbol ids, so a batch is
+    confirmed through its request's Deferred (matched by clientMsgId).
+    A failed or timed-out batch drops back to "not subscribed"; resync()
+    retries every owned symbol that is not live.
+    """
+
+    def __init__(
+        self,
+        *,
+        reactor,
+        send_subscribe: Callable[[List[int]], object],     # -> Deferred firing with the response ProtoMessage
+        send_unsubscribe: Callable[[List[int]], object],
+        on_settled: Callable[[], None] = lambda: None,     # no newly requested symbol left in flight
+    ):
+        self.reactor = reactor
+        self.send_subscribe = send_subscribe
+        self.send_unsubscribe = send_unsubscribe
+        self.on_settled = on_settled
+
+        self._owners: Dict[int, Set[str]] = {}
+        self._state: Dict[int, str] = {}
+        self._to_sub: Set[int] = set()
+        self._to_unsub: Set[int] = set()
+        self._flush_call = None
+        self._fresh: Set[int] = set()     # queued by acquire/resync (not by a repair)
+        self._batches_in_flight = 0       # subscribe batches carrying fresh symbols
+        self._generation = 0      # bumped by reset(); late answers from an old connection are ignored
+
+        # counters
+        self.sub_requests = 0
+        self.unsub_requests = 0
+        self.symbols_sent = 0     # one request per symbol before batching
+        self.failures = 0
+
+    # ---------------- interest ----------------
+
+    def acquire(self, symbol_id: int, owner: str) -> None:
+        symbol_id = int(symbol_id)
+        owners = self._owners.setdefault(symbol_id, set())
+        if owner in owners:
+            return
+        owners.add(owner)
+        if len(owners) == 1:
+            self._want(symbol_id)
+
+    def release(self, symbol_id: int, owner: str) -> None:
+        symbol_id = int(symbol_id)
+        owners = self._owners.get(symbol_id)
+        if not owners or owner not in owners:
+            return
+        owners.discard(owner)
+        if owners:
+            return
+        del self._owners[symbol_id]
+        if symbol_id in self._to_sub:
+            self._to_sub.discard(symbol_id)     # never left; nothing to undo
+        elif self._state.get(symbol_id) in (PENDING_SUB, CONFIRMED):
+            self._to_unsub.add(symbol_id)
+            self._schedule()
+
+    def set_owned(self, owner: str, symbol_ids: Iterable[int]) -> None:
+        """Make `owner` hold exactly `symbol_ids` (acquire the new, release the rest)."""
+        wanted = {int(s) for s in symbol_ids}
+        for sid in [sid for sid, owners in self._owners.items() if owner in owners and sid not in wanted]:
+            self.release(sid, owner)
+        for sid in wanted:
+            self.acquire(sid, owner)
+
+    def resync(self) -> None:
+        """Re-request every owned symbol the server is not (about to be) streaming."""
+        for sid in self._owners:
+            if self._state.get(sid) not in (PENDING_SUB, CONFIRMED):
+                self._want(sid)
+
+    def resubscribe(self, symbol_ids: Iterable[int]) -> None:
+        """Repair silent feeds: unsubscribe + subscribe the given owned symbols in the next batch."""
+        for sid in symbol_ids:
+            sid = int(sid)
+            if sid not in self._owners:
+                continue
+            if self._state.get(sid) in (PENDING_SUB, CONFIRMED):
+                self._to_unsub.add(sid)
+            self._to_sub.add(sid)
+        self._schedule()
+
+    def reset(self) -> None:
+        """Connection lost: the server forgot everything, owners are kept for resync()."""
+        self._state.clear()
+        self._to_sub.clear()
+        self._to_unsub.clear()
+        self._fresh.clear()
+        self._batches_in_flight = 0
+        self._generation += 1
+        if self._flush_call is not None and self._flush_call.active():
+            self._flush_call.cancel()
+        self._flush_call = None
+
+    # ---------------- queries ----------------
+
+    def __contains__(self, symbol_id) -> bool:
+        return self._state.get(symbol_id) in (PENDING_SUB, CONFIRMED)
+
+    def subscribed_symbols(self) -> List[int]:
+        """Symbols the server is streaming or has been asked to stream."""
+        return [sid for sid, st in self._state.items() if st in (PENDING_SUB, CONFIRMED)]
+
+    def is_confirmed(self, symbol_id: int) -> bool:
+        return self._state.get(symbol_id) == CONFIRMED
+
+    def owners(self, symbol_id: int) -> Set[str]:
+        return set(self._owners.get(symbol_id, ()))
+
+    @property
+    def pending(self) -> int:
+        return sum(1 for st in self._state.values() if st == PENDING_SUB) + len(self._to_sub)
+
+    def stats(self) -> Dict[str, int]:
+        confirmed = sum(1 for st in self._state.values() if st == CONFIRMED)
+        return {
+            "owned": len(self._owners),
+            "confirmed": confirmed,
+            "pending": self.pending,
+            "sub_requests": self.sub_requests,
+            "unsub_requests": self.unsub_requests,
+            "requests_saved": self.symbols_sent - self.sub_requests - self.unsub_requests,
+            "failures": self.failures,
+        }
+
+    # ---------------- batching ----------------
+
+    def _want(self, symbol_id: int) -> None:
+        self._to_unsub.discard(symbol_id)
+        if self._state.get(symbol_id) in (PENDING_SUB, CONFIRMED):
+            return
+        self._to_sub.add(symbol_id)
+        self._fresh.add(symbol_id)
+        self._schedule()
+
+    def _schedule(self) -> None:
+        if self._flush_call is None or not self._flush_call.active():
+            self._flush_call = self.reactor.callLater(0, self.flush)
+
+    def flush(self) -> None:
+        self._flush_call = None
+        if self._to_unsub:
+            batch = sorted(self._to_unsub)
+            self._to_unsub.clear()
+            for sid in batch:
+                self._state[sid] = PENDING_UNSUB
+            self.unsub_requests += 1
+            self.symbols_sent += len(batch)
+            d = self.send_unsubscribe(batch)
+            if d is not None:
+                args = (batch, self._generation)
+                d.addCallbacks(self._on_unsub_result, self._on_unsub_result, callbackArgs=args, errbackArgs=args)
+        if self._to_sub:
+            batch = sorted(self._to_sub)
+            self._to_sub.clear()
+            for sid in batch:
+                self._state[sid] = PENDING_SUB
+            self.sub_requests += 1
+            self.symbols_sent += len(batch)
+            fresh = not self._fresh.isdisjoint(batch)
+            self._fresh.clear()
+            if fresh:
+                self._batches_in_flight += 1
+            d = self.send_subscribe(batch)
+            if d is not None:
+                args = (batch, self._generation, fresh)
+                d.addCallbacks(self._on_sub_result, self._on_sub_failed, callbackArgs=args, errbackArgs=args)
+
+    def _on_sub_result(self, message, batch: List[int], generation: int, fresh: bool) -> None:
+        if generation != self._generation:
+            return
+        if getattr(message, "payloadType", None) != ProtoOASubscribeSpotsRes().payloadType:
+            return self._on_sub_failed(message, batch, generation, fresh)   # ProtoOAErrorRes with our clientMsgId
+        for sid in batch:
+            if self._state.get(sid) == PENDING_SUB:
+                self._state[sid] = CONFIRMED
+        self._batch_done(fresh)
+
+    def _on_sub_failed(self, reason, batch: List[int], generation: int, fresh: bool) -> None:
+        # error response or timeout: nothing in this batch is known to be live
+        if generation != self._generation:
+            return
+        self.failures += 1
+        for sid in batch:
+            if self._state.get(sid) == PENDING_SUB:
+                del self._state[sid]
+        self._batch_done(fresh)
+
+    def _batch_done(self, fresh: bool) -> None:
+        if not fresh:
+            return
+        self._batches_in_flight = max(0, self._batches_in_flight - 1)
+        if not self._batches_in_flight:
+            self.on_settled()
+
+    def _on_unsub_result(self, _result, batch: List[int], generation: int) -> None:
+        if generation != self._generation:
+            return
+        # success or not, stop treating these as live unless re-acquired meanwhile
+        for sid in batch:
+            if self._state.get(sid) == PENDING_UNSUB:
+                del self._state[sid]
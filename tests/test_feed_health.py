@@ -0,0 +1,120 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import pytest
+from twisted.internet import task
+
+from feed_health import FeedHealthMonitor
+
+
+class FakeSubscriptions:
+    def __init__(self, confirmed=(), pending=()):
+        self.confirmed = set(confirmed)
+        self.pending = set(pending)
+        self.resubscribed = []
+
+    def subscribed_symbols(self):
+        return sorted(self.confirmed | self.pending)
+
+    def is_confirmed(self, symbol_id):
+        return symbol_id in self.confirmed
+
+    def resubscribe(self, symbol_ids):
+        self.resubscribed.append(list(symbol_ids))
+
+
+def _monitor(clock, subs, **kwargs):
+    return FeedHealthMonitor(reactor=clock, subscriptions=subs, clock=clock.seconds, **kwargs)
+
+
+def _ticks(clock, monitor, symbol_id, gap, n):
+    for _ in range(n):
+        clock.advance(gap)
+        monitor.on_ticks([symbol_id])
+
+
+def test_threshold_is_a_clamped_ewma():
+    clock = task.Clock()
+    monitor = _monitor(clock, FakeSubscriptions())
+    assert monitor.threshold(1) == 30.0                 # no gap yet: min_stale
+
+    _ticks(clock, monitor, 1, 0.5, 3)
+    assert monitor.threshold(1) == 30.0                 # 20 x 0.5 s is under the floor
+    _ticks(clock, monitor, 2, 5.0, 3)
+    assert monitor.threshold(2) == pytest.approx(100.0)
+    # one long gap moves the average by alpha only
+    _ticks(clock, monitor, 2, 15.0, 1)
+    assert monitor.threshold(2) == pytest.approx(20 * (0.1 * 15.0 + 0.9 * 5.0))
+
+    _ticks(clock, monitor, 3, 60.0, 3)
+    assert monitor.threshold(3) == 300.0                # capped
+
+
+def test_quiet_symbol_is_repaired_and_recovers():
+    clock = task.Clock()
+    subs = FakeSubscriptions(confirmed=[1, 2])
+    monitor = _monitor(clock, subs)
+    monitor.start()
+    for _ in range(3):
+        clock.advance(1.0)
+        monitor.on_ticks([1, 2])
+
+    for _ in range(6):          # 30 s: both at their 30 s floor, 2 keeps ticking
+        clock.advance(5.0)
+        monitor.on_ticks([2])
+    assert subs.resubscribed == []
+    clock.advance(5.0)
+    monitor.on_ticks([2])
+    assert subs.resubscribed == [[1]]
+    assert monitor.is_stale(1) and not monitor.is_stale(2)
+    assert monitor.stale_symbols()[0][0] == 1
+
+    monitor.on_ticks([1])
+    assert not monitor.is_stale(1) and monitor.recoveries == 1
+    monitor.stop()
+    assert not clock.getDelayedCalls()
+
+
+def test_repairs_back_off_and_reset_on_recovery():
+    clock = task.Clock()
+    subs = FakeSubscriptions(confirmed=[1])
+    # a fixed 30 s threshold, whatever the gaps
+    monitor = _monitor(clock, subs, check_interval=1.0, min_stale=30.0, max_stale=30.0,
+                       repair_backoff=60.0, repair_backoff_max=200.0)
+    monitor.on_ticks([1])
+    monitor.start()
+
+    repaired_at = []
+    for _ in range(700):
+        clock.advance(1.0)
+        if len(subs.resubscribed) > len(repaired_at):
+            repaired_at.append(clock.seconds())
+    # first at 31 s, then 60, 120, 200 (capped), 200 s apart
+    gaps = [b - a for a, b in zip(repaired_at, repaired_at[1:])]
+    assert repaired_at[0] == 31.0
+    assert gaps == [60.0, 120.0, 200.0, 200.0]
+    assert monitor.repairs == 5
+
+    monitor.on_ticks([1])
+    clock.pump([1.0] * 31)
+    assert len(subs.resubscribed) == 6       # backoff was reset: no wait for the 200 s step
+    assert clock.seconds() - repaired_at[-1] < 200.0
+
+
+def test_first_tick_grace_and_unconfirmed_symbols():
+    clock = task.Clock()
+    subs = FakeSubscriptions(confirmed=[1], pending=[2])
+    monitor = _monitor(clock, subs, first_tick_grace=20.0)
+    assert monitor.check() == []                # starts the grace period for 1
+    clock.advance(20.0)
+    assert monitor.check() == []
+    clock.advance(0.5)
+    assert monitor.check() == [1]               # never ticked
+    clock.advance(100.0)
+    assert 2 not in sum(subs.resubscribed, [])  # waiting for ProtoOASubscribeSpotsRes: never judged
+
+    subs.confirmed.discard(1)                   # unsubscribed: forgotten
+    monitor.check()
+    assert not monitor.is_stale(1)
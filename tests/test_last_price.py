@@ -0,0 +1,145 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from twisted.internet import defer, task
+from ctrader_open_api.messages.OpenApiCommonMessages_pb2 import ProtoMessage
+from ctrader_open_api.messages.OpenApiMessages_pb2 import ProtoOAErrorRes, ProtoOAGetTickDataRes
+
+from last_price import LastPriceBootstrap
+
+
+def _ticks(*ticks):
+    """ProtoMessage(ProtoOAGetTickDataRes) from absolute (ts, raw price) ticks, newest first."""
+    res = ProtoOAGetTickDataRes(ctidTraderAccountId=1, hasMore=False)
+    prev = (0, 0)
+    for ts, px in ticks:
+        tick = res.tickData.add()
+        tick.timestamp = ts - prev[0]
+        tick.tick = px - prev[1]
+        prev = (ts, px)
+    return ProtoMessage(payloadType=res.payloadType, payload=res.SerializeToString())
+
+
+class FakeServer:
+    """Hands out a Deferred per request; the test answers them."""
+
+    def __init__(self):
+        self.requests = []      # (symbolId, quote type, from_ms, to_ms)
+        self.pending = []
+
+    def __call__(self, symbol_id, quote_type, from_ms, to_ms):
+        self.requests.append((symbol_id, quote_type, from_ms, to_ms))
+        d = defer.Deferred()
+        self.pending.append(d)
+        return d
+
+    def answer(self, message):
+        self.pending.pop(0).callback(message)
+
+
+def _bootstrap(clock, server, **kwargs):
+    applied = []
+    boot = LastPriceBootstrap(request_ticks=server, apply=lambda *q: applied.append(q),
+                              clock=clock.seconds, **kwargs)
+    return boot, applied
+
+
+def test_widens_only_while_empty():
+    clock = task.Clock()
+    clock.advance(1_700_000_000)
+    server = FakeServer()
+    boot, applied = _bootstrap(clock, server, windows=(60, 900, 14400))
+    got = []
+    boot.request(7).addCallback(got.append)
+
+    now_ms = 1_700_000_000_000
+    assert server.requests == [(7, "BID", now_ms - 60_000, now_ms)]
+    clock.advance(2)
+    server.answer(_ticks())
+    assert server.requests[-1] == (7, "BID", now_ms + 2000 - 900_000, now_ms + 2000)
+    server.answer(_ticks((now_ms - 100_000, 110_050), (now_ms - 200_000, 110_000)))
+    assert got == [(1.1005, 1.1005)]
+    assert applied == [(7, 1.1005, 1.1005)]
+    assert boot.widened == 1 and boot.requests == 2
+
+
+def test_gives_up_after_the_last_window():
+    clock = task.Clock()
+    server = FakeServer()
+    boot, applied = _bootstrap(clock, server, windows=(60, 900))
+    got = []
+    boot.request(7).addCallback(got.append)
+    server.answer(_ticks())
+    server.answer(_ticks())
+    assert got == [None] and applied == [] and boot.empty == 1
+    assert not server.pending
+
+
+def test_concurrent_requests_share_one_download_and_cache():
+    clock = task.Clock()
+    server = FakeServer()
+    boot, applied = _bootstrap(clock, server)
+    got = []
+    for _ in range(3):
+        boot.request(7).addCallback(got.append)
+    boot.request_many([7, 8])
+    assert len(server.requests) == 2 and boot.deduped == 3
+
+    server.answer(_ticks((1000, 120_000)))
+    assert got == [(1.2, 1.2)] * 3
+    assert len(applied) == 1
+
+    boot.request(7).addCallback(got.append)
+    assert got[-1] == (1.2, 1.2) and boot.cache_hits == 1
+    assert len(server.requests) == 2
+
+
+def test_live_tick_wins():
+    clock = task.Clock()
+    server = FakeServer()
+    boot, applied = _bootstrap(clock, server)
+    got = []
+    boot.request(7).addCallback(got.append)
+    boot.on_live_ticks([7])
+    server.answer(_ticks((1000, 120_000)))          # late answer: dropped
+    assert got == [None] and applied == [] and boot.cached(7) is None
+
+    boot.request(7).addCallback(got.append)
+    assert got == [None, None] and len(server.requests) == 1
+
+    # a cached bootstrap price is forgotten once live ticks start
+    boot.request(8)
+    server.answer(_ticks((1000, 90_000)))
+    assert boot.cached(8) == (0.9, 0.9)
+    boot.on_live_ticks([8])
+    assert boot.cached(8) is None
+
+
+def test_live_tick_during_empty_answer_stops_widening():
+    clock = task.Clock()
+    server = FakeServer()
+    boot, _ = _bootstrap(clock, server)
+    got = []
+    boot.request(7).addCallback(got.append)
+    boot.on_live_ticks([7])
+    server.answer(_ticks())
+    assert got == [None] and len(server.requests) == 1
+
+
+def test_error_and_failure_finish_with_none():
+    clock = task.Clock()
+    server = FakeServer()
+    boot, _ = _bootstrap(clock, server)
+    got = []
+    boot.request(7).addCallback(got.append)
+    err = ProtoOAErrorRes(errorCode="INVALID_REQUEST")
+    server.answer(ProtoMessage(payloadType=err.payloadType, payload=err.SerializeToString()))
+    boot.request(8).addCallback(got.append)
+    server.pending.pop(0).errback(defer.TimeoutError())
+    assert got == [None, None]
+    assert boot.stats()["inflight"] == 0
+
+    boot.request(7)                                 # nothing cached: asks again
+    assert len(server.requests) == 3
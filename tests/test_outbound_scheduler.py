@@ -0,0 +1,171 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import pytest
+from twisted.internet import defer, task
+from ctrader_open_api.messages.OpenApiMessages_pb2 import (
+    ProtoOAClosePositionReq, ProtoOAGetPositionUnrealizedPnLReq, ProtoOAGetTickDataReq,
+    ProtoOAGetTrendbarsReq, ProtoOANewOrderReq, ProtoOAReconcileReq,
+)
+
+from outbound_scheduler import HISTORICAL_RATE, LANE_POLL, OutboundScheduler, TokenBucket
+
+
+class FakeSend:
+    """Records what left the scheduler; each request gets a Deferred the test can fire."""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.sent = []      # (time, request, clientMsgId)
+        self.deferreds = []
+
+    def __call__(self, request, clientMsgId=None, **kwargs):
+        self.sent.append((self.clock.seconds(), request, clientMsgId))
+        d = defer.Deferred()
+        self.deferreds.append(d)
+        return d
+
+    def types(self):
+        return [type(r).__name__ for _, r, _ in self.sent]
+
+
+def _run(clock, seconds, step=0.01):
+    # Clock.advance() jumps straight to the end, so wakeups scheduled on the way would start from there
+    clock.pump([step] * int(round(seconds / step)))
+
+
+def _scheduler(clock, **kwargs):
+    send = FakeSend(clock)
+    return OutboundScheduler(reactor=clock, send=send, clock=clock.seconds, **kwargs), send
+
+
+def test_token_bucket_burst_then_rate():
+    clock = task.Clock()
+    bucket = TokenBucket(rate=2.0, burst=3, clock=clock.seconds)
+    assert [bucket.take() for _ in range(4)] == [True, True, True, False]
+    assert bucket.wait_time() == pytest.approx(0.5)
+    clock.advance(0.5)
+    assert bucket.take() and not bucket.take()
+    clock.advance(100)
+    assert sum(bucket.take() for _ in range(10)) == 3     # never more than the burst
+
+
+def test_sends_immediately_within_budget():
+    clock = task.Clock()
+    sched, send = _scheduler(clock)
+    d = sched.send(ProtoOAReconcileReq(), clientMsgId="m1")
+    assert send.sent[0][2] == "m1"
+    got = []
+    d.addCallback(got.append)
+    send.deferreds[0].callback("response")
+    assert got == ["response"]
+
+
+def test_lane_order_when_queued():
+    clock = task.Clock()
+    sched, send = _scheduler(clock, normal_burst=1, normal_rate=10.0)
+    sched.send(ProtoOAReconcileReq())             # uses the only token
+    sched.send(ProtoOAGetPositionUnrealizedPnLReq())
+    sched.send(ProtoOAReconcileReq())
+    sched.send(ProtoOANewOrderReq())
+    sched.send(ProtoOAClosePositionReq())
+    assert sched.depth() == 4
+    _run(clock, 1.0)
+    assert send.types() == [
+        "ProtoOAReconcileReq",
+        "ProtoOANewOrderReq", "ProtoOAClosePositionReq",     # orders
+        "ProtoOAReconcileReq",                               # control
+        "ProtoOAGetPositionUnrealizedPnLReq",                # poll
+    ]
+
+
+def test_data_lane_before_poll_lane():
+    clock = task.Clock()
+    sched, send = _scheduler(clock, normal_burst=1)
+    sched.send(ProtoOAReconcileReq())
+    sched.send(ProtoOAGetPositionUnrealizedPnLReq())
+    sched.send(ProtoOAReconcileReq(), lane=2)      # explicit data lane
+    _run(clock, 1.0)
+    assert send.types()[1:] == ["ProtoOAReconcileReq", "ProtoOAGetPositionUnrealizedPnLReq"]
+
+
+def test_poll_requests_coalesce():
+    clock = task.Clock()
+    sched, send = _scheduler(clock, normal_burst=1)
+    sched.send(ProtoOAReconcileReq())
+    waiters = [sched.send(ProtoOAGetPositionUnrealizedPnLReq()) for _ in range(3)]
+    assert sched.depth() == 1
+    assert sched.stats()["poll"]["coalesced"] == 2
+    _run(clock, 1.0)
+    assert send.types().count("ProtoOAGetPositionUnrealizedPnLReq") == 1
+    got = []
+    for w in waiters:
+        w.addCallback(got.append)
+    send.deferreds[-1].callback("pnl")
+    assert got == ["pnl"] * 3
+
+
+def test_poll_with_client_msg_id_is_not_coalesced():
+    clock = task.Clock()
+    sched, _ = _scheduler(clock, normal_burst=1)
+    sched.send(ProtoOAReconcileReq())
+    sched.send(ProtoOAGetPositionUnrealizedPnLReq(), lane=LANE_POLL)
+    sched.send(ProtoOAGetPositionUnrealizedPnLReq(), clientMsgId="mine")
+    assert sched.depth() == 2
+
+
+def test_historical_budget():
+    clock = task.Clock()
+    sched, send = _scheduler(clock)
+    for _ in range(50):
+        sched.send(ProtoOAGetTickDataReq())
+    sched.send(ProtoOAReconcileReq())             # normal budget is unaffected
+    assert send.types().count("ProtoOAReconcileReq") == 1
+    burst = len(send.sent) - 1
+    _run(clock, 5.0)
+    historical = [t for t, r, _ in send.sent if isinstance(r, (ProtoOAGetTickDataReq, ProtoOAGetTrendbarsReq))]
+    assert abs(len(historical) - (burst + 5.0 * HISTORICAL_RATE)) <= 1
+    late = historical[burst:]
+    gaps = [b - a for a, b in zip(late, late[1:])]
+    assert min(gaps) >= 1.0 / HISTORICAL_RATE - 0.01 - 1e-9
+
+
+def test_send_failure_errbacks_waiter():
+    clock = task.Clock()
+
+    def broken(request, **kwargs):
+        raise RuntimeError("socket closed")
+
+    sched = OutboundScheduler(reactor=clock, send=broken, clock=clock.seconds)
+    failures = []
+    sched.send(ProtoOAReconcileReq()).addErrback(failures.append)
+    assert failures and failures[0].check(RuntimeError)
+
+
+def test_clear_errbacks_queued_waiters():
+    clock = task.Clock()
+    sched, send = _scheduler(clock, normal_burst=1)
+    on_wire = sched.send(ProtoOAReconcileReq())
+    tick = sched.send(ProtoOAGetTickDataReq())       # historical budget: sent at once
+    queued = [sched.send(ProtoOAReconcileReq()), sched.send(ProtoOAGetPositionUnrealizedPnLReq())]
+    resent = []
+
+    def resend(failure):
+        resent.append(sched.send(ProtoOAReconcileReq()))
+        return failure
+
+    queued[0].addErrback(resend)
+    failures = []
+    for d in queued:
+        d.addErrback(failures.append)
+
+    sched.clear()
+    assert len(failures) == 2
+    assert all(f.check(defer.CancelledError) for f in failures)
+    assert sched.dropped == 2
+    assert not on_wire.called and not tick.called      # already sent: left to their responses
+    assert sched.depth() == 1                           # the request re-sent from an errback
+    _run(clock, 1.0)
+    assert send.types().count("ProtoOAReconcileReq") == 2
@@ -0,0 +1,44 @@
+import os
+import sys
+import traceback
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from output_sink import OutputSink
+
+
+def test_stderr_goes_to_the_log_while_the_viewer_runs(tmp_path, capsys):
+    path = tmp_path / "viewer.log"
+    sink = OutputSink(str(path))
+    original = sys.stderr
+
+    sink.set_viewer_active(True)
+    assert sys.stderr is not original
+    sink.emit("handler line")
+    try:
+        raise RuntimeError("boom")
+    except RuntimeError:
+        traceback.print_exc()
+    print("warning text", file=sys.stderr)
+
+    sink.set_viewer_active(False)
+    assert sys.stderr is original
+    sink.emit("console again")
+    sink.close()
+
+    logged = path.read_text(encoding="utf-8")
+    assert "handler line" in logged and "RuntimeError: boom" in logged and "warning text" in logged
+    out, err = capsys.readouterr()
+    assert "console again" in out
+    assert "boom" not in err and "warning text" not in err
+
+
+def test_close_restores_stderr(tmp_path):
+    sink = OutputSink(str(tmp_path / "viewer.log"))
+    original = sys.stderr
+    sink.set_viewer_active(True)
+    sink.set_viewer_active(True)        # a second activation keeps the first saved stream
+    sink.close()
+    assert sys.stderr is original
+    sink.close()
+    assert sys.stderr is original
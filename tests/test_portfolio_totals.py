@@ -0,0 +1,91 @@
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import pytest
+
+import ui_helpers as H
+from position_book import BUY, SELL, PositionRecord
+
+
+def _recompute(positions, pnl):
+    """Aggregates from scratch, the way a full pass over every position would."""
+    out = {"pnl": 0.0, "count": 0, "exposure": {"BUY": 0.0, "SELL": 0.0}, "symbol_pnl": {}, "symbol_count": {}}
+    for pid, pos in positions.items():
+        value = pnl.get(pid) or 0.0
+        side = H.trade_side_name(pos.tradeSide)
+        out["pnl"] += value
+        out["count"] += 1
+        out["exposure"][side] += H.volume_to_lots(pos.volume)
+        out["symbol_pnl"][pos.symbolId] = out["symbol_pnl"].get(pos.symbolId, 0.0) + value
+        out["symbol_count"][pos.symbolId] = out["symbol_count"].get(pos.symbolId, 0) + 1
+    return out
+
+
+def _assert_totals(totals, expected):
+    assert totals.count == expected["count"]
+    assert totals.pnl == pytest.approx(expected["pnl"], abs=1e-6)
+    assert totals.exposure == pytest.approx(expected["exposure"], abs=1e-9)
+    assert totals.symbol_count == expected["symbol_count"]
+    assert totals.symbol_pnl == pytest.approx(expected["symbol_pnl"], abs=1e-6)
+
+
+@pytest.fixture
+def book():
+    positions, pnl = {}, {}
+    H.init_ordering(positions, pnl, {})
+    H.set_sort_key("pnl")
+    yield positions, pnl
+    H.init_ordering({}, {}, {})
+
+
+def test_running_totals_match_recompute(book):
+    positions, pnl = book
+    rng = random.Random(11)
+    H.ordered_positions()
+    next_pid = 1
+    for step in range(2000):
+        op = rng.random()
+        if op < 0.3 or not positions:
+            pid, next_pid = next_pid, next_pid + 1
+            positions[pid] = PositionRecord(pid, rng.choice([10, 20, 30]), rng.choice([BUY, SELL]),
+                                            rng.randrange(1, 500) * 100_000)
+            pnl[pid] = round(rng.uniform(-500, 500), 2)
+            H.update_position(pid)
+        elif op < 0.8:
+            pid = rng.choice(list(positions))
+            pnl[pid] = rng.choice([round(rng.uniform(-500, 500), 2), None])
+            if rng.random() < 0.1:
+                # partial close, or a reconcile moving it to another symbol
+                positions[pid] = PositionRecord(pid, rng.choice([10, 20, 30]), positions[pid].tradeSide,
+                                                max(100_000, positions[pid].volume // 2))
+            H.update_position(pid)
+        else:
+            pid = rng.choice(list(positions))
+            del positions[pid]
+            pnl.pop(pid, None)
+            H.discard_position(pid)
+
+        if step % 50 == 0:
+            _assert_totals(H.portfolio_totals, _recompute(positions, pnl))
+
+    _assert_totals(H.portfolio_totals, _recompute(positions, pnl))
+    H.mark_positions_dirty()
+    H.ordered_positions()               # a full rebuild lands on the same numbers
+    _assert_totals(H.portfolio_totals, _recompute(positions, pnl))
+
+
+def test_last_position_on_a_symbol_drops_the_symbol():
+    totals = H.PortfolioTotals()
+    totals.set(1, 10, "BUY", 1.0, 5.0)
+    totals.set(2, 10, "SELL", 2.0, -1.0)
+    totals.set(1, 10, "BUY", 1.0, 7.0)          # same position again: replaces, not adds
+    assert totals.count == 2 and totals.pnl == pytest.approx(6.0)
+    assert totals.symbol_count == {10: 2}
+    totals.remove(1)
+    totals.remove(1)
+    assert totals.symbol_pnl == {10: -1.0} and totals.exposure == {"BUY": 0.0, "SELL": 2.0}
+    totals.remove(2)
+    assert totals.symbol_pnl == {} and totals.symbol_count == {} and totals.count == 0
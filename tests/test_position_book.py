@@ -0,0 +1,167 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import numpy as np
+import pytest
+
+from position_book import BUY, SELL, PositionBook, PositionRecord
+
+
+def _pnl(ids, pnl):
+    return dict(zip(ids.tolist(), pnl.tolist()))
+
+
+def test_set_offset_calibrates_symbol_pnl():
+    book = PositionBook(contract_size_for=lambda sid: 1.0)
+    book.upsert(1, 10, BUY, 10_000, 1.10)      # 100 units
+    book.upsert(2, 10, SELL, 20_000, 1.20)
+    assert _pnl(*book.symbol_pnl(10, 1.15, 1.16)) == pytest.approx({1: 5.0, 2: 8.0})
+    assert len(book.symbol_pnl(10, 1.15, 1.16, calibrated_only=True)[0]) == 0
+
+    raw = book.raw_pnl(1, 1.15, 1.16)
+    book.set_offset(1, 4.0 - raw)               # server said 4.0 at this price
+    assert book.is_calibrated(1) and not book.is_calibrated(2)
+    assert _pnl(*book.symbol_pnl(10, 1.15, 1.16, calibrated_only=True)) == pytest.approx({1: 4.0})
+    # the offset follows the price
+    assert _pnl(*book.symbol_pnl(10, 1.17, 1.18, calibrated_only=True)) == pytest.approx({1: 6.0})
+    ids, pnl = book.batch_pnl({10: (1.17, 1.18)}, calibrated_only=True)
+    assert _pnl(ids, pnl) == pytest.approx({1: 6.0})
+
+
+def test_volume_or_price_change_resets_offset():
+    book = PositionBook(contract_size_for=lambda sid: 1.0)
+    book.upsert(1, 10, BUY, 10_000, 1.10)
+    book.set_offset(1, -1.5)
+    book.upsert(1, 10, BUY, 10_000, 1.10)       # unchanged: keeps it
+    assert book.is_calibrated(1)
+
+    book.upsert(1, 10, BUY, 5_000, 1.10)        # partial close
+    assert not book.is_calibrated(1)
+    assert _pnl(*book.symbol_pnl(10, 1.12, 1.13)) == pytest.approx({1: 1.0})
+
+    book.set_offset(1, -1.5)
+    book.upsert(1, 10, BUY, 5_000, 1.11)        # entry price amended
+    assert not book.is_calibrated(1)
+
+
+def test_rebuild_keeps_only_unchanged_calibration():
+    book = PositionBook(contract_size_for=lambda sid: 1.0)
+    book.upsert(1, 10, BUY, 10_000, 1.10)
+    book.upsert(2, 10, BUY, 10_000, 1.10)
+    book.upsert(3, 20, SELL, 10_000, 1.30)
+    for pid in (1, 2, 3):
+        book.set_offset(pid, -2.0)
+    book.rebuild([
+        PositionRecord(1, 10, BUY, 10_000, price=1.10),
+        PositionRecord(2, 10, BUY, 20_000, price=1.10),
+    ])
+    assert 3 not in book and len(book) == 2
+    assert book.is_calibrated(1) and not book.is_calibrated(2)
+    assert _pnl(*book.symbol_pnl(10, 1.12, 1.13)) == pytest.approx({1: 0.0, 2: 4.0})
+
+
+def test_unknown_contract_size_is_never_calibrated():
+    sizes = {}
+    book = PositionBook(contract_size_for=sizes.get)
+    book.upsert(1, 10, BUY, 10_000, 1.10)
+    assert book.raw_pnl(1, 1.12, 1.13) is None
+    book.set_offset(1, 0.0)
+    assert not book.is_calibrated(1)
+    assert len(book.batch_pnl({10: (1.12, 1.13)})[0]) == 0
+
+    sizes[10] = 1.0
+    book.refresh_contract_sizes()
+    book.set_offset(1, 0.5)
+    assert book.is_calibrated(1)
+    sizes[10] = 2.0                              # a different size invalidates the offset
+    book.refresh_contract_sizes()
+    assert not book.is_calibrated(1)
+    assert book.raw_pnl(1, 1.12, 1.13) == pytest.approx(4.0)
+    assert np.isclose(book.symbol_pnl(10, 1.12, 1.13)[1][0], 4.0)
+
+
+def _reference(positions, prices, sizes):
+    """Plain per-position loop: {positionId: pnl} for positions whose symbol has a price."""
+    out = {}
+    for pid, (sid, side, volume, entry) in positions.items():
+        if sid not in prices:
+            continue
+        bid, ask = prices[sid]
+        mkt = bid if side == BUY else ask
+        delta = (mkt - entry) if side == BUY else (entry - mkt)
+        out[pid] = delta * volume / 100.0 * sizes[sid]
+    return out
+
+
+def test_matches_per_position_loop_through_churn():
+    rng = np.random.default_rng(7)
+    sizes = {sid: float(sid) for sid in range(1, 9)}
+    book = PositionBook(contract_size_for=sizes.get, capacity=16)
+    positions = {}
+    next_pid = 1
+
+    for step in range(600):
+        op = rng.random()
+        if op < 0.5 or not positions:
+            pid, next_pid = next_pid, next_pid + 1
+        else:
+            pid = int(rng.choice(list(positions)))
+        if op < 0.75:
+            # add, or modify in place: volume, entry or symbol (exercises _unlink)
+            rec = (int(rng.integers(1, 9)), BUY if rng.random() < 0.5 else SELL,
+                   int(rng.integers(1, 50)) * 100, round(float(rng.uniform(0.5, 2.0)), 5))
+            positions[pid] = rec
+            book.upsert(pid, *rec)
+        else:
+            del positions[pid]
+            book.remove(pid)
+
+        if step % 50 == 0:
+            prices = {sid: (round(float(b), 5), round(float(b) + 0.0002, 5))
+                      for sid, b in zip(range(1, 9), rng.uniform(0.5, 2.0, 8)) if rng.random() < 0.8}
+            expected = _reference(positions, prices, sizes)
+            assert _pnl(*book.batch_pnl(prices)) == pytest.approx(expected)
+            for sid, (bid, ask) in prices.items():
+                on_sid = {p: v for p, v in expected.items() if positions[p][0] == sid}
+                assert _pnl(*book.symbol_pnl(sid, bid, ask)) == pytest.approx(on_sid)
+
+    assert len(book) == len(positions)
+    # removed slots were reused: the arrays never held more than the peak book
+    assert book._high < next_pid - 1
+
+
+def test_free_list_reuses_slots_without_stale_state():
+    book = PositionBook(contract_size_for=lambda sid: 1.0, capacity=16)
+    book.upsert(1, 10, BUY, 10_000, 1.10)
+    book.upsert(2, 10, BUY, 10_000, 1.10)
+    book.set_offset(1, 3.0)
+    slot = book._slot_by_pid[1]
+    book.remove(1)
+    assert len(book.symbol_pnl(10, 1.2, 1.2)[0]) == 1
+
+    book.upsert(3, 20, SELL, 10_000, 1.30)      # takes the freed slot
+    assert book._slot_by_pid[3] == slot and book._high == 2
+    assert not book.is_calibrated(3)
+    assert _pnl(*book.symbol_pnl(20, 1.25, 1.25)) == pytest.approx({3: 5.0})
+    assert _pnl(*book.symbol_pnl(10, 1.2, 1.2)) == pytest.approx({2: 10.0})
+
+
+def test_symbol_change_unlinks_old_symbol():
+    book = PositionBook(contract_size_for=lambda sid: 1.0)
+    book.upsert(1, 10, BUY, 10_000, 1.10)
+    assert len(book.symbol_pnl(10, 1.2, 1.2)[0]) == 1      # caches the slot view for 10
+    book.upsert(1, 20, BUY, 10_000, 1.10)
+    assert len(book.symbol_pnl(10, 1.2, 1.2)[0]) == 0
+    assert _pnl(*book.symbol_pnl(20, 1.2, 1.2)) == pytest.approx({1: 10.0})
+    assert _pnl(*book.batch_pnl({10: (1.2, 1.2), 20: (1.3, 1.3)})) == pytest.approx({1: 20.0})
+
+
+def test_grows_past_capacity():
+    book = PositionBook(contract_size_for=lambda sid: 1.0, capacity=16)
+    for pid in range(1, 41):
+        book.upsert(pid, pid % 3, BUY, 100, 1.0)
+    ids, pnl = book.batch_pnl({0: (2.0, 2.0), 1: (2.0, 2.0), 2: (2.0, 2.0)})
+    assert sorted(ids.tolist()) == list(range(1, 41))
+    assert np.allclose(pnl, 1.0)
@@ -0,0 +1,95 @@
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import pytest
+
+import ui_helpers as H
+from position_book import BUY, SELL, PositionRecord
+
+
+@pytest.fixture
+def book():
+    positions, pnl, names = {}, {}, {10: "EURUSD", 20: "AUDJPY", 30: "XAUUSD"}
+    H.init_ordering(positions, pnl, names)
+    H.set_sort_key("pnl")
+    yield positions, pnl, names
+    H.set_sort_key("pnl")
+    H.init_ordering({}, {}, {})
+
+
+def _reference(positions, pnl, names, key):
+    """What a full re-sort would show."""
+    keys = {
+        "pnl": lambda pid: (-(pnl.get(pid) or 0.0), pid),
+        "symbol": lambda pid: (names.get(positions[pid].symbolId, f"ID:{positions[pid].symbolId}"), pid),
+        "held": lambda pid: (positions[pid].openTimestamp, pid),
+        "size": lambda pid: (-positions[pid].volume, pid),
+    }
+    return sorted(positions, key=keys[key])
+
+
+def _shown(view):
+    return [pid for pid, _ in view]
+
+
+def test_incremental_updates_match_full_resort(book):
+    positions, pnl, names = book
+    rng = random.Random(3)
+    next_pid = 1
+    _shown(H.ordered_positions())        # initial rebuild; everything after is incremental
+
+    for step in range(1500):
+        op = rng.random()
+        if op < 0.3 or not positions:
+            pid, next_pid = next_pid, next_pid + 1
+            positions[pid] = PositionRecord(pid, rng.choice([10, 20, 30, 40]), rng.choice([BUY, SELL]),
+                                            rng.randrange(1, 50) * 100_000, rng.randrange(10**6))
+            pnl[pid] = round(rng.uniform(-100, 100), 2)
+            H.update_position(pid)
+        elif op < 0.8:
+            pid = rng.choice(list(positions))
+            pnl[pid] = rng.choice([pnl.get(pid), round(rng.uniform(-100, 100), 2), None])
+            if rng.random() < 0.2:
+                positions[pid].volume = rng.randrange(1, 50) * 100_000
+            H.update_position(pid)
+        elif op < 0.97:
+            pid = rng.choice(list(positions))
+            del positions[pid]
+            pnl.pop(pid, None)
+            H.discard_position(pid)
+        else:
+            H.cycle_sort_key()
+
+        if step % 25 == 0:
+            key = H._sort_key_name
+            assert _shown(H.ordered_positions()) == _reference(positions, pnl, names, key)
+            assert _shown(H.positions_snapshot()) == _reference(positions, pnl, names, key)
+
+
+def test_each_sort_key(book):
+    positions, pnl, names = book
+    for pid, (sid, vol, opened, value) in enumerate([(20, 300, 5, 1.0), (10, 100, 9, -2.0),
+                                                    (30, 200, 1, 7.5), (40, 200, 3, 7.5)], start=1):
+        positions[pid] = PositionRecord(pid, sid, BUY, vol, opened)
+        pnl[pid] = value
+    for key in H.SORT_KEYS:
+        H.set_sort_key(key)
+        assert _shown(H.ordered_positions()) == _reference(positions, pnl, names, key)
+    assert [pid for pid, _ in H.ordered_positions()[1:3]] == _reference(positions, pnl, names, "size")[1:3]
+
+
+def test_update_of_an_unknown_position_discards_it(book):
+    positions, pnl, _ = book
+    positions[1] = PositionRecord(1, 10, BUY, 100)
+    positions[2] = PositionRecord(2, 10, SELL, 100)
+    H.ordered_positions()
+    del positions[1]
+    H.update_position(1)                 # reconcile removed it before the PnL update landed
+    assert _shown(H.ordered_positions()) == [2]
+    H.discard_position(1)                # twice is harmless
+    assert len(H.ordered_positions()) == 1
+    with pytest.raises(ValueError):
+        H.set_sort_key("colour")
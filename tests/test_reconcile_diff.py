@@ -0,0 +1,92 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from ctrader_open_api.messages.OpenApiModelMessages_pb2 import ProtoOAPosition
+
+from position_book import BUY, SELL, PositionRecord
+from reconcile_diff import diff_positions, symbol_changes
+
+
+def _proto(pid, symbol_id, side=BUY, volume=100, price=1.1, stop_loss=None, take_profit=None, swap=0):
+    p = ProtoOAPosition(positionId=pid, price=price, swap=swap)
+    p.tradeData.symbolId = symbol_id
+    p.tradeData.tradeSide = side
+    p.tradeData.volume = volume
+    p.tradeData.openTimestamp = 1_700_000_000_000 + pid
+    if stop_loss is not None:
+        p.stopLoss = stop_loss
+    if take_profit is not None:
+        p.takeProfit = take_profit
+    return p
+
+
+def _book(protos):
+    current = {p.positionId: PositionRecord.from_proto(p) for p in protos}
+    index = {}
+    for pid, rec in current.items():
+        index.setdefault(rec.symbolId, set()).add(pid)
+    return current, index
+
+
+SNAPSHOT = [_proto(1, 10), _proto(2, 10, SELL), _proto(3, 20)]
+
+
+def test_unchanged_snapshot_is_empty():
+    current, index = _book(SNAPSHOT)
+    diff = diff_positions(current, SNAPSHOT)
+    assert not diff
+    assert (diff.added, diff.removed, diff.modified) == ([], [], [])
+    assert symbol_changes(current, index, diff) == (set(), set())
+
+
+def test_tracked_field_changes_are_modified():
+    current, _ = _book(SNAPSHOT)
+    changes = {
+        "price": _proto(1, 10, price=1.2),
+        "volume": _proto(1, 10, volume=50),
+        "stopLoss": _proto(1, 10, stop_loss=1.0),
+        "takeProfit": _proto(1, 10, take_profit=1.3),
+        "swap": _proto(1, 10, swap=-7),
+    }
+    for field, changed in changes.items():
+        diff = diff_positions(current, [changed] + SNAPSHOT[1:])
+        assert not diff.added and not diff.removed
+        assert len(diff.modified) == 1
+        old, new, fields = diff.modified[0]
+        assert fields == (field,)
+        assert old is current[1]
+        assert getattr(new, field) == getattr(PositionRecord.from_proto(changed), field)
+
+
+def test_added_and_removed():
+    current, _ = _book(SNAPSHOT)
+    diff = diff_positions(current, [SNAPSHOT[0], SNAPSHOT[2], _proto(4, 20)])
+    assert [r.positionId for r in diff.added] == [4]
+    assert diff.removed == [2]
+    assert not diff.modified
+
+
+def test_symbol_gains_first_and_loses_last_position():
+    current, index = _book(SNAPSHOT)
+    # 3 was the only position on 20; 4 is the first on 30; 2 leaves 10 with 1 still open
+    diff = diff_positions(current, [SNAPSHOT[0], _proto(4, 30)])
+    assert sorted(diff.removed) == [2, 3]
+    gained, lost = symbol_changes(current, index, diff)
+    assert gained == {30}
+    assert lost == {20}
+
+
+def test_position_moving_symbols():
+    current, index = _book(SNAPSHOT)
+    diff = diff_positions(current, [SNAPSHOT[0], SNAPSHOT[1], _proto(3, 30)])
+    assert not diff.added and not diff.removed
+    (old, new, fields), = diff.modified
+    assert "symbolId" in fields
+    assert (old.symbolId, new.symbolId) == (20, 30)
+    assert symbol_changes(current, index, diff) == ({30}, {20})
+
+    # moving onto a symbol that already has positions gains nothing
+    diff = diff_positions(current, [SNAPSHOT[0], SNAPSHOT[1], _proto(3, 10)])
+    assert symbol_changes(current, index, diff) == (set(), {20})
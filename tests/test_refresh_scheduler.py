@@ -0,0 +1,108 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import pytest
+from twisted.internet import task
+
+from refresh_scheduler import RefreshScheduler
+
+
+def _scheduler(clock, **kwargs):
+    sent = {"pnl": [], "reconcile": []}
+    sched = RefreshScheduler(
+        reactor=clock,
+        request_pnl=lambda: sent["pnl"].append(clock.seconds()),
+        request_reconcile=lambda: sent["reconcile"].append(clock.seconds()),
+        clock=clock.seconds,
+        **kwargs,
+    )
+    return sched, sent
+
+
+def test_active_book_polls_at_base_interval():
+    clock = task.Clock()
+    sched, sent = _scheduler(clock)
+    sched.start()
+    for _ in range(4):
+        sched.note_activity()
+        clock.advance(sched.pnl_base)
+        sched.on_pnl_response()
+    assert sent["pnl"] == [5.0, 10.0, 15.0, 20.0]
+    assert sched.pnl_interval == sched.pnl_base
+
+
+def test_idle_book_backs_off_to_the_cap():
+    clock = task.Clock()
+    sched, sent = _scheduler(clock)
+    sched.start()
+    intervals = []
+    for _ in range(5):
+        clock.advance(sched.pnl_interval)
+        sched.on_pnl_response()
+        intervals.append(sched.pnl_interval)
+    assert intervals == [10.0, 20.0, 30.0, 30.0, 30.0]
+    assert sent["pnl"] == [5.0, 15.0, 35.0, 65.0, 95.0]
+
+    sched.note_activity()
+    clock.advance(30.0)
+    sched.on_pnl_response()
+    assert sched.pnl_interval == sched.pnl_base
+
+
+def test_divergence_pulls_the_next_poll_forward():
+    clock = task.Clock()
+    sched, sent = _scheduler(clock)
+    sched.start()
+    clock.advance(5.0)
+    sched.on_pnl_response()                      # idle: next poll in 10 s
+    clock.advance(1.0)
+    sched.on_server_pnl(10.0, 10.4)              # within the 0.5 tolerance
+    sched.on_server_pnl(None, 99.0)              # nothing shown locally: not a divergence
+    sched.on_pnl_response()
+    assert sched.divergences == 0
+
+    sched.on_server_pnl(10.0, 12.0)
+    sched.on_pnl_response()
+    assert sched.divergences == 1 and sched.pnl_interval == sched.pnl_fast
+    clock.advance(1.0)
+    assert sent["pnl"] == [5.0, 7.0]
+
+
+def test_relative_tolerance_scales_with_pnl():
+    clock = task.Clock()
+    sched, _ = _scheduler(clock)
+    sched.on_server_pnl(1000.0, 1015.0)          # 1.5% of 1015
+    sched.on_pnl_response()
+    assert sched.divergences == 0
+    sched.on_server_pnl(1000.0, 1030.0)
+    sched.on_pnl_response()
+    assert sched.divergences == 1
+
+
+def test_reconcile_backoff_and_stats():
+    clock = task.Clock()
+    sched, sent = _scheduler(clock)
+    sched.start()
+    clock.pump([10.0, 20.0, 40.0, 60.0])
+    assert sent["reconcile"] == [10.0, 30.0, 70.0, 130.0]
+    assert sched.reconcile_interval == sched.reconcile_idle_max
+    sched.note_activity()
+    clock.advance(60.0)
+    assert sched.reconcile_interval == sched.reconcile_base
+
+    st = sched.stats()
+    assert st["sent"] == sched.pnl_sent + sched.reconcile_sent
+    assert st["legacy"] == pytest.approx(190 / 0.3 + 190 / 5.0)
+    assert st["saved_per_min"] > 0
+
+
+def test_stop_cancels_pending_calls():
+    clock = task.Clock()
+    sched, sent = _scheduler(clock)
+    sched.start()
+    sched.stop()
+    clock.advance(120)
+    assert sent == {"pnl": [], "reconcile": []}
+    assert not clock.getDelayedCalls()
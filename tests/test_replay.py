@@ -0,0 +1,139 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import pytest
+from twisted.internet import task
+from ctrader_open_api.messages.OpenApiCommonMessages_pb2 import ProtoMessage
+from ctrader_open_api.messages.OpenApiMessages_pb2 import ProtoOAReconcileReq, ProtoOASpotEvent
+
+import frame_recorder
+from frame_recorder import INBOUND, OUTBOUND, FrameRecorder, read_frames, recording_start
+from replay import ReplayClient, ReplayEngine
+from request_tracker import RequestTracker
+
+
+class FakeTime:
+    """Stands in for the time module inside frame_recorder so frame timestamps are chosen by the test."""
+
+    def __init__(self):
+        self.mono_ns = 5_000_000_000
+
+    def monotonic_ns(self):
+        return self.mono_ns
+
+    def time_ns(self):
+        return 1_700_000_000_000_000_000
+
+
+def _spot(symbol_id, bid, client_msg_id=None):
+    ev = ProtoOASpotEvent(ctidTraderAccountId=1, symbolId=symbol_id, bid=bid)
+    return ProtoMessage(payloadType=ev.payloadType, payload=ev.SerializeToString(), clientMsgId=client_msg_id)
+
+
+@pytest.fixture
+def recording(tmp_path, monkeypatch):
+    """in 0s, out 0.1s, in 0.5s, in 2.0s."""
+    fake = FakeTime()
+    monkeypatch.setattr(frame_recorder, "time", fake)
+    path = str(tmp_path / "session.frames")
+    rec = FrameRecorder(path)
+    rec.inbound(_spot(1, 110_000))
+    fake.mono_ns += 100_000_000
+    rec.outbound(ProtoOAReconcileReq(ctidTraderAccountId=1), "cli-1")
+    fake.mono_ns += 400_000_000
+    rec.inbound(_spot(2, 120_000, "cli-1"))
+    fake.mono_ns += 1_500_000_000
+    rec.inbound(_spot(1, 110_050))
+    rec.close()
+    assert rec.written == 4 and rec.dropped == 0
+    return path
+
+
+def test_read_frames_round_trip(recording):
+    frames = list(read_frames(recording))
+    assert [d for d, _, _ in frames] == [INBOUND, OUTBOUND, INBOUND, INBOUND]
+    assert [t - frames[0][1] for _, t, _ in frames] == [0, 100_000_000, 500_000_000, 2_000_000_000]
+    assert recording_start(recording) == (1_700_000_000_000_000_000, 5_000_000_000)
+
+    out = frames[1][2]
+    assert out.clientMsgId == "cli-1"
+    req = ProtoOAReconcileReq()
+    req.ParseFromString(out.payload)
+    assert out.payloadType == req.payloadType and req.ctidTraderAccountId == 1
+
+    ev = ProtoOASpotEvent()
+    ev.ParseFromString(frames[3][2].payload)
+    assert (ev.symbolId, ev.bid) == (1, 110_050)
+
+
+def test_truncated_tail_is_ignored(recording):
+    with open(recording, "r+b") as f:
+        f.truncate(os.path.getsize(recording) - 3)
+    assert len(list(read_frames(recording))) == 3
+
+
+def test_replay_keeps_recorded_gaps(recording):
+    clock = task.Clock()
+    delivered = []
+    engine = ReplayEngine(recording, reactor=clock, clock=clock.seconds, speed=1.0,
+                          deliver=lambda m: delivered.append(clock.seconds()))
+    engine.start()
+    clock.advance(0)
+    assert len(delivered) == 1
+    clock.advance(0.49)
+    assert len(delivered) == 1
+    clock.advance(0.01)
+    assert len(delivered) == 2
+    clock.advance(1.5)
+    assert delivered == [0.0, 0.5, 2.0]
+    assert engine.done and engine.outbound == 1
+    st = engine.stats()
+    assert st["delivered"] == 3 and st["recorded_s"] == pytest.approx(2.0)
+    assert st["speedup"] == pytest.approx(1.0)
+
+
+def test_replay_speed_and_as_fast_as_possible(recording):
+    clock = task.Clock()
+    delivered = []
+    engine = ReplayEngine(recording, reactor=clock, clock=clock.seconds, speed=4.0,
+                          deliver=lambda m: delivered.append(clock.seconds()))
+    engine.start()
+    clock.advance(0)
+    clock.pump([0.125] * 4)
+    assert delivered == [0.0, 0.125, 0.5]
+
+    clock = task.Clock()
+    done = []
+    engine = ReplayEngine(recording, reactor=clock, clock=clock.seconds, speed=0, chunk=2,
+                          deliver=lambda m: None, on_done=lambda: done.append(True))
+    engine.start()
+    clock.advance(0)
+    assert engine.delivered == 3 and done == [True]
+    assert engine.turns == 2      # chunk: at most 2 frames per reactor turn
+
+
+def test_handler_errors_are_counted(recording):
+    clock = task.Clock()
+
+    def deliver(message):
+        raise ValueError("bad frame")
+
+    engine = ReplayEngine(recording, reactor=clock, clock=clock.seconds, speed=0, deliver=deliver)
+    engine.start()
+    clock.advance(0)
+    assert engine.errors == 3 and engine.done
+
+
+def test_replayed_client_msg_ids_do_not_match_replay_requests(recording):
+    # the replay session numbers its own requests; they must not pick up the recorded answers
+    tracker = RequestTracker(prefix="replay", clock=lambda: 0.0)
+    client = ReplayClient()
+    tracker.start(ProtoOAReconcileReq())
+    client.send(ProtoOAReconcileReq())
+    for direction, _, message in read_frames(recording):
+        if direction == INBOUND and message.clientMsgId:
+            assert tracker.complete(message.clientMsgId) is None
+    assert tracker.pending == 1 and tracker.unmatched == 1
+    assert client.sent == 1
@@ -0,0 +1,155 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from twisted.internet import defer, task
+from ctrader_open_api.messages.OpenApiCommonMessages_pb2 import ProtoMessage
+from ctrader_open_api.messages.OpenApiMessages_pb2 import ProtoOAErrorRes, ProtoOASubscribeSpotsRes
+
+from spot_subscriptions import OWNER_BOARD, OWNER_POSITIONS, SpotSubscriptions
+
+
+def _ok():
+    return ProtoMessage(payloadType=ProtoOASubscribeSpotsRes().payloadType)
+
+
+def _error():
+    return ProtoMessage(payloadType=ProtoOAErrorRes().payloadType)
+
+
+class Harness:
+    def __init__(self):
+        self.clock = task.Clock()
+        self.subs, self.unsubs = [], []     # [(symbol ids, Deferred)]
+        self.settled = 0
+        self.manager = SpotSubscriptions(
+            reactor=self.clock,
+            send_subscribe=lambda ids: self._send(self.subs, ids),
+            send_unsubscribe=lambda ids: self._send(self.unsubs, ids),
+            on_settled=self._on_settled,
+        )
+
+    def _send(self, log, ids):
+        d = defer.Deferred()
+        log.append((list(ids), d))
+        return d
+
+    def _on_settled(self):
+        self.settled += 1
+
+    def turn(self):
+        self.clock.advance(0)
+
+
+def test_acquire_batches_within_one_turn():
+    h = Harness()
+    for sid in (3, 1, 2):
+        h.manager.acquire(sid, OWNER_POSITIONS)
+    h.manager.acquire(1, OWNER_BOARD)
+    assert h.subs == []
+    h.turn()
+    assert [ids for ids, _ in h.subs] == [[1, 2, 3]]
+    assert h.manager.stats()["requests_saved"] == 2
+    assert 2 in h.manager and not h.manager.is_confirmed(2)
+
+    h.subs[0][1].callback(_ok())
+    assert all(h.manager.is_confirmed(s) for s in (1, 2, 3))
+    assert h.settled == 1
+
+
+def test_release_is_ref_counted():
+    h = Harness()
+    h.manager.acquire(1, OWNER_POSITIONS)
+    h.manager.acquire(1, OWNER_BOARD)
+    h.manager.acquire(1, OWNER_BOARD)        # same owner twice counts once
+    h.turn()
+    h.subs[0][1].callback(_ok())
+
+    h.manager.release(1, OWNER_BOARD)
+    h.turn()
+    assert h.unsubs == []
+    assert h.manager.owners(1) == {OWNER_POSITIONS}
+
+    h.manager.release(1, OWNER_POSITIONS)
+    h.manager.release(1, OWNER_POSITIONS)    # unknown owner: ignored
+    h.turn()
+    assert [ids for ids, _ in h.unsubs] == [[1]]
+    h.unsubs[0][1].callback(None)
+    assert 1 not in h.manager and h.manager.subscribed_symbols() == []
+
+
+def test_release_before_flush_sends_nothing():
+    h = Harness()
+    h.manager.acquire(5, OWNER_BOARD)
+    h.manager.release(5, OWNER_BOARD)
+    h.turn()
+    assert h.subs == [] and h.unsubs == []
+
+
+def test_failed_batch_is_not_subscribed_and_resync_retries():
+    h = Harness()
+    h.manager.acquire(1, OWNER_POSITIONS)
+    h.manager.acquire(2, OWNER_POSITIONS)
+    h.turn()
+    h.subs[0][1].callback(_error())
+    assert 1 not in h.manager and h.manager.failures == 1
+    assert h.settled == 1
+
+    h.manager.resync()
+    h.turn()
+    assert [ids for ids, _ in h.subs] == [[1, 2], [1, 2]]
+
+    h.subs[1][1].errback(defer.TimeoutError())
+    assert h.manager.subscribed_symbols() == []
+
+
+def test_reset_ignores_answers_from_the_old_connection():
+    h = Harness()
+    h.manager.acquire(1, OWNER_POSITIONS)
+    h.turn()
+    stale = h.subs[0][1]
+
+    h.manager.reset()
+    assert 1 not in h.manager and h.manager.owners(1) == {OWNER_POSITIONS}
+    stale.callback(_ok())                    # late confirmation for the old connection
+    assert not h.manager.is_confirmed(1) and h.settled == 0
+
+    h.manager.resync()
+    h.turn()
+    h.subs[1][1].callback(_ok())
+    assert h.manager.is_confirmed(1) and h.settled == 1
+
+
+def test_cancelled_batch_after_reset_is_stale():
+    h = Harness()
+    h.manager.acquire(1, OWNER_POSITIONS)
+    h.turn()
+    h.manager.reset()
+    h.subs[0][1].errback(defer.CancelledError())
+    assert h.manager.failures == 0
+
+
+def test_resubscribe_repairs_only_owned_symbols():
+    h = Harness()
+    h.manager.acquire(1, OWNER_POSITIONS)
+    h.turn()
+    h.subs[0][1].callback(_ok())
+
+    h.manager.resubscribe([1, 99])
+    h.turn()
+    assert [ids for ids, _ in h.unsubs] == [[1]]
+    assert [ids for ids, _ in h.subs][-1] == [1]
+    h.subs[-1][1].callback(_ok())
+    assert h.settled == 1                    # a repair is not a fresh subscription
+
+
+def test_set_owned():
+    h = Harness()
+    h.manager.set_owned(OWNER_POSITIONS, [1, 2])
+    h.turn()
+    h.subs[0][1].callback(_ok())
+    h.manager.set_owned(OWNER_POSITIONS, [2, 3])
+    h.turn()
+    assert [ids for ids, _ in h.unsubs] == [[1]]
+    assert [ids for ids, _ in h.subs][-1] == [3]
@@ -0,0 +1,119 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import numpy as np
+import pytest
+from twisted.internet import task
+
+from tick_archive import INDEX_STRIDE, INITIAL_RECORDS, TICK_RECORD, TickArchive, TickFile
+
+
+def _rows(ts):
+    rows = np.zeros(len(ts), dtype=TICK_RECORD)
+    rows["ts"] = ts
+    rows["bid"] = np.arange(len(ts))
+    rows["ask"] = rows["bid"] + 2
+    return rows
+
+
+def _brute(rows, t0, t1):
+    return rows[(rows["ts"] >= t0) & (rows["ts"] <= t1)]
+
+
+@pytest.fixture
+def tick_file(tmp_path):
+    # 3.5 blocks; runs of equal timestamps straddle the block boundaries
+    ts = np.repeat(np.arange(0, 7 * INDEX_STRIDE // 4) * 10, 3)[:INDEX_STRIDE * 7 // 2]
+    f = TickFile(str(tmp_path / "1.ticks"), writable=True)
+    f.append(_rows(ts))
+    return f
+
+
+def test_range_matches_brute_force(tick_file):
+    rows = tick_file.records()
+    last = int(rows["ts"][-1])
+    edges = [int(rows["ts"][i]) for i in (0, INDEX_STRIDE - 1, INDEX_STRIDE, 2 * INDEX_STRIDE, len(rows) - 1)]
+    probes = sorted({e + d for e in edges for d in (-11, -10, -1, 0, 1, 10)})
+    for t0 in probes:
+        for t1 in probes:
+            got = tick_file.range(t0, t1)
+            assert np.array_equal(got, _brute(rows, t0, t1)), (t0, t1)
+    assert len(tick_file.range(-100, last + 100)) == len(rows)
+
+
+def test_empty_ranges(tick_file, tmp_path):
+    last = int(tick_file.records()["ts"][-1])
+    assert len(tick_file.range(5, 5)) == 0                 # between two timestamps
+    assert len(tick_file.range(100, 50)) == 0              # reversed
+    assert len(tick_file.range(-20, -1)) == 0              # before the first tick
+    assert len(tick_file.range(last + 1, last + 99)) == 0  # after the last
+    empty = TickFile(str(tmp_path / "2.ticks"), writable=True)
+    assert len(empty.range(0, 10**12)) == 0 and empty.last_ts() is None
+
+
+def test_reader_sees_only_the_committed_prefix(tmp_path):
+    path = str(tmp_path / "1.ticks")
+    writer = TickFile(path, writable=True)
+    writer.append(_rows([1, 2, 3]))
+    reader = TickFile(path)
+
+    # rows written but not yet published by the header count
+    writer._rows[3:5] = _rows([4, 5])
+    assert len(reader.records()) == 3 and reader.last_ts() == 3
+    writer._header[1] = 5
+    assert reader.last_ts() == 5
+    assert np.array_equal(reader.range(2, 4)["ts"], [2, 3, 4])
+
+
+def test_reader_remaps_after_the_writer_grows(tmp_path):
+    path = str(tmp_path / "1.ticks")
+    writer = TickFile(path, writable=True)
+    reader = TickFile(path)
+    assert reader._capacity == INITIAL_RECORDS
+
+    n = INITIAL_RECORDS + 10
+    writer.append(_rows(np.arange(n)))
+    writer.flush()
+    assert writer._capacity > INITIAL_RECORDS
+    assert len(reader.records()) == n
+    assert reader._capacity == writer._capacity
+    assert np.array_equal(reader.range(n - 3, n)["ts"], [n - 3, n - 2, n - 1])
+
+
+def test_not_an_archive(tmp_path):
+    path = tmp_path / "junk.ticks"
+    path.write_bytes(b"x" * 128)
+    with pytest.raises(ValueError):
+        TickFile(str(path))
+
+
+def test_archive_drops_older_ticks_and_fills_sides(tmp_path):
+    clock = task.Clock()
+    archive = TickArchive(root=str(tmp_path), reactor=clock, flush_interval=0.25)
+    archive.append(1, 0, 110_002, ts_ms=1000)      # first tick: bid mirrored from ask
+    archive.append(1, 110_001, 0, ts_ms=1000)      # same ms is kept, ask carried over
+    archive.append(1, 110_003, 110_005, ts_ms=999) # older: dropped
+    archive.append(2, 90_000, 90_002, ts_ms=500)   # other symbols keep their own order
+    assert archive.stats()["pending"] == 3 and archive.out_of_order == 1
+
+    clock.advance(0.25)
+    assert archive.flushes == 1 and archive.appended == 3
+    rows = archive.range(1, 0, 2000)
+    assert rows.tolist() == [(1000, 110_002, 110_002), (1000, 110_001, 110_002)]
+    archive.close()
+
+    # a new writer resumes from the file's last tick
+    again = TickArchive(root=str(tmp_path))
+    again.append(1, 110_010, 0, ts_ms=900)
+    again.append(1, 110_010, 0, ts_ms=1001)
+    again.flush()
+    assert again.out_of_order == 1
+    assert again.range(1, 1001, 1001).tolist() == [(1001, 110_010, 110_002)]
+
+    reader = TickArchive(root=str(tmp_path), writable=False)
+    assert reader.symbols() == [1, 2]
+    assert len(reader.range(3, 0, 10**12)) == 0
+    ts, bid, ask = reader.prices(2, 0, 1000)
+    assert ts.tolist() == [500] and bid.tolist() == [0.9] and ask.tolist() == [0.90002]
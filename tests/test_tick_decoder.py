@@ -0,0 +1,43 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import numpy as np
+from ctrader_open_api.messages.OpenApiMessages_pb2 import ProtoOAGetTickDataRes
+
+from tick_decoder import decode_tick_data, decode_tick_payload
+
+
+def _page(ticks, has_more):
+    """ProtoOAGetTickDataRes with (timestamp, tick) deltas, newest first."""
+    res = ProtoOAGetTickDataRes(ctidTraderAccountId=1, hasMore=has_more)
+    for ts, px in ticks:
+        tick = res.tickData.add()
+        tick.timestamp = ts
+        tick.tick = px
+    return res
+
+
+def _assert_matches_parse(res):
+    ts, px, has_more = decode_tick_payload(res.SerializeToString())
+    ref_ts, ref_px, ref_more = decode_tick_data(res)
+    assert np.array_equal(ts, ref_ts)
+    assert np.array_equal(px, ref_px)
+    assert has_more == ref_more == res.hasMore
+
+
+def test_empty_page_keeps_has_more():
+    ts, px, has_more = decode_tick_payload(_page([], True).SerializeToString())
+    assert has_more is True
+    assert len(ts) == len(px) == 0
+
+
+def test_empty_page_without_has_more():
+    _assert_matches_parse(_page([], False))
+
+
+def test_page_matches_protobuf_parse():
+    ticks = [(1_700_000_000_000, 110_000), (-250, 3), (-1, -7), (-4000, 0)]
+    _assert_matches_parse(_page(ticks, True))
+    _assert_matches_parse(_page(ticks, False))
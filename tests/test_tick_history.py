@@ -0,0 +1,150 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import numpy as np
+from twisted.internet import defer
+from ctrader_open_api.messages.OpenApiCommonMessages_pb2 import ProtoMessage
+from ctrader_open_api.messages.OpenApiMessages_pb2 import ProtoOAErrorRes, ProtoOAGetTickDataRes
+
+import tick_history
+from tick_history import TickHistoryDownloader
+
+W = 1000    # grid used by the tests
+
+
+class FakeServer:
+    """request_ticks stand-in: the newest `page` ticks with from <= ts <= to, delta-encoded newest first."""
+
+    def __init__(self, ticks, page=4):
+        self.ticks = sorted(ticks)      # (ts_ms, raw price)
+        self.page = page
+        self.requests = []
+        self.errors = 0                 # answer this many requests with ProtoOAErrorRes
+        self.cancel = False
+
+    def __call__(self, symbol_id, quote_type, from_ms, to_ms):
+        self.requests.append((from_ms, to_ms))
+        if self.cancel:
+            return defer.fail(defer.CancelledError())
+        if self.errors:
+            self.errors -= 1
+            err = ProtoOAErrorRes(errorCode="INVALID_REQUEST")
+            return defer.succeed(ProtoMessage(payloadType=err.payloadType, payload=err.SerializeToString()))
+        hits = [t for t in self.ticks if from_ms <= t[0] <= to_ms]
+        newest = hits[::-1][:self.page]
+        res = ProtoOAGetTickDataRes(ctidTraderAccountId=1, hasMore=len(hits) > self.page)
+        prev = (0, 0)
+        for ts, px in newest:
+            tick = res.tickData.add()
+            tick.timestamp = ts - prev[0]
+            tick.tick = px - prev[1]
+            prev = (ts, px)
+        return defer.succeed(ProtoMessage(payloadType=res.payloadType, payload=res.SerializeToString()))
+
+
+def _downloader(tmp_path, server, **kwargs):
+    return TickHistoryDownloader(request_ticks=server, root=str(tmp_path), window_ms=W, **kwargs)
+
+
+def _result(d):
+    out = []
+    d.addBoth(out.append)
+    assert out, "deferred did not fire"
+    return out[0]
+
+
+def _loaded(dl, from_ms=None, to_ms=None):
+    ts, px = dl.load(1, "bid", from_ms, to_ms)
+    return list(zip(ts.tolist(), np.round(px * 1e5).astype(np.int64).tolist()))
+
+
+def test_windows_follow_the_grid(tmp_path):
+    dl = _downloader(tmp_path, FakeServer([]))
+    assert dl.windows(250, 2100) == [(0, 250, 999), (1000, 1000, 1999), (2000, 2000, 2100)]
+    assert dl.windows(1000, 1999) == [(1000, 1000, 1999)]
+    assert dl.windows(1500, 1500) == [(1000, 1500, 1500)]
+
+
+def test_boundary_millisecond_is_neither_lost_nor_doubled(tmp_path):
+    # page size 4: the first page's oldest millisecond (104) also holds ticks the page did not fit
+    ticks = [(100, 1), (101, 2), (104, 3), (104, 4), (104, 5), (105, 6), (106, 7), (107, 8)]
+    server = FakeServer(ticks, page=4)
+    dl = _downloader(tmp_path, server)
+    summary = _result(dl.download(1, "BID", 0, 999))
+    assert server.requests[:2] == [(0, 999), (0, 104)]
+    assert _loaded(dl) == ticks
+    assert summary["ticks"] == len(ticks) and summary["windows"] == 1
+
+
+def test_page_inside_one_millisecond_steps_past_it(tmp_path):
+    ticks = [(50, 1)] + [(60, p) for p in range(2, 6)] + [(70, 9)]
+    server = FakeServer(ticks, page=4)
+    dl = _downloader(tmp_path, server)
+    _result(dl.download(1, "BID", 0, 999))
+    # the second page is all ms 60: step past it instead of asking for it forever
+    assert server.requests == [(0, 999), (0, 60), (0, 59)]
+    assert _loaded(dl) == ticks
+
+
+def test_manifest_resume_and_widening(tmp_path):
+    ticks = [(t, t) for t in range(0, 3000, 50)]
+    server = FakeServer(ticks, page=7)
+    dl = _downloader(tmp_path, server)
+    first = _result(dl.download(1, "BID", 500, 1999))
+    assert first["windows"] == 2 and first["skipped"] == 0
+    assert sorted(dl.manifest(1, "BID")["windows"]) == ["0", "1000"]
+
+    n = len(server.requests)
+    again = _downloader(tmp_path, server)
+    summary = _result(again.download(1, "bid", 600, 1500))
+    assert summary["skipped"] == 2 and summary["windows"] == 0
+    assert len(server.requests) == n
+
+    # a wider range refetches cell 0 as one file covering both parts, and adds cell 2000
+    summary = _result(again.download(1, "BID", 0, 2999))
+    assert summary["skipped"] == 1 and summary["windows"] == 2
+    entries = again.manifest(1, "BID")["windows"]
+    assert (entries["0"]["from"], entries["0"]["to"]) == (0, 999)
+    assert not os.path.exists(os.path.join(again.directory(1, "BID"), "500-999.ts.npy"))
+    assert _loaded(again) == ticks
+    assert _loaded(again, 975, 1100) == [(1000, 1000), (1050, 1050), (1100, 1100)]
+
+
+def test_failed_window_is_retried_then_left_out(tmp_path):
+    server = FakeServer([(10, 1), (1010, 2)])
+    server.errors = 3
+    dl = _downloader(tmp_path, server, max_retries=2)
+    summary = _result(dl.download(1, "BID", 0, 1999))
+    assert summary["failed"] == 1 and summary["windows"] == 1
+    assert list(dl.manifest(1, "BID")["windows"]) == ["1000"]
+
+    summary = _result(dl.download(1, "BID", 0, 1999))            # a re-run fetches only the failed window
+    assert summary["skipped"] == 1 and summary["windows"] == 1
+    assert _loaded(dl) == [(10, 1), (1010, 2)]
+
+
+def test_cancelled_request_is_not_retried(tmp_path):
+    server = FakeServer([(10, 1)])
+    server.cancel = True
+    dl = _downloader(tmp_path, server)
+    summary = _result(dl.download(1, "BID", 0, 999))
+    assert summary["failed"] == 1 and len(server.requests) == 1
+
+
+def test_undecodable_page_and_failed_write_fail_the_window(tmp_path, monkeypatch):
+    server = FakeServer([(10, 1)])
+    dl = _downloader(tmp_path, server)
+    monkeypatch.setattr(tick_history, "decode_tick_payload", lambda *a: 1 / 0)
+    summary = _result(dl.download(1, "BID", 0, 999))
+    assert summary["failed"] == 1
+    monkeypatch.undo()
+
+    lines = []
+    dl = _downloader(tmp_path, server, on_progress=lines.append)
+    monkeypatch.setattr(tick_history.np, "save", lambda *a, **k: 1 / 0)
+    summary = _result(dl.download(1, "BID", 0, 999))
+    assert summary["failed"] == 1
+    assert dl.manifest(1, "BID")["windows"] == {}
+    assert any("write failed" in line for line in lines)
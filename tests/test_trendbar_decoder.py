@@ -0,0 +1,65 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import numpy as np
+from ctrader_open_api.messages.OpenApiMessages_pb2 import ProtoOAGetTrendbarsRes
+
+from trendbar_decoder import _bar_columns, decode_trendbar_payload, decode_trendbars
+
+
+def _res(bars):
+    """ProtoOAGetTrendbarsRes; each bar is a dict of the ProtoOATrendbar fields to set (unset = zero delta)."""
+    res = ProtoOAGetTrendbarsRes(ctidTraderAccountId=1, period=1, timestamp=1_700_000_000_000, symbolId=7)
+    for fields in bars:
+        bar = res.trendbar.add()
+        for name, value in fields.items():
+            setattr(bar, name, value)
+    return res
+
+
+def _assert_matches_parse(res, digits=5):
+    payload = res.SerializeToString()
+    assert _bar_columns(payload) is not None        # decoded from the bytes, not the parse fallback
+    fast = decode_trendbar_payload(payload, digits)
+    ref = decode_trendbars(res, digits)
+    assert fast.dtype == ref.dtype
+    assert np.array_equal(fast, ref)
+    return fast
+
+
+def test_empty_response():
+    assert len(_assert_matches_parse(_res([]))) == 0
+    assert len(decode_trendbar_payload(b"")) == 0
+
+
+def test_full_bars_match_parse():
+    bars = [
+        {"utcTimestampInMinutes": 28_333_333 + i, "low": 110_000 + i, "deltaOpen": 3, "deltaHigh": 40,
+         "deltaClose": 12, "volume": 1000 + i, "period": 1}
+        for i in range(50)
+    ]
+    out = _assert_matches_parse(_res(bars))
+    assert out["ts"][0] == 28_333_333 * 60_000
+    assert out["high"][0] == 1.1004
+
+
+def test_missing_zero_deltas_match_parse():
+    # proto3-style zero deltas are left off the wire, so bars have different field sets
+    bars = [
+        {"utcTimestampInMinutes": 100, "low": 500, "volume": 1},                              # open=high=close=low
+        {"utcTimestampInMinutes": 101, "low": 500, "deltaHigh": 9, "volume": 2},
+        {"utcTimestampInMinutes": 102, "low": 501, "deltaOpen": 4, "deltaClose": 1, "volume": 3},
+        {"utcTimestampInMinutes": 103, "volume": 0},                                          # no low at all
+        {"utcTimestampInMinutes": 104, "low": 2**40, "deltaHigh": 2**33, "volume": 2**35},    # multi-byte varints
+    ]
+    out = _assert_matches_parse(_res(bars))
+    assert out["open"][0] == out["high"][0] == out["close"][0] == out["low"][0]
+    assert out["low"][3] == 0.0
+
+
+def test_digits_scale():
+    res = _res([{"utcTimestampInMinutes": 1, "low": 12345, "deltaClose": 5, "volume": 1}])
+    out = _assert_matches_parse(res, digits=2)
+    assert out["close"][0] == 123.5
@@ -0,0 +1,134 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import numpy as np
+from twisted.internet import defer
+from ctrader_open_api.messages.OpenApiCommonMessages_pb2 import ProtoMessage
+from ctrader_open_api.messages.OpenApiMessages_pb2 import ProtoOAErrorRes, ProtoOAGetTrendbarsRes
+
+from trendbar_decoder import MINUTE_MS
+from trendbar_store import MAX_SPAN_MS, PERIOD_MS, TrendbarStore, merge_ranges, missing_ranges
+
+H1 = PERIOD_MS["H1"]
+T0 = 1_700_002_800_000          # on an hour boundary
+
+
+def test_merge_ranges():
+    assert merge_ranges([]) == []
+    assert merge_ranges([(10, 20), (0, 5)]) == [(0, 5), (10, 20)]
+    assert merge_ranges([(0, 5), (6, 9)]) == [(0, 9)]              # touching
+    assert merge_ranges([(0, 5), (7, 9)]) == [(0, 5), (7, 9)]      # one apart
+    assert merge_ranges([(0, 10), (2, 3), (9, 15)]) == [(0, 15)]   # contained, overlapping
+
+
+def test_missing_ranges():
+    covered = [(10, 19), (30, 39)]
+    assert missing_ranges([], 0, 9) == [(0, 9)]
+    assert missing_ranges(covered, 12, 18) == []
+    assert missing_ranges(covered, 0, 50) == [(0, 9), (20, 29), (40, 50)]
+    assert missing_ranges(covered, 15, 35) == [(20, 29)]
+    assert missing_ranges(covered, 19, 30) == [(20, 29)]
+    assert missing_ranges(covered, 40, 45) == [(40, 45)]
+
+
+class FakeServer:
+    """request_bars stand-in: serves hourly bars from `bars` ({ts: close_raw}) that open inside the range."""
+
+    def __init__(self, bars):
+        self.bars = dict(bars)
+        self.requests = []
+        self.fail = False
+
+    def __call__(self, symbol_id, period, from_ms, to_ms):
+        self.requests.append((from_ms, to_ms))
+        if self.fail:
+            err = ProtoOAErrorRes(errorCode="INVALID_REQUEST")
+            return defer.succeed(ProtoMessage(payloadType=err.payloadType, payload=err.SerializeToString()))
+        res = ProtoOAGetTrendbarsRes(ctidTraderAccountId=1, period=9, timestamp=0, symbolId=symbol_id)
+        for ts in sorted(self.bars):
+            if from_ms <= ts <= to_ms:
+                bar = res.trendbar.add()
+                bar.utcTimestampInMinutes = ts // MINUTE_MS
+                bar.low = self.bars[ts] - 20
+                bar.deltaOpen = 5
+                bar.deltaHigh = 30
+                bar.deltaClose = 20
+                bar.volume = 7
+        return defer.succeed(ProtoMessage(payloadType=res.payloadType, payload=res.SerializeToString()))
+
+
+def _result(d):
+    out = []
+    d.addCallback(out.append)
+    assert out, "deferred did not fire"
+    return out[0]
+
+
+def _store(tmp_path, server, now_ms):
+    return TrendbarStore(request_bars=server, root=str(tmp_path), clock=lambda: now_ms / 1000)
+
+
+def test_fetches_only_missing_parts_and_caches(tmp_path):
+    server = FakeServer({T0 + i * H1: 110_000 + i for i in range(10)})
+    store = _store(tmp_path, server, T0 + 20 * H1)
+    bars, info = _result(store.get(1, "H1", T0, T0 + 4 * H1 - 1))
+    assert len(bars) == 4 and info["requests"] == 1
+    assert np.allclose(bars["close"], [(110_000 + i) / 1e5 for i in range(4)])
+
+    bars, info = _result(store.get(1, "h1", T0 + 2 * H1, T0 + 6 * H1 - 1))
+    assert len(bars) == 4
+    assert server.requests[-1] == (T0 + 4 * H1, T0 + 6 * H1 - 1)    # only the uncovered tail
+
+    _, info = _result(store.get(1, "H1", T0, T0 + 6 * H1 - 1))
+    assert info["requests"] == 0 and store.disk_hits == 1
+
+    # a fresh store reads bars.npy/meta.json instead of asking again
+    again = _store(tmp_path, server, T0 + 20 * H1)
+    bars, info = _result(again.get(1, "H1", T0, T0 + 6 * H1 - 1))
+    assert info["requests"] == 0 and len(bars) == 6
+
+
+def test_long_ranges_split_at_the_server_span(tmp_path):
+    server = FakeServer({})
+    store = _store(tmp_path, server, T0 + 10_000 * H1)
+    span = MAX_SPAN_MS["M1"]
+    _result(store.get(1, "M1", T0, T0 + 2 * span + 5))
+    assert server.requests == [(T0, T0 + span - 1), (T0 + span, T0 + 2 * span - 1), (T0 + 2 * span, T0 + 2 * span + 5)]
+
+
+def test_forming_bar_is_refetched_and_replaced(tmp_path):
+    # now is 30 minutes into the bar opening at T0 + 3h
+    server = FakeServer({T0 + i * H1: 110_000 + i for i in range(4)})
+    now = T0 + 3 * H1 + 30 * MINUTE_MS
+    store = _store(tmp_path, server, now)
+    bars, _ = _result(store.get(1, "H1", T0, T0 + 4 * H1 - 1))
+    assert len(bars) == 4
+    assert store.covered(1, "H1") == [(T0, T0 + 3 * H1 - 1)]    # closed_until: up to the forming bar
+
+    server.bars[T0 + 3 * H1] = 120_000                          # the forming bar moved on
+    bars, info = _result(store.get(1, "H1", T0, T0 + 4 * H1 - 1))
+    assert info["requests"] == 1 and server.requests[-1][0] == T0 + 3 * H1
+    assert len(bars) == 4 and np.unique(bars["ts"]).size == 4   # same timestamp: replaced, not duplicated
+    assert bars["close"][-1] == 1.2
+
+
+def test_failed_chunk_stays_uncovered(tmp_path):
+    server = FakeServer({T0: 110_000})
+    server.fail = True
+    store = _store(tmp_path, server, T0 + 20 * H1)
+    bars, info = _result(store.get(1, "H1", T0, T0 + H1 - 1))
+    assert len(bars) == 0 and info["failed"] == 1 and store.failures == 1
+    assert store.covered(1, "H1") == []
+
+    server.fail = False
+    bars, info = _result(store.get(1, "H1", T0, T0 + H1 - 1))
+    assert len(bars) == 1 and info["failed"] == 0
+
+
+def test_unknown_period_fails(tmp_path):
+    store = _store(tmp_path, FakeServer({}), T0)
+    errors = []
+    store.get(1, "M7", T0, T0 + 1).addErrback(errors.append)
+    assert errors and errors[0].check(ValueError)
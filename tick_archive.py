@@ -0,0 +1,230 @@
+# tick_archive.py
+import os
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+TICK_ARCHIVE_DIR = os.getenv("TICK_ARCHIVE_DIR", "")     # empty: live ticks are not archived
+
+TICK_RECORD = np.dtype([("ts", "<i8"), ("bid", "<i8"), ("ask", "<i8")])   # ms, raw prices
+MAGIC = b"CTTICKS1"
+HEADER_BYTES = 64           # magic, committed record count, record size; records stay 8-byte aligned
+INDEX_STRIDE = 4096         # sparse index: timestamp of every INDEX_STRIDE-th record
+INITIAL_RECORDS = 1 << 16
+MAX_GROW_RECORDS = 1 << 22
+
+
+class TickFile:
+    """
+    One symbol's append-only archive: a 64-byte header followed by fixed-width
+    TICK_RECORD rows, memory-mapped.
+
+    The file is grown ahead of the data, so its size says nothing; the header's
+    committed count does. append() writes the rows first and bumps the count
+    last, so a reader mapping the same file (this process or another) always
+    sees a complete prefix. There must be a single writer per file.
+    """
+
+    def __init__(self, path: str, writable: bool = False):
+        self.path = path
+        self.writable = writable
+        if writable and not os.path.exists(path):
+            with open(path, "wb") as f:
+                header = np.zeros(HEADER_BYTES // 8, dtype="<i8")
+                header[2] = TICK_RECORD.itemsize
+                f.write(MAGIC + header.tobytes()[8:])
+                f.truncate(HEADER_BYTES + INITIAL_RECORDS * TICK_RECORD.itemsize)
+        self._mm = None
+        self._capacity = 0
+        self._index = np.empty(0, dtype=np.int64)
+        self._map()
+        if bytes(self._mm[:8]) != MAGIC or int(self._header[2]) != TICK_RECORD.itemsize:
+            raise ValueError(f"{path}: not a tick archive file")
+
+    def _map(self) -> None:
+        size = os.path.getsize(self.path)
+        self._mm = np.memmap(self.path, dtype=np.uint8, mode="r+" if self.writable else "r", shape=(size,))
+        self._header = self._mm[:HEADER_BYTES].view("<i8")
+        self._capacity = (size - HEADER_BYTES) // TICK_RECORD.itemsize
+        self._rows = self._mm[HEADER_BYTES:HEADER_BYTES + self._capacity * TICK_RECORD.itemsize].view(TICK_RECORD)
+
+    @property
+    def count(self) -> int:
+        return int(self._header[1])
+
+    def records(self) -> np.ndarray:
+        """Committed rows (zero-copy view, oldest first)."""
+        n = self.count
+        if n > self._capacity:      # another process grew the file
+            self._map()
+        return self._rows[:n]
+
+    def last_ts(self) -> Optional[int]:
+        n = self.count
+        return int(self.records()[n - 1]["ts"]) if n else None
+
+    def append(self, rows: np.ndarray) -> None:
+        n, k = self.count, len(rows)
+        if n + k > self._capacity:
+            grow = max(n + k - self._capacity, min(max(self._capacity, INITIAL_RECORDS), MAX_GROW_RECORDS))
+            self._mm.flush()
+            with open(self.path, "r+b") as f:
+                f.truncate(HEADER_BYTES + (self._capacity + grow) * TICK_RECORD.itemsize)
+            self._map()
+        self._rows[n:n + k] = rows
+        self._header[1] = n + k     # publish
+
+    def flush(self) -> None:
+        if self.writable:
+            self._mm.flush()
+
+    def _sparse_index(self, ts: np.ndarray) -> np.ndarray:
+        # extend incrementally; rows are immutable once committed
+        have = len(self._index) * INDEX_STRIDE
+        if have < len(ts):
+            self._index = np.concatenate([self._index, ts[have::INDEX_STRIDE]])
+        return self._index
+
+    def range(self, t0: int, t1: int) -> np.ndarray:
+        """Rows with t0 <= ts <= t1: two searches in the sparse index, one block each, then a zero-copy slice."""
+        rows = self.records()
+        if not len(rows):
+            return rows
+        ts = rows["ts"]
+        index = self._sparse_index(ts)
+        n = len(ts)
+
+        b = max(int(np.searchsorted(index, t0, "left")) - 1, 0) * INDEX_STRIDE
+        lo = b + int(np.searchsorted(ts[b:min(b + INDEX_STRIDE + 1, n)], t0, "left"))
+        b = max(int(np.searchsorted(index, t1, "right")) - 1, 0) * INDEX_STRIDE
+        hi = b + int(np.searchsorted(ts[b:min(b + INDEX_STRIDE + 1, n)], t1, "right"))
+        return rows[lo:max(lo, hi)]
+
+
+class TickArchive:
+    """
+    Per-symbol tick archive under `root` ({symbolId}.ticks, see TickFile).
+
+    append() takes raw spot events as they arrive (before conflation) and
+    buffers them; flush() writes every symbol's buffer as one slice
+    assignment into its memory map, at most every `flush_interval` seconds.
+    A zero side is filled from the symbol's previous quote (mirrored from the
+    other side on a symbol's first tick), and ticks older than the symbol's
+    last archived one are dropped so each file stays sorted by time, which
+    is what makes range() a binary search.
+
+    Open with writable=False to read an archive that another process is
+    appending to.
+    """
+
+    def __init__(
+        self,
+        *,
+        root: str = TICK_ARCHIVE_DIR,
+        reactor=None,
+        writable: bool = True,
+        flush_interval: float = 0.25,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.root = root
+        self.reactor = reactor
+        self.writable = writable
+        self.flush_interval = flush_interval
+        self.clock = clock
+        if writable:
+            os.makedirs(root, exist_ok=True)
+
+        self._files: Dict[int, TickFile] = {}
+        self._pending: Dict[int, List[Tuple[int, int, int]]] = {}
+        self._last: Dict[int, Tuple[int, int, int]] = {}    # symbolId -> last (ts, bid, ask) accepted
+        self._flush_call = None
+
+        # counters
+        self.appended = 0
+        self.out_of_order = 0
+        self.flushes = 0
+
+    def path(self, symbol_id: int) -> str:
+        return os.path.join(self.root, f"{int(symbol_id)}.ticks")
+
+    def file(self, symbol_id: int) -> Optional[TickFile]:
+        symbol_id = int(symbol_id)
+        f = self._files.get(symbol_id)
+        if f is None:
+            if not self.writable and not os.path.exists(self.path(symbol_id)):
+                return None
+            f = self._files[symbol_id] = TickFile(self.path(symbol_id), self.writable)
+        return f
+
+    # ---------------- writing ----------------
+
+    def append(self, symbol_id: int, raw_bid: int, raw_ask: int, ts_ms: Optional[int] = None) -> None:
+        if ts_ms is None:
+            ts_ms = int(self.clock() * 1000)
+        last = self._last.get(symbol_id)
+        if last is None:
+            f = self.file(symbol_id)
+            if f.count:
+                r = f.records()[-1]
+                last = (int(r["ts"]), int(r["bid"]), int(r["ask"]))
+        if last is not None:
+            if ts_ms < last[0]:
+                self.out_of_order += 1
+                return
+            raw_bid = raw_bid or last[1]
+            raw_ask = raw_ask or last[2]
+        raw_bid, raw_ask = raw_bid or raw_ask, raw_ask or raw_bid
+        tick = (ts_ms, raw_bid, raw_ask)
+        self._last[symbol_id] = tick
+        self._pending.setdefault(symbol_id, []).append(tick)
+        if self.reactor is None:
+            return
+        if self._flush_call is None or not self._flush_call.active():
+            self._flush_call = self.reactor.callLater(self.flush_interval, self.flush)
+
+    def flush(self) -> None:
+        self._flush_call = None
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+        for sid, ticks in pending.items():
+            self.file(sid).append(np.array(ticks, dtype=TICK_RECORD))
+            self.appended += len(ticks)
+        self.flushes += 1
+
+    def close(self) -> None:
+        if self._flush_call is not None and self._flush_call.active():
+            self._flush_call.cancel()
+        self.flush()
+        for f in self._files.values():
+            f.flush()
+
+    # ---------------- reading ----------------
+
+    def range(self, symbol_id: int, t0: int, t1: int) -> np.ndarray:
+        """Archived TICK_RECORD rows for t0 <= ts <= t1 (ms), zero-copy; raw integer prices."""
+        f = self.file(symbol_id)
+        return np.empty(0, dtype=TICK_RECORD) if f is None else f.range(int(t0), int(t1))
+
+    def prices(self, symbol_id: int, t0: int, t1: int, digits: int = 5) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(ts_ms, bid, ask) with prices scaled by 10**digits (the scaling copies)."""
+        rows = self.range(symbol_id, t0, t1)
+        scale = 10.0 ** digits
+        return rows["ts"], rows["bid"] / scale, rows["ask"] / scale
+
+    def symbols(self) -> List[int]:
+        try:
+            names = os.listdir(self.root)
+        except OSError:
+            return []
+        return sorted(int(n[:-6]) for n in names if n.endswith(".ticks") and n[:-6].isdigit())
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "symbols": len(self._files),
+            "appended": self.appended,
+            "pending": sum(len(t) for t in self._pending.values()),
+            "out_of_order": self.out_of_order,
+            "flushes": self.flushes,
+        }
@@ -0,0 +1,59 @@
+# tick_conflator.py
+from collections import defaultdict
+from typing import Callable, Dict, List, Tuple
+
+RawQuote = List[int]  # [raw_bid, raw_ask]; 0 means "side not sent"
+
+
+class TickConflator:
+    """
+    Conflating ingest stage for ProtoOASpotEvent bursts.
+
+    push() only records the latest raw bid/ask per symbol (a 0 side keeps the
+    previous pending value, as spot events may carry one side only) and
+    schedules a single drain on the next reactor turn. drain() hands the
+    whole batch {symbolId: (raw_bid, raw_ask)} to `apply`, so price scaling,
+    PnL and render requests run once per symbol per turn instead of once per
+    tick.
+    """
+
+    def __init__(self, *, reactor, apply: Callable[[Dict[int, Tuple[int, int]]], None]):
+        self.reactor = reactor
+        self.apply = apply
+        self._pending: Dict[int, RawQuote] = {}
+        self._scheduled = False
+
+        # counters
+        self.received: Dict[int, int] = defaultdict(int)
+        self.applied: Dict[int, int] = defaultdict(int)
+        self.received_total = 0
+        self.applied_total = 0
+
+    def push(self, symbol_id: int, raw_bid: int, raw_ask: int) -> None:
+        self.received[symbol_id] += 1
+        self.received_total += 1
+        pending = self._pending.get(symbol_id)
+        if pending is None:
+            self._pending[symbol_id] = [raw_bid, raw_ask]
+        else:
+            if raw_bid:
+                pending[0] = raw_bid
+            if raw_ask:
+                pending[1] = raw_ask
+        if not self._scheduled:
+            self._scheduled = True
+            self.reactor.callLater(0, self.drain)
+
+    def drain(self) -> None:
+        self._scheduled = False
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, {}
+        for symbol_id in batch:
+            self.applied[symbol_id] += 1
+        self.applied_total += len(batch)
+        self.apply({sid: (q[0], q[1]) for sid, q in batch.items()})
+
+    def stats(self) -> Dict[int, Tuple[int, int]]:
+        """symbolId -> (received, applied)."""
+        return {sid: (n, self.applied.get(sid, 0)) for sid, n in self.received.items()}
@@ -0,0 +1,113 @@
+# tick_decoder.py
+from typing import Tuple
+
+import numpy as np
+from ctrader_open_api.messages.OpenApiMessages_pb2 import ProtoOAGetTickDataRes
+
+PRICE_SCALE_DIGITS = 5   # raw cTrader prices are in 1/100000 of a unit
+
+# wire tags (field_number << 3 | wire_type)
+_TAG_TICK_DATA = (3 << 3) | 2     # ProtoOAGetTickDataRes.tickData, length-delimited
+_TAG_HAS_MORE = (4 << 3) | 0      # ProtoOAGetTickDataRes.hasMore
+_TAG_TIMESTAMP = (1 << 3) | 0     # ProtoOATickData.timestamp
+_TAG_TICK = (2 << 3) | 0          # ProtoOATickData.tick
+_TOKENS_PER_TICK = 6              # tag, len, tag, timestamp, tag, tick
+
+TickArrays = Tuple[np.ndarray, np.ndarray, bool]   # (timestamps_ms int64, prices float64, hasMore)
+
+
+def decode_raw(ts_delta: np.ndarray, px_delta: np.ndarray, chronological: bool = True) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Undo the delta encoding: element 0 is absolute, every following element is
+    relative to its predecessor, so a cumulative sum restores absolute values.
+    Returns int64 (timestamp_ms, raw_price); oldest first unless chronological=False.
+    """
+    ts = np.cumsum(ts_delta, dtype=np.int64)
+    px = np.cumsum(px_delta, dtype=np.int64)
+    if chronological:
+        ts = ts[::-1]
+        px = px[::-1]
+    return ts, px
+
+
+def tick_columns(res) -> Tuple[np.ndarray, np.ndarray]:
+    """Raw delta-encoded (timestamp, tick) columns of a parsed ProtoOAGetTickDataRes, newest first."""
+    ticks = res.tickData
+    n = len(ticks)
+    ts = np.fromiter((t.timestamp for t in ticks), dtype=np.int64, count=n)
+    px = np.fromiter((t.tick for t in ticks), dtype=np.int64, count=n)
+    return ts, px
+
+
+def decode_tick_data(res, digits: int = PRICE_SCALE_DIGITS, chronological: bool = True) -> TickArrays:
+    """Parsed ProtoOAGetTickDataRes -> (timestamps_ms, prices, hasMore); oldest first by default."""
+    ts, px = decode_raw(*tick_columns(res), chronological=chronological)
+    return ts, px / (10.0 ** digits), bool(res.hasMore)
+
+
+def varint_tokens(buf: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Decode a buffer that is nothing but back-to-back varints.
+    Returns (int64 values, index of each varint's last byte).
+    """
+    ends = np.flatnonzero(buf < 0x80)
+    starts = np.empty_like(ends)
+    starts[0] = 0
+    starts[1:] = ends[:-1] + 1
+    lens = ends - starts + 1
+    values = (buf[starts] & 0x7F).astype(np.uint64)
+    for j in range(1, int(lens.max())):
+        sel = np.flatnonzero(lens > j)
+        values[sel] |= (buf[starts[sel] + j] & 0x7F).astype(np.uint64) << np.uint64(7 * j)
+    return values.view(np.int64), ends
+
+
+def _tick_tokens(payload: bytes):
+    """
+    Locate the tickData block in the varint token stream of a serialized
+    ProtoOAGetTickDataRes. Returns (ts_delta, px_delta, hasMore), or None when
+    the layout is not the plain field-ordered one (caller falls back to parsing).
+    """
+    buf = np.frombuffer(payload, dtype=np.uint8)
+    if not len(buf) or buf[-1] >= 0x80:
+        return None
+    tok, _ = varint_tokens(buf)
+
+    # header: scalar fields before the first tickData entry (or the trailing hasMore of an empty page)
+    i, n_tok = 0, len(tok)
+    while i < n_tok and tok[i] != _TAG_TICK_DATA and tok[i] != _TAG_HAS_MORE:
+        if tok[i] & 7 != 0:
+            return None
+        i += 2
+
+    has_more = False
+    end = n_tok
+    if end - i >= 2 and tok[end - 2] == _TAG_HAS_MORE:
+        has_more = bool(tok[end - 1])
+        end -= 2
+    if i > end or (end - i) % _TOKENS_PER_TICK:
+        return None
+
+    block = tok[i:end].reshape(-1, _TOKENS_PER_TICK)
+    if not (np.all(block[:, 0] == _TAG_TICK_DATA) and np.all(block[:, 2] == _TAG_TIMESTAMP)
+            and np.all(block[:, 4] == _TAG_TICK)):
+        return None
+    return block[:, 3], block[:, 5], has_more
+
+
+def decode_tick_payload(payload: bytes, digits: int = PRICE_SCALE_DIGITS, chronological: bool = True) -> TickArrays:
+    """
+    Serialized ProtoOAGetTickDataRes (ProtoMessage.payload) -> (timestamps_ms, prices, hasMore).
+
+    The message body is a pure varint stream, so it is decoded straight from
+    the bytes with NumPy instead of materializing one protobuf object per
+    tick; unusual layouts fall back to ParseFromString + decode_tick_data.
+    """
+    found = _tick_tokens(payload) if payload else None
+    if found is None:
+        res = ProtoOAGetTickDataRes()
+        res.ParseFromString(payload)
+        return decode_tick_data(res, digits, chronological)
+    ts_delta, px_delta, has_more = found
+    ts, px = decode_raw(ts_delta, px_delta, chronological)
+    return ts, px / (10.0 ** digits), has_more
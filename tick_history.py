@@ -0,0 +1,283 @@
+# tick_history.py
+import json
+import os
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from twisted.internet import defer
+from twisted.python.failure import Failure
+from ctrader_open_api.messages.OpenApiMessages_pb2 import ProtoOAGetTickDataRes
+
+from tick_decoder import decode_tick_payload
+
+TICK_HISTORY_DIR = os.getenv("TICK_HISTORY_DIR", os.path.join("data", "ticks"))
+WINDOW_MS = 6 * 3600 * 1000     # download grid; a window is the unit of resume
+MAX_IN_FLIGHT = 4               # windows downloading at once (the HISTORICAL bucket paces the requests)
+MAX_RETRIES = 2
+MANIFEST = "manifest.json"
+
+
+def _window_name(start: int, end: int) -> str:
+    return f"{start}-{end}"
+
+
+def _drop_repeats(ts: np.ndarray, px: np.ndarray, newer_ts: np.ndarray, newer_px: np.ndarray):
+    """
+    Join an older page onto the newer one already kept: the older page was
+    requested up to the newer page's oldest millisecond, so ticks at that
+    millisecond already kept (same timestamp and price) are dropped.
+    """
+    if not len(ts) or not len(newer_ts):
+        return ts, px
+    boundary = newer_ts[0]
+    repeat = (ts == boundary) & np.isin(px, newer_px[newer_ts == boundary])
+    if not repeat.any():
+        return ts, px
+    return ts[~repeat], px[~repeat]
+
+
+class TickHistoryDownloader:
+    """
+    Downloads a (symbol, BID/ASK) tick range into columnar files under `root`.
+
+    The range is cut into windows aligned to a fixed WINDOW_MS grid, so a
+    later call over an overlapping range finds the same windows again. A
+    window is paged newest to oldest: while a response says hasMore, the
+    next request ends at the oldest timestamp received, so ticks sharing that
+    millisecond are not lost across pages; the ones fetched twice are dropped
+    on (timestamp, price) where the pages join.
+
+    Up to `max_in_flight` windows run at once; the request rate itself is
+    left to the outbound scheduler's historical budget. A finished window is
+    written as two .npy columns (int64 timestamps in ms, float64 prices,
+    oldest first) and recorded in the directory's manifest.json; windows
+    already in the manifest are skipped, which is what makes a re-run resume.
+    """
+
+    def __init__(
+        self,
+        *,
+        request_ticks: Callable[[int, str, int, int], defer.Deferred],  # (symbolId, "BID"/"ASK", from_ms, to_ms)
+        pips_for: Callable[[int], int] = lambda sid: 5,
+        root: str = TICK_HISTORY_DIR,
+        window_ms: int = WINDOW_MS,
+        max_in_flight: int = MAX_IN_FLIGHT,
+        max_retries: int = MAX_RETRIES,
+        on_progress: Callable[[str], None] = lambda line: None,
+    ):
+        self.request_ticks = request_ticks
+        self.pips_for = pips_for
+        self.root = root
+        self.window_ms = int(window_ms)
+        self.max_in_flight = max(1, int(max_in_flight))
+        self.max_retries = max_retries
+        self.on_progress = on_progress
+
+        # counters
+        self.requests = 0
+        self.pages = 0
+        self.ticks = 0
+        self.windows_done = 0
+        self.windows_skipped = 0
+        self.failures = 0
+
+    # ---------------- layout ----------------
+
+    def directory(self, symbol_id: int, quote_type: str) -> str:
+        return os.path.join(self.root, f"{int(symbol_id)}_{quote_type.upper()}")
+
+    def manifest(self, symbol_id: int, quote_type: str) -> dict:
+        path = os.path.join(self.directory(symbol_id, quote_type), MANIFEST)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {"symbolId": int(symbol_id), "quoteType": quote_type.upper(), "windows": {}}
+
+    def _save_manifest(self, directory: str, manifest: dict) -> None:
+        tmp = os.path.join(directory, MANIFEST + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=1, sort_keys=True)
+        os.replace(tmp, os.path.join(directory, MANIFEST))
+
+    def windows(self, from_ms: int, to_ms: int) -> List[Tuple[int, int, int]]:
+        """(grid start, from_ms, to_ms) per grid cell overlapping [from_ms, to_ms]."""
+        w = self.window_ms
+        out = []
+        cell = (int(from_ms) // w) * w
+        while cell <= to_ms:
+            out.append((cell, max(cell, int(from_ms)), min(cell + w - 1, int(to_ms))))
+            cell += w
+        return out
+
+    # ---------------- download ----------------
+
+    def download(self, symbol_id: int, quote_type: str, from_ms: int, to_ms: int) -> defer.Deferred:
+        """Fires with a summary dict once every window is stored or has given up."""
+        symbol_id, quote_type = int(symbol_id), quote_type.upper()
+        directory = self.directory(symbol_id, quote_type)
+        os.makedirs(directory, exist_ok=True)
+        manifest = self.manifest(symbol_id, quote_type)
+        manifest["digits"] = self.pips_for(symbol_id)
+        stored = manifest["windows"]
+
+        todo = []
+        skipped = 0
+        for cell, lo, hi in self.windows(from_ms, to_ms):
+            have = stored.get(str(cell))
+            if have and have["from"] <= lo and have["to"] >= hi:
+                skipped += 1
+                continue
+            if have:   # widen to keep one contiguous file per cell
+                lo, hi = min(lo, have["from"]), max(hi, have["to"])
+            todo.append((cell, lo, hi))
+        self.windows_skipped += skipped
+
+        job = {
+            "symbolId": symbol_id, "quoteType": quote_type, "directory": directory,
+            "manifest": manifest, "todo": todo, "total": len(todo), "active": 0,
+            "done": 0, "failed": 0, "ticks": 0, "skipped": skipped,
+            "started": time.monotonic(), "deferred": defer.Deferred(),
+        }
+        self.on_progress(f"⬇️ {symbol_id} {quote_type}: {len(todo)} windows to fetch, {skipped} already on disk")
+        self._pump(job)
+        return job["deferred"]
+
+    def _pump(self, job: dict) -> None:
+        while job["todo"] and job["active"] < self.max_in_flight:
+            cell, lo, hi = job["todo"].pop(0)
+            job["active"] += 1
+            self._fetch_page(job, {"cell": cell, "from": lo, "to": hi, "pages": [], "retries": 0}, hi)
+        if not job["todo"] and not job["active"] and not job["deferred"].called:
+            job["deferred"].callback(self._summary(job))
+
+    def _fetch_page(self, job: dict, window: dict, to_ms: int) -> None:
+        self.requests += 1
+        d = self.request_ticks(job["symbolId"], job["quoteType"], window["from"], to_ms)
+        d.addCallbacks(self._on_page, self._on_page_failed,
+                       callbackArgs=(job, window, to_ms), errbackArgs=(job, window, to_ms))
+
+    def _on_page(self, message, job: dict, window: dict, to_ms: int) -> None:
+        if getattr(message, "payloadType", None) != ProtoOAGetTickDataRes().payloadType:
+            return self._on_page_failed(message, job, window, to_ms)   # error response for our clientMsgId
+        try:
+            ts, px, has_more = decode_tick_payload(message.payload, self.pips_for(job["symbolId"]))
+        except Exception as exc:
+            return self._fail_window(job, window, f"undecodable page: {exc}")
+        self.pages += 1
+        oldest = int(ts[0]) if len(ts) else None
+        spans_ms = oldest is not None and ts[-1] > oldest
+        if window["pages"]:
+            ts, px = _drop_repeats(ts, px, *window["pages"][-1])
+        if len(ts):
+            window["pages"].append((ts, px))
+        if has_more and oldest is not None:
+            # a whole page inside one millisecond: step past it rather than loop
+            return self._fetch_page(job, window, oldest if spans_ms else oldest - 1)
+        self._store(job, window)
+
+    def _on_page_failed(self, reason, job: dict, window: dict, to_ms: int) -> None:
+        # error response or timeout: retry the same page, then give the window up;
+        # a request dropped from the outbound queue (disconnect) is not retried
+        cancelled = isinstance(reason, Failure) and reason.check(defer.CancelledError)
+        if window["retries"] < self.max_retries and not cancelled:
+            window["retries"] += 1
+            return self._fetch_page(job, window, to_ms)
+        self._fail_window(job, window)
+
+    def _fail_window(self, job: dict, window: dict, why: str = "") -> None:
+        self.failures += 1
+        job["failed"] += 1
+        job["active"] -= 1
+        why = f" ({why})" if why else ""
+        self.on_progress(f"❌ {job['symbolId']} {job['quoteType']}: window {_window_name(window['from'], window['to'])} failed{why}")
+        self._pump(job)
+
+    def _store(self, job: dict, window: dict) -> None:
+        pages = window.pop("pages")[::-1]    # pages arrive newest first, each oldest first inside
+        ts = np.concatenate([p[0] for p in pages]) if pages else np.empty(0, dtype=np.int64)
+        px = np.concatenate([p[1] for p in pages]) if pages else np.empty(0, dtype=np.float64)
+
+        directory, manifest = job["directory"], job["manifest"]
+        name = _window_name(window["from"], window["to"])
+        old = manifest["windows"].get(str(window["cell"]))
+        try:
+            np.save(os.path.join(directory, name + ".ts.npy"), ts)
+            np.save(os.path.join(directory, name + ".px.npy"), px)
+            manifest["windows"][str(window["cell"])] = {
+                "from": window["from"], "to": window["to"], "file": name, "count": int(len(ts)),
+            }
+            self._save_manifest(directory, manifest)
+        except Exception as exc:
+            # restore the manifest entry; the window stays missing and a re-run fetches it again
+            if old:
+                manifest["windows"][str(window["cell"])] = old
+            else:
+                manifest["windows"].pop(str(window["cell"]), None)
+            return self._fail_window(job, window, f"write failed: {exc}")
+        if old and old["file"] != name:
+            for suffix in (".ts.npy", ".px.npy"):
+                try:
+                    os.remove(os.path.join(directory, old["file"] + suffix))
+                except OSError:
+                    pass
+
+        self.ticks += len(ts)
+        self.windows_done += 1
+        job["ticks"] += len(ts)
+        job["done"] += 1
+        job["active"] -= 1
+        self.on_progress(f"   {job['symbolId']} {job['quoteType']}: {job['done'] + job['failed']}/{job['total']} windows, "
+                         f"{job['ticks']} ticks")
+        self._pump(job)
+
+    def _summary(self, job: dict) -> Dict[str, object]:
+        return {
+            "symbolId": job["symbolId"],
+            "quoteType": job["quoteType"],
+            "directory": job["directory"],
+            "windows": job["done"],
+            "skipped": job["skipped"],
+            "failed": job["failed"],
+            "ticks": job["ticks"],
+            "seconds": time.monotonic() - job["started"],
+        }
+
+    # ---------------- reading back ----------------
+
+    def load(self, symbol_id: int, quote_type: str, from_ms: Optional[int] = None,
+             to_ms: Optional[int] = None, mmap: bool = True) -> Tuple[np.ndarray, np.ndarray]:
+        """Stored ticks in [from_ms, to_ms] as (timestamps_ms, prices), oldest first."""
+        directory = self.directory(symbol_id, quote_type)
+        entries = sorted(self.manifest(symbol_id, quote_type)["windows"].values(), key=lambda e: e["from"])
+        mode = "r" if mmap else None
+        cols_ts, cols_px = [], []
+        for e in entries:
+            if (to_ms is not None and e["from"] > to_ms) or (from_ms is not None and e["to"] < from_ms):
+                continue
+            ts = np.load(os.path.join(directory, e["file"] + ".ts.npy"), mmap_mode=mode)
+            px = np.load(os.path.join(directory, e["file"] + ".px.npy"), mmap_mode=mode)
+            lo = 0 if from_ms is None else int(np.searchsorted(ts, from_ms, "left"))
+            hi = len(ts) if to_ms is None else int(np.searchsorted(ts, to_ms, "right"))
+            cols_ts.append(ts[lo:hi])
+            cols_px.append(px[lo:hi])
+        if not cols_ts:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+        return np.concatenate(cols_ts), np.concatenate(cols_px)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "requests": self.requests,
+            "pages": self.pages,
+            "ticks": self.ticks,
+            "windows_done": self.windows_done,
+            "windows_skipped": self.windows_skipped,
+            "failures": self.failures,
+        }
+
+
+def quote_types(choice: str) -> Iterable[str]:
+    """Menu input -> quote types to download (BOTH means BID and ASK)."""
+    choice = choice.strip().upper()
+    return ("BID", "ASK") if choice == "BOTH" else (choice,)
@@ -0,0 +1,105 @@
+# trendbar_decoder.py
+import numpy as np
+from ctrader_open_api.messages.OpenApiMessages_pb2 import ProtoOAGetTrendbarsRes
+
+from tick_decoder import PRICE_SCALE_DIGITS, varint_tokens
+
+MINUTE_MS = 60_000
+
+BAR_DTYPE = np.dtype([
+    ("ts", "<i8"),          # bar open, ms since epoch (UTC)
+    ("open", "<f8"), ("high", "<f8"), ("low", "<f8"), ("close", "<f8"),
+    ("volume", "<i8"),
+])
+
+# wire tags (field_number << 3 | wire_type)
+_TAG_TRENDBAR = (5 << 3) | 2      # ProtoOAGetTrendbarsRes.trendbar, length-delimited
+_TAG_VOLUME = (3 << 3) | 0        # ProtoOATrendbar fields, all varints
+_TAG_LOW = (5 << 3) | 0
+_TAG_DELTA_OPEN = (6 << 3) | 0
+_TAG_DELTA_CLOSE = (7 << 3) | 0
+_TAG_DELTA_HIGH = (8 << 3) | 0
+_TAG_MINUTES = (9 << 3) | 0
+_BAR_FIELDS = (_TAG_VOLUME, _TAG_LOW, _TAG_DELTA_OPEN, _TAG_DELTA_CLOSE, _TAG_DELTA_HIGH, _TAG_MINUTES)
+
+
+def bars_from_columns(minutes, low, d_open, d_high, d_close, volume, digits: int = PRICE_SCALE_DIGITS) -> np.ndarray:
+    """Raw ProtoOATrendbar columns -> BAR_DTYPE array (prices are low + delta, scaled by 10**digits)."""
+    scale = 10.0 ** digits
+    low = np.asarray(low, dtype=np.int64)
+    out = np.empty(len(low), dtype=BAR_DTYPE)
+    out["ts"] = np.asarray(minutes, dtype=np.int64) * MINUTE_MS
+    out["low"] = low / scale
+    out["open"] = (low + d_open) / scale
+    out["high"] = (low + d_high) / scale
+    out["close"] = (low + d_close) / scale
+    out["volume"] = volume
+    return out
+
+
+def decode_trendbars(res, digits: int = PRICE_SCALE_DIGITS) -> np.ndarray:
+    """Parsed ProtoOAGetTrendbarsRes -> BAR_DTYPE array, in response order."""
+    bars = res.trendbar
+    n = len(bars)
+    col = lambda name: np.fromiter((getattr(b, name) for b in bars), dtype=np.int64, count=n)
+    return bars_from_columns(col("utcTimestampInMinutes"), col("low"), col("deltaOpen"),
+                             col("deltaHigh"), col("deltaClose"), col("volume"), digits)
+
+
+def _bar_columns(payload: bytes):
+    """
+    Raw trendbar columns straight from the varint stream of a serialized
+    ProtoOAGetTrendbarsRes, or None when the body holds anything but varints
+    and trendbar entries (caller falls back to parsing).
+
+    Every field here is a varint, and a trendbar entry's header is a
+    (tag, length) varint pair, so the whole body reads as (tag, value) pairs.
+    Trendbar fields are optional, so instead of a fixed stride each pair is
+    assigned to the entry whose byte span contains it.
+    """
+    buf = np.frombuffer(payload, dtype=np.uint8)
+    if not len(buf) or buf[-1] >= 0x80:
+        return None
+    tok, ends = varint_tokens(buf)
+    if len(tok) % 2:
+        return None
+    tags, values = tok[0::2], tok[1::2]
+    wire = tags & 7
+    if np.any((wire != 0) & (tags != _TAG_TRENDBAR)):
+        return None
+
+    heads = np.flatnonzero(tags == _TAG_TRENDBAR)
+    n = len(heads)
+    body_start = ends[2 * heads + 1] + 1
+    body_end = body_start + values[heads]
+    pair_start = np.empty(len(tags), dtype=np.int64)
+    pair_start[0] = 0
+    pair_start[1:] = ends[1:-1:2] + 1
+
+    bar = np.searchsorted(body_start, pair_start, "right") - 1
+    inner = (bar >= 0) & (wire == 0)
+    inner[inner] = pair_start[inner] < body_end[bar[inner]]
+
+    cols = {}
+    for tag in _BAR_FIELDS:
+        col = np.zeros(n, dtype=np.int64)
+        sel = inner & (tags == tag)
+        col[bar[sel]] = values[sel]
+        cols[tag] = col
+    return cols
+
+
+def decode_trendbar_payload(payload: bytes, digits: int = PRICE_SCALE_DIGITS) -> np.ndarray:
+    """
+    Serialized ProtoOAGetTrendbarsRes (ProtoMessage.payload) -> BAR_DTYPE array.
+
+    Decoded from the bytes with NumPy, one pass over the whole response;
+    unusual layouts fall back to ParseFromString + decode_trendbars.
+    """
+    cols = _bar_columns(payload) if payload else None
+    if cols is None:
+        res = ProtoOAGetTrendbarsRes()
+        res.ParseFromString(payload)
+        return decode_trendbars(res, digits)
+    return bars_from_columns(cols[_TAG_MINUTES], cols[_TAG_LOW], cols[_TAG_DELTA_OPEN],
+                             cols[_TAG_DELTA_HIGH], cols[_TAG_DELTA_CLOSE], cols[_TAG_VOLUME], digits)
@@ -0,0 +1,218 @@
+# trendbar_store.py
+import json
+import os
+import time
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+from twisted.internet import defer
+from ctrader_open_api.messages.OpenApiMessages_pb2 import ProtoOAGetTrendbarsRes
+
+from trendbar_decoder import BAR_DTYPE, MINUTE_MS, decode_trendbar_payload
+
+TRENDBAR_DIR = os.getenv("TRENDBAR_DIR", os.path.join("data", "trendbars"))
+
+# bar length per period name; W1/MN1 are upper bounds (only used to hold back the forming bar)
+PERIOD_MS = {
+    "M1": 1, "M2": 2, "M3": 3, "M4": 4, "M5": 5, "M10": 10, "M15": 15, "M30": 30,
+    "H1": 60, "H4": 240, "H12": 720, "D1": 1440, "W1": 7 * 1440, "MN1": 31 * 1440,
+}
+PERIOD_MS = {k: v * MINUTE_MS for k, v in PERIOD_MS.items()}
+
+# longest from..to span the server accepts in one ProtoOAGetTrendbarsReq
+_DAY_MS = 86_400_000
+MAX_SPAN_MS = {
+    **dict.fromkeys(("M1", "M2", "M3", "M4", "M5"), int(3.5 * _DAY_MS)),
+    **dict.fromkeys(("M10", "M15", "M30", "H1"), 35 * 7 * _DAY_MS),
+    **dict.fromkeys(("H4", "H12", "D1"), 366 * _DAY_MS),
+    **dict.fromkeys(("W1", "MN1"), 5 * 366 * _DAY_MS),
+}
+
+Range = Tuple[int, int]   # inclusive [from_ms, to_ms]
+
+
+def merge_ranges(ranges: List[Range]) -> List[Range]:
+    """Sort and coalesce overlapping or touching inclusive ranges."""
+    out: List[Range] = []
+    for lo, hi in sorted(ranges):
+        if out and lo <= out[-1][1] + 1:
+            if hi > out[-1][1]:
+                out[-1] = (out[-1][0], hi)
+        else:
+            out.append((lo, hi))
+    return out
+
+
+def missing_ranges(covered: List[Range], lo: int, hi: int) -> List[Range]:
+    """Parts of [lo, hi] not inside any of the (merged) covered ranges."""
+    gaps = []
+    cursor = lo
+    for c_lo, c_hi in covered:
+        if c_hi < cursor:
+            continue
+        if c_lo > hi:
+            break
+        if c_lo > cursor:
+            gaps.append((cursor, c_lo - 1))
+        cursor = max(cursor, c_hi + 1)
+        if cursor > hi:
+            break
+    if cursor <= hi:
+        gaps.append((cursor, hi))
+    return gaps
+
+
+class TrendbarStore:
+    """
+    Local OHLCV bars per (symbol, period), filled incrementally from the server.
+
+    Every key keeps a bars.npy (BAR_DTYPE, sorted by ts, unique) plus a
+    meta.json listing the time ranges that have been fetched completely.
+    get() computes the parts of the requested range that are not covered,
+    fetches only those (split at the server's per-request span limit; the
+    outbound scheduler paces them), merges the new bars and answers from
+    the stored array. A range is only marked covered up to the last closed
+    bar, so the forming bar is fetched again next time. Loaded keys stay in
+    memory; a fully covered query never touches the network.
+    """
+
+    def __init__(
+        self,
+        *,
+        request_bars: Callable[[int, str, int, int], defer.Deferred],   # (symbolId, period, from_ms, to_ms)
+        pips_for: Callable[[int], int] = lambda sid: 5,
+        root: str = TRENDBAR_DIR,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.request_bars = request_bars
+        self.pips_for = pips_for
+        self.root = root
+        self.clock = clock
+
+        self._bars: Dict[Tuple[int, str], np.ndarray] = {}
+        self._covered: Dict[Tuple[int, str], List[Range]] = {}
+        self._locks: Dict[Tuple[int, str], defer.DeferredLock] = {}
+
+        # counters
+        self.queries = 0
+        self.disk_hits = 0         # queries answered without a request
+        self.requests = 0
+        self.bars_fetched = 0
+        self.failures = 0
+
+    # ---------------- storage ----------------
+
+    def directory(self, symbol_id: int, period: str) -> str:
+        return os.path.join(self.root, f"{int(symbol_id)}_{period}")
+
+    def _load(self, key: Tuple[int, str]) -> None:
+        if key in self._bars:
+            return
+        directory = self.directory(*key)
+        try:
+            self._bars[key] = np.load(os.path.join(directory, "bars.npy"))
+            with open(os.path.join(directory, "meta.json"), "r", encoding="utf-8") as f:
+                self._covered[key] = merge_ranges([tuple(r) for r in json.load(f)["covered"]])
+        except (OSError, ValueError, KeyError):
+            self._bars[key] = np.empty(0, dtype=BAR_DTYPE)
+            self._covered[key] = []
+
+    def _save(self, key: Tuple[int, str]) -> None:
+        directory = self.directory(*key)
+        os.makedirs(directory, exist_ok=True)
+        tmp = os.path.join(directory, "bars.tmp.npy")
+        np.save(tmp, self._bars[key])
+        os.replace(tmp, os.path.join(directory, "bars.npy"))
+        meta = {"symbolId": key[0], "period": key[1], "covered": [list(r) for r in self._covered[key]]}
+        tmp = os.path.join(directory, "meta.json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp, os.path.join(directory, "meta.json"))
+
+    def _merge(self, key: Tuple[int, str], bars: np.ndarray) -> None:
+        if not len(bars):
+            return
+        both = np.concatenate([self._bars[key], bars])
+        # stable sort + keep the last occurrence: freshly fetched bars replace stored ones
+        order = np.argsort(both["ts"], kind="stable")
+        both = both[order]
+        last = np.ones(len(both), dtype=bool)
+        last[:-1] = both["ts"][1:] != both["ts"][:-1]
+        self._bars[key] = both[last]
+
+    # ---------------- queries ----------------
+
+    def covered(self, symbol_id: int, period: str) -> List[Range]:
+        key = (int(symbol_id), period.upper())
+        self._load(key)
+        return list(self._covered[key])
+
+    def read(self, symbol_id: int, period: str, from_ms: int, to_ms: int) -> np.ndarray:
+        """Stored bars opening in [from_ms, to_ms] (no network)."""
+        key = (int(symbol_id), period.upper())
+        self._load(key)
+        bars = self._bars[key]
+        ts = bars["ts"]
+        return bars[np.searchsorted(ts, from_ms, "left"):np.searchsorted(ts, to_ms, "right")]
+
+    def get(self, symbol_id: int, period: str, from_ms: int, to_ms: int) -> defer.Deferred:
+        """Fires with (bars, info) once the missing parts of the range are fetched and stored."""
+        key = (int(symbol_id), period.upper())
+        if key[1] not in PERIOD_MS:
+            return defer.fail(ValueError(f"unknown trendbar period {period!r}"))
+        lock = self._locks.setdefault(key, defer.DeferredLock())
+        return lock.run(self._get, key, int(from_ms), int(to_ms))
+
+    def _get(self, key: Tuple[int, str], from_ms: int, to_ms: int) -> defer.Deferred:
+        self.queries += 1
+        t0 = time.perf_counter()
+        self._load(key)
+        gaps = missing_ranges(self._covered[key], from_ms, to_ms)
+        if not gaps:
+            self.disk_hits += 1
+            return defer.succeed((self.read(*key, from_ms, to_ms),
+                                  {"requests": 0, "fetched": 0, "failed": 0, "seconds": time.perf_counter() - t0}))
+
+        span = MAX_SPAN_MS[key[1]]
+        chunks = [(lo, min(hi, lo + span - 1)) for g_lo, hi in gaps for lo in range(g_lo, hi + 1, span)]
+        closed_until = int(self.clock() * 1000) // PERIOD_MS[key[1]] * PERIOD_MS[key[1]] - 1
+        digits = self.pips_for(key[0])
+
+        results = []
+        for lo, hi in chunks:
+            self.requests += 1
+            d = self.request_bars(key[0], key[1], lo, hi)
+            d.addCallback(self._on_chunk, key, lo, hi, digits, closed_until)
+            results.append(d)
+
+        def done(outcomes):
+            ok = [r for success, r in outcomes if success and r is not None]
+            failed = len(outcomes) - len(ok)
+            self.failures += failed
+            self._save(key)
+            fetched = sum(ok)
+            return (self.read(*key, from_ms, to_ms),
+                    {"requests": len(chunks), "fetched": fetched, "failed": failed,
+                     "seconds": time.perf_counter() - t0})
+
+        return defer.DeferredList(results, consumeErrors=True).addCallback(done)
+
+    def _on_chunk(self, message, key: Tuple[int, str], lo: int, hi: int, digits: int, closed_until: int):
+        if getattr(message, "payloadType", None) != ProtoOAGetTrendbarsRes().payloadType:
+            return None     # error response for our clientMsgId: the range stays uncovered
+        bars = decode_trendbar_payload(message.payload, digits)
+        self._merge(key, bars)
+        if min(hi, closed_until) >= lo:
+            self._covered[key] = merge_ranges(self._covered[key] + [(lo, min(hi, closed_until))])
+        self.bars_fetched += len(bars)
+        return len(bars)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "keys": len(self._bars),
+            "queries": self.queries,
+            "disk_hits": self.disk_hits,
+            "requests": self.requests,
+            "bars_fetched": self.bars_fetched,
+            "failures": self.failures,
+        }
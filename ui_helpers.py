@@ -1,11 +1,11 @@
 
 # ui_helpers.py
-from typing import Dict, Tuple, List, Optional
-from contextlib import contextmanager
+from typing import Dict, Tuple, List, Optional, Set, Sequence
+from bisect import bisect_left, insort
+from collections.abc import Sequence as _SequenceABC
 from rich.table import Table
 from rich.console import Group
 from rich import box
-import sys, os
 import datetime as dt
 from rich.text import Text
 from rich.markup import escape
@@ -25,9 +25,14 @@ HEADER   = "#1f2937"
 # Wired from main via init_ordering()
 positionsById: Dict[int, object] = {}
 positionPnLById: Dict[int, float] = {}
-
-# Cached sort
-_positions_sorted_cache: List[Tuple[int, object]] = []
+symbolIdToName: Dict[int, str] = {}
+
+# Incremental sort: bisect-ordered keys (each ends with positionId) + current key per position
+SORT_KEYS = ("pnl", "symbol", "held", "size")
+SORT_LABELS = {"pnl": "PnL", "symbol": "Symbol", "held": "Held", "size": "Size"}
+_sort_key_name: str = "pnl"
+_sorted_keys: List[tuple] = []
+_key_by_id: Dict[int, tuple] = {}
 _positions_sorted_dirty: bool = True
 
 _TRADE_SIDE = {1: "BUY", 2: "SELL"}
@@ -137,31 +142,190 @@ def fmt_price(px: Optional[float], symbol_id: int, details: Dict[int, dict], wid
     return (sign + s)[:width]
 
 
-def init_ordering(positions_ref: Dict[int, object], pnl_ref: Dict[int, float]) -> None:
-    global positionsById, positionPnLById
+def init_ordering(
+    positions_ref: Dict[int, object],
+    pnl_ref: Dict[int, float],
+    names_ref: Optional[Dict[int, str]] = None,
+) -> None:
+    global positionsById, positionPnLById, symbolIdToName
     positionsById = positions_ref
     positionPnLById = pnl_ref
+    if names_ref is not None:
+        symbolIdToName = names_ref
+    mark_positions_dirty()
+
+# symbolId -> set(positionId), owned by main and kept in sync on add/remove/reconcile
+def index_position(index: Dict[int, Set[int]], pos_id: int, symbol_id: int) -> None:
+    index.setdefault(symbol_id, set()).add(pos_id)
+
+def unindex_position(index: Dict[int, Set[int]], pos_id: int, symbol_id: int) -> bool:
+    """Drop a position from its symbol bucket. Returns True if the symbol has no positions left."""
+    ids = index.get(symbol_id)
+    if ids is None:
+        return True
+    ids.discard(pos_id)
+    if ids:
+        return False
+    del index[symbol_id]
+    return True
+
+def _sort_key(pos_id: int, pos) -> tuple:
+    if _sort_key_name == "symbol":
+        sid = pos.symbolId
+        return (symbolIdToName.get(sid, f"ID:{sid}"), pos_id)
+    if _sort_key_name == "held":
+        return (pos.openTimestamp, pos_id)   # oldest (longest held) first
+    if _sort_key_name == "size":
+        return (-pos.volume, pos_id)
+    return (-(positionPnLById.get(pos_id) or 0.0), pos_id)  # best PnL first
+
+def set_sort_key(name: str) -> None:
+    global _sort_key_name
+    if name not in SORT_KEYS:
+        raise ValueError(f"unknown sort key: {name}")
+    if name != _sort_key_name:
+        _sort_key_name = name
+        mark_positions_dirty()
+
+def cycle_sort_key() -> str:
+    set_sort_key(SORT_KEYS[(SORT_KEYS.index(_sort_key_name) + 1) % len(SORT_KEYS)])
+    return _sort_key_name
+
+def sort_key_label() -> str:
+    return SORT_LABELS[_sort_key_name]
 
 def mark_positions_dirty() -> None:
+    """Force a full re-sort on next access (reconcile, sort key change)."""
     global _positions_sorted_dirty
     _positions_sorted_dirty = True
 
+class PortfolioTotals:
+    """Running portfolio aggregates (all positions, not just the visible rows), O(1) per update."""
+
+    __slots__ = ("pnl", "count", "exposure", "symbol_pnl", "symbol_count", "_contrib")
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        self.pnl = 0.0
+        self.count = 0
+        self.exposure: Dict[str, float] = {"BUY": 0.0, "SELL": 0.0}   # lots per side
+        self.symbol_pnl: Dict[int, float] = {}
+        self.symbol_count: Dict[int, int] = {}
+        self._contrib: Dict[int, Tuple[int, str, float, float]] = {}  # pid -> (symbol, side, lots, pnl)
+
+    def set(self, pos_id: int, symbol_id: int, side: str, lots: float, pnl: float) -> None:
+        self.remove(pos_id)
+        self._contrib[pos_id] = (symbol_id, side, lots, pnl)
+        self.pnl += pnl
+        self.count += 1
+        self.exposure[side] = self.exposure.get(side, 0.0) + lots
+        self.symbol_pnl[symbol_id] = self.symbol_pnl.get(symbol_id, 0.0) + pnl
+        self.symbol_count[symbol_id] = self.symbol_count.get(symbol_id, 0) + 1
+
+    def remove(self, pos_id: int) -> None:
+        old = self._contrib.pop(pos_id, None)
+        if old is None:
+            return
+        symbol_id, side, lots, pnl = old
+        self.pnl -= pnl
+        self.count -= 1
+        self.exposure[side] -= lots
+        left = self.symbol_count[symbol_id] - 1
+        if left:
+            self.symbol_count[symbol_id] = left
+            self.symbol_pnl[symbol_id] -= pnl
+        else:
+            del self.symbol_count[symbol_id]
+            del self.symbol_pnl[symbol_id]
+
+    def set_position(self, pos_id: int, pos, pnl: Optional[float]) -> None:
+        self.set(pos_id, pos.symbolId, trade_side_name(pos.tradeSide), volume_to_lots(pos.volume), pnl or 0.0)
+
+    def rebuild(self, positions: Dict[int, object], pnl_map: Dict[int, float]) -> None:
+        """Recompute from scratch (full re-sort only); also resets float drift."""
+        self.reset()
+        for pid, pos in positions.items():
+            self.set_position(pid, pos, pnl_map.get(pid))
+
+portfolio_totals = PortfolioTotals()
+
+def update_position(pos_id: int) -> None:
+    """Reposition one position after its PnL (or data) changed: O(log n) search + list shift."""
+    pos = positionsById.get(pos_id)
+    if pos is None:
+        discard_position(pos_id)
+        return
+    portfolio_totals.set_position(pos_id, pos, positionPnLById.get(pos_id))
+    if _positions_sorted_dirty:
+        return  # full rebuild pending, it will pick this up
+    new_key = _sort_key(pos_id, pos)
+    old_key = _key_by_id.get(pos_id)
+    if old_key == new_key:
+        return
+    if old_key is not None:
+        del _sorted_keys[bisect_left(_sorted_keys, old_key)]
+    insort(_sorted_keys, new_key)
+    _key_by_id[pos_id] = new_key
+
+def discard_position(pos_id: int) -> None:
+    forget_row(pos_id)
+    portfolio_totals.remove(pos_id)
+    if _positions_sorted_dirty:
+        return
+    old_key = _key_by_id.pop(pos_id, None)
+    if old_key is not None:
+        del _sorted_keys[bisect_left(_sorted_keys, old_key)]
+
 def _rebuild_sorted_cache() -> None:
-    global _positions_sorted_cache, _positions_sorted_dirty
-    _positions_sorted_cache = sorted(
-        positionsById.items(),
-        key=lambda item: positionPnLById.get(item[0], 0.0),
-        reverse=True,
-    )
+    global _sorted_keys, _key_by_id, _positions_sorted_dirty
+    _key_by_id = {pid: _sort_key(pid, pos) for pid, pos in positionsById.items()}
+    _sorted_keys = sorted(_key_by_id.values())
+    portfolio_totals.rebuild(positionsById, positionPnLById)
+    for pid in [pid for pid in _row_cache if pid not in positionsById]:
+        del _row_cache[pid]
     _positions_sorted_dirty = False
 
-def ordered_positions() -> List[Tuple[int, object]]:
+
+class _OrderedPositionsView(_SequenceABC):
+    """Read-only (positionId, position) view over the sorted keys; slicing only touches the slice."""
+
+    __slots__ = ()
+
+    def __len__(self) -> int:
+        return len(_sorted_keys)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [(k[-1], positionsById[k[-1]]) for k in _sorted_keys[i]]
+        pid = _sorted_keys[i][-1]
+        return pid, positionsById[pid]
+
+_ordered_view = _OrderedPositionsView()
+
+def ordered_positions() -> Sequence[Tuple[int, object]]:
     if _positions_sorted_dirty:
         _rebuild_sorted_cache()
-    return _positions_sorted_cache
+    return _ordered_view
+
+def positions_snapshot() -> Tuple[Tuple[int, object], ...]:
+    """
+    (positionId, position) tuple for the key-input thread. The reactor edits
+    _sorted_keys in place, so other threads copy it (one step) instead of
+    reading the live view; a pending rebuild is left to the reactor.
+    """
+    keys = _sorted_keys[:]
+    out = []
+    for k in keys:
+        pos = positionsById.get(k[-1])
+        if pos is not None:
+            out.append((k[-1], pos))
+    return tuple(out)
 
 def safe_current_selection(selected_index: int) -> Optional[Tuple[int, object]]:
-    ops = ordered_positions()
+    """Selected (positionId, position), read from a snapshot (called from the key-input thread)."""
+    ops = positions_snapshot()
     if not ops:
         return None
     i = max(0, min(selected_index, len(ops) - 1))
@@ -185,38 +349,15 @@ def colorize(amount: float) -> str:
         return f"\033[91m${amount:.2f}\033[0m"
     return f"${amount:.2f}"
 
-def format_lots(volume_units: int, with_suffix: bool = True) -> str:
+def volume_to_lots(volume_units: int) -> float:
     # Your app uses centi-lots: 100 units = 1 lot
-    lots = volume_units / 10000000
+    return volume_units / 10000000
+
+def format_lots(volume_units: int, with_suffix: bool = True) -> str:
+    lots = volume_to_lots(volume_units)
     s = f"{lots:,.2f}"
     return f"{s} Lots" if with_suffix else s
 
-@contextmanager
-def suppress_stdout(active: bool, to_file: bool = True, logfile_path: str = "live_pnl_stdout.log"):
-    """
-    Suppress stdout/stderr while the live viewer is active.
-    Use: with H.suppress_stdout(liveViewerActive): ...
-    """
-    if to_file and active:
-        with open(logfile_path, "a") as logfile:
-            old_stdout, old_stderr = sys.stdout, sys.stderr
-            sys.stdout = logfile
-            sys.stderr = logfile
-            try:
-                yield
-            finally:
-                sys.stdout = old_stdout
-                sys.stderr = old_stderr
-    else:
-        with open(os.devnull, "w") as fnull:
-            old_stdout = sys.stdout
-            sys.stdout = fnull
-            try:
-                yield
-            finally:
-                sys.stdout = old_stdout
-
-
 def pnl_heat(pnl: Optional[float]) -> str:
     if pnl is None: return ""
     if pnl > 0:    return "on #061e06"  # a touch darker than before
@@ -260,8 +401,8 @@ def fmt_held_cell(delta: dt.timedelta) -> Text:
 
 def compute_pnl(pos, symbolIdToDetails, symbolIdToPrice, pnl_cache):
     """Return current PnL (float or None) for a position."""
-    side = trade_side_name(pos.tradeData.tradeSide)
-    symbol_id = pos.tradeData.symbolId
+    side = trade_side_name(pos.tradeSide)
+    symbol_id = pos.symbolId
     entry_price = pos.price
     bid, ask = symbolIdToPrice.get(symbol_id, (None, None))
     market_price = ask if side == "BUY" else bid
@@ -272,7 +413,7 @@ def compute_pnl(pos, symbolIdToDetails, symbolIdToPrice, pnl_cache):
     if market_price is None:
         return None
 
-    volume_lots = pos.tradeData.volume / 100.0
+    volume_lots = pos.volume / 100.0
     contract_size = symbolIdToDetails.get(symbol_id, {}).get("contractSize", 100000) or 100000
     delta = (market_price - entry_price) if side == "BUY" else (entry_price - market_price)
     return delta * volume_lots * contract_size
@@ -307,20 +448,59 @@ def choose_row_style(global_idx: int, pnl_val: Optional[float], is_selected: boo
     return f"bold on {SEL_BG}" if is_selected else f"on {row_bg}"
 
 
+# positionId -> (key, (cells, row_style, pnl_val)); a row is rebuilt only when its key changes
+_row_cache: Dict[int, Tuple[tuple, tuple]] = {}
+
+def forget_row(pos_id: int) -> None:
+    _row_cache.pop(pos_id, None)
+
 def make_position_row(
     global_idx, selected_index, posId, pos,
     symbolIdToName, symbolIdToDetails, symbolIdToPrice,
     pnl_cache, slByPositionId, account_currency, now_utc
 ):
-    """Build one table row for a position. Returns (cells, row_style, pnl_val)."""
+    """Build (or reuse) one table row for a position. Returns (cells, row_style, pnl_val)."""
     is_selected = (global_idx == selected_index)
+    symbol_id = pos.symbolId
+    held_min = int((now_utc.timestamp() * 1000 - pos.openTimestamp) // 60000)
+    details = symbolIdToDetails.get(symbol_id) or {}
+    key = (
+        symbolIdToPrice.get(symbol_id),
+        pnl_cache.get(posId),
+        slByPositionId.get(posId) if slByPositionId else None,
+        is_selected,
+        global_idx & 1,          # zebra stripe
+        held_min,
+        account_currency,
+        symbolIdToName.get(symbol_id),
+        details.get("pips"),         # price formatting
+        details.get("contractSize"), # PnL
+        pos.price,
+        pos.volume,
+    )
+    hit = _row_cache.get(posId)
+    if hit is not None and hit[0] == key:
+        return hit[1]
+    row = _build_position_row(
+        global_idx, is_selected, posId, pos,
+        symbolIdToName, symbolIdToDetails, symbolIdToPrice,
+        pnl_cache, slByPositionId, account_currency, now_utc,
+    )
+    _row_cache[posId] = (key, row)
+    return row
+
+def _build_position_row(
+    global_idx, is_selected, posId, pos,
+    symbolIdToName, symbolIdToDetails, symbolIdToPrice,
+    pnl_cache, slByPositionId, account_currency, now_utc
+):
     selector = "▸" if is_selected else ""
 
-    symbol_id = pos.tradeData.symbolId
+    symbol_id = pos.symbolId
     symbol_name = symbolIdToName.get(symbol_id, f"ID:{symbol_id}")
-    side_raw = trade_side_name(pos.tradeData.tradeSide)
+    side_raw = trade_side_name(pos.tradeSide)
 
-    opened_at_utc = dt.datetime.fromtimestamp(pos.tradeData.openTimestamp / 1000, tz=dt.timezone.utc)
+    opened_at_utc = dt.datetime.fromtimestamp(pos.openTimestamp / 1000, tz=dt.timezone.utc)
     held_diff = now_utc - opened_at_utc
 
     pnl_val = compute_pnl(pos, symbolIdToDetails, symbolIdToPrice, pnl_cache)
@@ -339,7 +519,7 @@ def make_position_row(
         white_cell(symbol_name),
         side_cell(side_raw),
         fmt_held_cell(held_diff),
-        white_cell(format_lots(pos.tradeData.volume, with_suffix=False)),
+        white_cell(format_lots(pos.volume, with_suffix=False)),
         entry_cell,
         market_cell,
         fmt_sl(sl_val, account_currency),
@@ -349,6 +529,10 @@ def make_position_row(
 
 
 
+# live viewer lines that are not position rows: panel border 2 + header 1
+# + table chrome 6 (borders, header, TOTAL) + footer 8 (4 status, 4 key help)
+RESERVED_LINES = 17
+
 def clamp_viewport(selected_index: int, view_offset: int, n: int, max_rows: int) -> Tuple[int, int]:
     if n == 0:
         return 0, 0
@@ -408,14 +592,12 @@ def buildLivePnLTable(
 ):
     table = make_live_pnl_table()
     # scroll window
-    RESERVED_LINES = 9
     max_rows = max(1, console_height - RESERVED_LINES)
     n = len(positions_sorted)
 
     selected_index, view_offset = clamp_viewport(selected_index, view_offset, n, max_rows)
 
     visible = positions_sorted[view_offset:view_offset+max_rows]
-    total_pnl = 0.0
     now_utc = dt.datetime.now(dt.timezone.utc)
 
     for global_idx, (posId, pos) in enumerate(visible, start=view_offset):
@@ -426,18 +608,33 @@ def buildLivePnLTable(
                 positionPnLById_map, slByPositionId, account_currency, now_utc
             )
             table.add_row(*cells, style=row_style)
-            if pnl_val is not None:
-                total_pnl += pnl_val
         except Exception as e:
             table.add_row("", str(posId), "[Error]", "", "", "", "", "", "", str(e))
             error_messages.append(str(e))
             if len(error_messages) > 3: error_messages.pop(0)
 
-    add_total_row(table, total_pnl)
+    add_total_row(table, portfolio_totals.pnl)
 
     return table, "\n".join(error_messages[-3:]), selected_index, view_offset
 
 
+def totals_line(positions_sorted, selected_index: int, symbolIdToName: Dict[int, str], account_currency: str) -> str:
+    """Portfolio footer: count, per-side exposure and the selected symbol's subtotal."""
+    t = portfolio_totals
+    sym = money_symbol(account_currency)
+    parts = [
+        f"{t.count} positions",
+        f"[green]BUY {t.exposure.get('BUY', 0.0):,.2f}[/green] / [red]SELL {t.exposure.get('SELL', 0.0):,.2f}[/red] lots",
+    ]
+    if positions_sorted:
+        _, pos = positions_sorted[max(0, min(selected_index, len(positions_sorted) - 1))]
+        sid = pos.symbolId
+        if sid in t.symbol_pnl:
+            name = escape(symbolIdToName.get(sid, f"ID:{sid}"))
+            parts.append(f"{name} ({t.symbol_count[sid]}): {t.symbol_pnl[sid]:,.2f}{sym}")
+    return " · ".join(parts)
+
+
 def buildLivePnLView(
     console_height: int,
     positions_sorted: List[Tuple[int, object]],
@@ -451,6 +648,8 @@ def buildLivePnLView(
     slByPositionId: Dict[int, Optional[float]] = None,     # NEW
     account_currency: str = "USD",                          # NEW
     footer_prompt: str = "", 
+    header_extra: str = "",
+    footer_stats: str = "",
 ):
     table, msg, selected_index, view_offset = buildLivePnLTable(
         console_height,
@@ -472,17 +671,22 @@ def buildLivePnLView(
     symbol = money_symbol(account_currency) or account_currency
     loss_label = f"Loss limit ({symbol})"
 
-    header_line = bg("[bold cyan]Live Unrealized PnL[/bold cyan]")
+    extra = f" · {escape(header_extra)}" if header_extra else ""
+    header_line = bg(f"[bold cyan]Live Unrealized PnL[/bold cyan] [dim]· sort: {sort_key_label()}{extra}[/dim]")
+    summary_line = bg(f"[dim]{totals_line(positions_sorted, selected_index, symbolIdToName, account_currency)}[/dim]")
+    stats_line  = bg(f"[dim]{escape(footer_stats)}[/dim]" if footer_stats else " ")
     msg_line    = bg(f"[red]INFO: {msg}[/red]" if msg else " ")
     prompt_line = bg(f"[bold cyan]{footer_prompt}[/bold cyan]" if footer_prompt else " ")
 
     pieces = [
         header_line,
         table,
+        summary_line,        # constant 1 line
+        stats_line,          # constant 1 line
         msg_line,            # constant 1 line
         prompt_line,         # constant 1 line
         "[dim]🔴  q → quit [/dim]",
-        "[dim]↕️  j / k → Navigate[/dim]",
+        "[dim]↕️  j / k → Navigate   ⇅ s → Cycle sort[/dim]",
         "[dim]❌  x → Exit selected position[/dim]",
         f"[dim]🛟 y → Set {loss_label} for selected[/dim]",
     ]
@@ -504,14 +708,14 @@ def displayPosition(
 ) -> None:
     """Pretty-print a single position (pure UI)."""
     try:
-        symbolId = pos.tradeData.symbolId
-        volumeLots = pos.tradeData.volume / 100.0
-        side = trade_side_name(pos.tradeData.tradeSide)
+        symbolId = pos.symbolId
+        volumeLots = pos.volume / 100.0
+        side = trade_side_name(pos.tradeSide)
 
         symbolName = symbolIdToName.get(symbolId, f"ID:{symbolId}")
         openPrice = pos.price
         marginUsed = pos.usedMargin / 100.0
-        openTime = dt.datetime.utcfromtimestamp(pos.tradeData.openTimestamp / 1000).strftime('%Y-%m-%d %H:%M:%S')
+        openTime = dt.datetime.utcfromtimestamp(pos.openTimestamp / 1000).strftime('%Y-%m-%d %H:%M:%S')
 
         bid, ask = symbolIdToPrice.get(symbolId, (None, None))
         marketPrice = ask if side == "BUY" else bid